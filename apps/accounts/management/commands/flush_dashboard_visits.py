@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.visits import flush_dashboard_visits
+
+
+class Command(BaseCommand):
+    help = 'Ghi thời gian truy cập dashboard đang chờ trong cache xuống DB (chạy định kỳ hoặc trước khi tắt máy chủ)'
+
+    def handle(self, *args, **options):
+        count = flush_dashboard_visits()
+        self.stdout.write(self.style.SUCCESS(f'Đã ghi thời gian truy cập của {count} người dùng.'))
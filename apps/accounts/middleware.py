@@ -1,7 +1,46 @@
 from django.shortcuts import redirect
 from django.urls import resolve, reverse
 from django.contrib import messages
-from django.utils import timezone
+
+from apps.accounts.visits import flush_dashboard_visits_if_due, record_dashboard_visit
+
+
+class PathPrefixTrie:
+    """
+    Cây tiền tố theo từng đoạn của URL path, dựng một lần khi khởi tạo middleware.
+
+    `match(path)` trả về giá trị của tiền tố dài nhất khớp với path, với chi
+    phí theo số đoạn của path thay vì số quy tắc.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, rules):
+        self._root = {}
+        for prefix, value in rules.items():
+            node = self._root
+            for part in self._split(prefix):
+                node = node.setdefault(part, {})
+            node[None] = value
+
+    @staticmethod
+    def _split(path):
+        return [part for part in path.split('/') if part]
+
+    def match(self, path, default=None):
+        node = self._root
+        found = node.get(None, self._MISSING)
+        for part in self._split(path):
+            node = node.get(part)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return default if found is self._MISSING else found
+
+
+# Quy tắc truy cập của mỗi tiền tố; tiền tố không có trong bảng thì ai cũng truy cập được
+PUBLIC = 'public'
+STAFF = 'staff'
 
 
 class RoleBasedAccessMiddleware:
@@ -33,11 +72,18 @@ class RoleBasedAccessMiddleware:
             'ADMIN': '/admin/',
         }
         
+        # Tiền tố -> PUBLIC, STAFF (is_staff) hoặc vai trò được phép; '/admin/' chỉ cần is_staff
+        rules = {path: PUBLIC for path in self.public_paths}
+        rules.update({prefix: role for role, prefix in self.role_url_map.items()})
+        rules['/admin/'] = STAFF
+        self.rules = PathPrefixTrie(rules)
+        self.dashboard_paths = PathPrefixTrie({prefix: True for prefix in self.role_url_map.values()})
+        
     def __call__(self, request):
-        path = request.path
+        rule = self.rules.match(request.path)
         
         # Bỏ qua kiểm tra nếu là đường dẫn công khai
-        if any(path.startswith(public_path) for public_path in self.public_paths):
+        if rule == PUBLIC:
             return self.get_response(request)
         
         # Nếu người dùng đã đăng nhập, kiểm tra quyền truy cập
@@ -46,7 +92,7 @@ class RoleBasedAccessMiddleware:
             self.update_last_dashboard_visit(request)
             
             # Kiểm tra quyền truy cập dựa trên vai trò
-            if not self.has_access_permission(request.user, path):
+            if not self.has_access_permission(request.user, request.path, rule):
                 messages.warning(
                     request, 
                     f'Bạn không có quyền truy cập vào trang này. Vai trò: {request.user.role}'
@@ -57,36 +103,34 @@ class RoleBasedAccessMiddleware:
         return self.get_response(request)
     
     def update_last_dashboard_visit(self, request):
-        """Cập nhật thời gian truy cập dashboard cuối cho nhân viên"""
+        """
+        Ghi thời gian truy cập dashboard cuối cho nhân viên vào cache; thời gian
+        được ghi xuống DB theo lô (xem apps.accounts.visits), không lưu `User` mỗi request.
+
+        Việc ghi xuống DB chạy nhiều nhất mỗi `VISIT_FLUSH_INTERVAL` giây: tại đây
+        khi có request dashboard, và ở mỗi lần quét của `run_report_worker`. Nếu
+        không chạy worker, đặt cron `*/5 * * * * python manage.py flush_dashboard_visits`.
+        Worker và lệnh chỉ thấy thời gian chờ khi cache dùng chung (CACHE_BACKEND=redis
+        hoặc file); với cache trong bộ nhớ chỉ có lần ghi tại đây.
+        """
         user = request.user
-        path = request.path
-        
-        if user.role != 'CUSTOMER' and any(path.startswith(prefix) for prefix in self.role_url_map.values()):
-            # Nếu có thuộc tính last_dashboard_visit
-            if hasattr(user, 'last_dashboard_visit'):
-                user.last_dashboard_visit = timezone.now()
-                user.save(update_fields=['last_dashboard_visit'])
+        if user.role != 'CUSTOMER' and self.dashboard_paths.match(request.path):
+            record_dashboard_visit(user.pk)
+            flush_dashboard_visits_if_due()
     
-    def has_access_permission(self, user, path):
+    def has_access_permission(self, user, path, rule=None):
         """Kiểm tra xem người dùng có quyền truy cập đường dẫn cụ thể không"""
         # Admin có quyền truy cập mọi nơi
         if user.is_superuser or user.role == 'ADMIN':
             return True
-            
-        # Kiểm tra quyền dựa trên vai trò và đường dẫn
-        if path.startswith('/admin/') and not (user.is_superuser or user.is_staff):
-            return False
-            
-        if path.startswith('/sales/') and user.role != 'SALES_STAFF':
-            return False
-            
-        if path.startswith('/inventory/') and user.role != 'INVENTORY_STAFF':
-            return False
-            
-        if path.startswith('/branch-manager/') and user.role != 'MANAGER':
-            return False
         
-        return True
+        if rule is None:
+            rule = self.rules.match(path)
+        if rule is None or rule == PUBLIC:
+            return True
+        if rule == STAFF:
+            return user.is_staff
+        return user.role == rule
 
 
 class CustomerAccessMiddleware:
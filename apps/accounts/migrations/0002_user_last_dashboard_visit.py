@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_dashboard_visit',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Truy cập dashboard gần nhất'),
+        ),
+    ]
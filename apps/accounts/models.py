@@ -20,6 +20,8 @@ class User(AbstractUser):
     date_of_birth = models.DateField(_("Ngày sinh"), null=True, blank=True)
     avatar = models.ImageField(_("Ảnh đại diện"), upload_to='avatars/', null=True, blank=True)
     created_at = models.DateTimeField(_("Ngày tạo"), default=timezone.now)
+    # Ghi theo lô từ cache (xem apps.accounts.visits), có thể trễ vài phút
+    last_dashboard_visit = models.DateTimeField(_("Truy cập dashboard gần nhất"), null=True, blank=True)
     
     class Meta:
         verbose_name = _("Người dùng")
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from apps.accounts.models import User
+
+
+# Khoảng thời gian tối thiểu giữa hai lần ghi thời gian truy cập xuống DB
+VISIT_FLUSH_INTERVAL = 5 * 60
+
+# Thời gian chờ ghi được giữ trong cache lâu hơn nhiều so với chu kỳ ghi, để lần
+# truy cập cuối không mất khi không có request dashboard nào tiếp theo
+VISIT_PENDING_TIMEOUT = 24 * 60 * 60
+
+# Số người dùng mỗi câu UPDATE ... CASE khi ghi xuống DB
+VISIT_FLUSH_BATCH_SIZE = 300
+
+PENDING_KEY = 'accounts:last_visit:pending'
+FLUSH_LOCK_KEY = 'accounts:last_visit:flush_lock'
+
+
+def _key(user_id):
+    return f'accounts:last_visit:{user_id}'
+
+
+def record_dashboard_visit(user_id, when=None):
+    """
+    Ghi thời gian truy cập dashboard vào cache thay vì lưu `User` mỗi request.
+
+    Người dùng lần đầu xuất hiện trong kỳ được thêm vào danh sách chờ ghi; các
+    lần sau chỉ ghi đè thời gian. Khóa được xóa khi ghi xuống DB; nó chỉ tự hết
+    hạn sau `VISIT_PENDING_TIMEOUT`, để nếu hai tiến trình ghi danh sách chờ cùng
+    lúc làm mất một id thì lần truy cập sau đó sẽ thêm lại.
+    """
+    when = when or timezone.now()
+    if cache.add(_key(user_id), when, VISIT_PENDING_TIMEOUT):
+        pending = cache.get(PENDING_KEY) or set()
+        pending.add(user_id)
+        cache.set(PENDING_KEY, pending, None)
+    else:
+        cache.set(_key(user_id), when, VISIT_PENDING_TIMEOUT)
+
+
+def last_dashboard_visit(user):
+    """Thời gian truy cập gần nhất: giá trị chưa ghi trong cache, nếu không thì giá trị trong DB"""
+    return cache.get(_key(user.pk)) or user.last_dashboard_visit
+
+
+def flush_dashboard_visits():
+    """Ghi các thời gian truy cập đang chờ xuống DB theo lô; trả về số người dùng đã ghi"""
+    pending = cache.get(PENDING_KEY)
+    if not pending:
+        return 0
+    cache.delete(PENDING_KEY)
+    keys = {_key(user_id): user_id for user_id in pending}
+    visits = {keys[key]: when for key, when in cache.get_many(keys).items()}
+    cache.delete_many(list(keys))
+
+    user_ids = list(visits)
+    for i in range(0, len(user_ids), VISIT_FLUSH_BATCH_SIZE):
+        chunk = user_ids[i:i + VISIT_FLUSH_BATCH_SIZE]
+        User.objects.filter(pk__in=chunk).update(last_dashboard_visit=Case(
+            *[When(pk=user_id, then=Value(visits[user_id])) for user_id in chunk],
+            output_field=DateTimeField(),
+        ))
+    return len(user_ids)
+
+
+def flush_dashboard_visits_if_due():
+    """Ghi xuống DB nhiều nhất một lần mỗi `VISIT_FLUSH_INTERVAL` giây trên mọi tiến trình"""
+    if cache.add(FLUSH_LOCK_KEY, 1, VISIT_FLUSH_INTERVAL):
+        return flush_dashboard_visits()
+    return 0
@@ -7,8 +7,6 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 import csv
 import json
-import io
-import xlsxwriter
 from django.contrib.auth.models import Group
 import os
 
@@ -18,6 +16,8 @@ from apps.orders.models import Order, OrderItem
 from apps.inventory.models import Stock, StockMovement, Inventory
 from apps.branches.models import Branch
 from apps.suppliers.models import Supplier, PurchaseOrder
+from apps.reports.rollups import order_rollups
+from apps.reports.exports import export_response, EXPORT_CHUNK_SIZE
 
 # Helper function to check if user is admin
 def is_admin(user):
@@ -40,17 +40,17 @@ def dashboard(request):
     total_branches = Branch.objects.count()
     
     # Sales data
-    daily_sales = Order.objects.filter(created_at__date=today).aggregate(
-        count=Count('id'),
-        total=Sum('total')
+    daily_sales = order_rollups(start=today, end=today).aggregate(
+        count=Sum('order_count'),
+        total=Sum('order_total')
     )
-    weekly_sales = Order.objects.filter(created_at__date__gte=start_of_week).aggregate(
-        count=Count('id'),
-        total=Sum('total')
+    weekly_sales = order_rollups(start=start_of_week).aggregate(
+        count=Sum('order_count'),
+        total=Sum('order_total')
     )
-    monthly_sales = Order.objects.filter(created_at__date__gte=start_of_month).aggregate(
-        count=Count('id'),
-        total=Sum('total')
+    monthly_sales = order_rollups(start=start_of_month).aggregate(
+        count=Sum('order_count'),
+        total=Sum('order_total')
     )
     
     # Top-selling products
@@ -407,7 +407,7 @@ def category_edit(request, pk):
             try:
                 parent = Category.objects.get(id=parent_id)
                 # Kiểm tra để tránh tạo vòng lặp (circular dependency)
-                if not (parent.id == category.id or (parent.parent and parent.parent.id == category.id)):
+                if not parent.path.startswith(category.path):
                     category.parent = parent
             except Category.DoesNotExist:
                 pass
@@ -773,39 +773,28 @@ def export_report(request, report_type):
         orders = Order.objects.filter(
             created_at__date__gte=start_date,
             created_at__date__lte=end_date
-        ).select_related('customer', 'branch')
-        
-        # Create Excel file
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet('Sales Report')
-        
-        # Add headers
-        headers = ['Order ID', 'Date', 'Customer', 'Branch', 'Items', 'Total Amount', 'Status']
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header)
-        
-        # Add data
-        for row, order in enumerate(orders, 1):
-            worksheet.write(row, 0, order.id)
-            worksheet.write(row, 1, order.created_at.strftime('%Y-%m-%d'))
-            worksheet.write(row, 2, order.customer.get_full_name() or order.customer.username)
-            worksheet.write(row, 3, order.branch.name if order.branch else 'N/A')
-            worksheet.write(row, 4, order.items.count())
-            worksheet.write(row, 5, float(order.total))
-            worksheet.write(row, 6, order.status)
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Create response
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        ).select_related('customer', 'branch').annotate(
+            item_count=Count('items')
+        ).order_by('created_at')
+        
+        def rows():
+            for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield [
+                    order.id,
+                    order.created_at.strftime('%Y-%m-%d'),
+                    order.customer.get_full_name() or order.customer.username,
+                    order.branch.name if order.branch else 'N/A',
+                    order.item_count,
+                    float(order.total),
+                    order.status,
+                ]
+        
+        return export_response(
+            request,
+            f'sales_report_{start_date}_to_{end_date}',
+            ['Order ID', 'Date', 'Customer', 'Branch', 'Items', 'Total Amount', 'Status'],
+            rows(),
         )
-        response['Content-Disposition'] = f'attachment; filename=sales_report_{start_date}_to_{end_date}.xlsx'
-        
-        return response
     
     elif report_type == 'inventory':
         # Similar implementation for inventory report export
@@ -0,0 +1,115 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.pagination import DEFAULT_ORDERING, KeysetPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Phân trang theo khóa (created_at, id) cho API.
+
+    Chỉ bật khi client gửi `?limit=` hoặc `?cursor=`; không có hai tham số này
+    thì API trả về danh sách như trước. Tổng số dòng là ước lượng
+    (`estimated_total`, `total_is_exact`), không COUNT toàn bảng.
+    """
+    ordering = DEFAULT_ORDERING
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 20
+    max_limit = 200
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.limit_query_param not in params:
+            return None
+        
+        self.request = request
+        self.paginator = KeysetPaginator(
+            queryset, self.get_limit(request), ordering=self.ordering, cursor_param=self.cursor_query_param
+        )
+        self.page = self.paginator.page(params.get(self.cursor_query_param))
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        estimated_total, exact = self.paginator.estimated_count()
+        return Response({
+            'next': self._link(self.page.next_cursor) if self.page.has_next else None,
+            'previous': self._link(self.page.previous_cursor) if self.page.has_previous else None,
+            'estimated_total': estimated_total,
+            'total_is_exact': exact,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'estimated_total': {'type': 'integer'},
+                'total_is_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class SearchRankPagination(KeysetPagination):
+    """
+    Như `KeysetPagination`, nhưng khi có `?search=` thì giữ thứ tự theo điểm
+    `search_rank` và phân trang theo `?offset=&limit=`: điểm xếp hạng không
+    phải khóa duy nhất nên không dùng được con trỏ (created_at, id).
+
+    Kết quả tìm kiếm không COUNT: `estimated_total` là số dòng đã duyệt tới
+    trang hiện tại, `total_is_exact` chỉ đúng ở trang cuối.
+    """
+    search_query_param = api_settings.SEARCH_PARAM
+    offset_query_param = 'offset'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.offset = None
+        if not params.get(self.search_query_param, '').strip():
+            return super().paginate_queryset(queryset, request, view)
+        if self.offset_query_param not in params and self.limit_query_param not in params:
+            return None
+        
+        self.request = request
+        self.limit = self.get_limit(request)
+        try:
+            self.offset = max(0, int(params.get(self.offset_query_param, 0)))
+        except ValueError:
+            self.offset = 0
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def _offset_link(self, offset):
+        url = self.request.build_absolute_uri()
+        if offset <= 0:
+            return remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.offset_query_param, offset)
+
+    def get_paginated_response(self, data):
+        if self.offset is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self._offset_link(self.offset + self.limit) if self.has_next else None,
+            'previous': self._offset_link(self.offset - self.limit) if self.offset > 0 else None,
+            'estimated_total': self.offset + len(data),
+            'total_is_exact': not self.has_next,
+            'results': data,
+        })
@@ -0,0 +1,24 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Đọc thân request dạng NDJSON (mỗi dòng một đối tượng JSON) thành
+    `{'scans': [...]}`, để máy quét có thể gửi các lần quét theo luồng.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        scans = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                scans.append(json.loads(line))
+            except ValueError as e:
+                raise ParseError(f'Dòng {number} không phải JSON hợp lệ: {e}')
+        return {'scans': scans}
@@ -1,10 +1,16 @@
+from django.db import transaction
 from rest_framework import serializers
 from apps.products.models import Product, Category, ProductVariant, ProductImage
 from apps.branches.models import Branch
 from apps.accounts.models import User, CustomerProfile, ShippingAddress
 from apps.orders.models import Order, OrderItem, Payment, Delivery
-from apps.inventory.models import Stock, StockMovement, Inventory, InventoryItem
+from apps.inventory.availability import MAX_AVAILABILITY_IDS
+from apps.inventory.models import Stock, StockMovement, StockTransfer, StockTransferItem, Inventory, InventoryItem
+from apps.inventory.scanning import MAX_SCANS_PER_BATCH
+from apps.inventory.services import reserve_stock
 from apps.suppliers.models import Supplier, PurchaseOrder, PurchaseOrderItem
+from apps.orders.services import create_order
+from core.db import serialized_write
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -13,7 +19,7 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'full_name', 
-                  'is_active', 'branch', 'role']
+                  'phone_number', 'is_active', 'role']
     
     def get_full_name(self, obj):
         return obj.get_full_name()
@@ -40,100 +46,232 @@ class BranchSerializer(serializers.ModelSerializer):
 class ProductCategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'parent', 'description', 'is_active']
+        fields = ['id', 'name', 'slug', 'parent', 'description', 'is_active']
 
 
 class ProductVariantSerializer(serializers.ModelSerializer):
     """Serializer cho biến thể sản phẩm"""
+    # `price` đọc product.price: cần lấy biến thể qua product.variants hoặc select_related('product')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    
     class Meta:
         model = ProductVariant
-        fields = ['id', 'name', 'sku', 'price', 'stock_quantity', 'is_active']
+        fields = ['id', 'name', 'sku', 'price_adjustment', 'price', 'stock_quantity', 'is_active']
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
-        fields = ['id', 'product', 'image', 'is_primary', 'alt_text']
+        fields = ['id', 'product', 'image', 'alt_text']
+
+
+class ProductListSerializer(serializers.ModelSerializer):
+    """Dạng rút gọn cho danh sách sản phẩm"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'sku', 'price', 'discount_price', 'category',
+                  'category_name', 'is_active']
 
 
 class ProductSerializer(serializers.ModelSerializer):
     """Serializer cho sản phẩm"""
-    category_name = serializers.StringRelatedField(source='category', read_only=True)
+    category_name = serializers.CharField(source='category.name', read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'sku', 'description', 'price', 'category', 
-                  'category_name', 'stock_quantity', 'is_active', 'variants']
+        fields = ['id', 'name', 'slug', 'sku', 'description', 'price', 'discount_price',
+                  'category', 'category_name', 'supplier', 'material', 'color', 'dimensions',
+                  'weight', 'featured', 'is_active', 'variants']
 
 
 class StockSerializer(serializers.ModelSerializer):
     """Serializer cho tồn kho"""
-    product_name = serializers.StringRelatedField(source='product', read_only=True)
-    variant_name = serializers.StringRelatedField(source='variant', read_only=True)
-    branch_name = serializers.StringRelatedField(source='branch', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    variant_name = serializers.CharField(source='variant.name', read_only=True, default=None)
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
     
     class Meta:
         model = Stock
         fields = ['id', 'product', 'product_name', 'variant', 'variant_name', 
-                  'branch', 'branch_name', 'quantity', 'min_quantity', 'max_quantity']
+                  'branch', 'branch_name', 'quantity', 'min_quantity', 'max_quantity', 'updated_at']
+        # Số lượng được tính từ sổ cái chuyển động kho
+        read_only_fields = ['quantity']
+
+
+class StockAvailabilityRequestSerializer(serializers.Serializer):
+    """Tham số tra cứu tồn kho hàng loạt: danh sách id sản phẩm, biến thể, chi nhánh"""
+    products = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    variants = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    branches = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_null=True, default=None)
+    
+    def validate(self, data):
+        count = len(data['products']) + len(data['variants'])
+        if not count:
+            raise serializers.ValidationError("Cần ít nhất một sản phẩm hoặc biến thể.")
+        if count > MAX_AVAILABILITY_IDS:
+            raise serializers.ValidationError(f"Chỉ tra cứu tối đa {MAX_AVAILABILITY_IDS} sản phẩm/biến thể mỗi lần.")
+        return data
+
+
+class InventorySerializer(serializers.ModelSerializer):
+    """Serializer cho phiếu kiểm kê"""
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
+    
+    class Meta:
+        model = Inventory
+        fields = ['id', 'inventory_number', 'branch', 'branch_name', 'status', 'notes',
+                  'created_at', 'completed_at']
+        read_only_fields = fields
+
+
+class InventoryScanSerializer(serializers.Serializer):
+    """Một lần quét mã vạch: `scan_id` do máy quét sinh ra, duy nhất trong phiếu kiểm kê"""
+    scan_id = serializers.CharField(max_length=64)
+    sku = serializers.CharField(max_length=50)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class InventoryScanBatchSerializer(serializers.Serializer):
+    """Một lô lần quét gửi lên cùng lúc"""
+    scans = InventoryScanSerializer(many=True, allow_empty=False, max_length=MAX_SCANS_PER_BATCH)
+
+
+class StockTransferItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    variant_name = serializers.CharField(source='variant.name', read_only=True, default=None)
+    
+    class Meta:
+        model = StockTransferItem
+        fields = ['id', 'product', 'product_name', 'variant', 'variant_name', 'quantity', 'received_quantity']
+        read_only_fields = fields
+
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    """Serializer cho phiếu chuyển kho"""
+    from_branch_name = serializers.CharField(source='from_branch.name', read_only=True)
+    to_branch_name = serializers.CharField(source='to_branch.name', read_only=True)
+    items = StockTransferItemSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = StockTransfer
+        fields = ['id', 'transfer_number', 'from_branch', 'from_branch_name', 'to_branch', 'to_branch_name',
+                  'status', 'notes', 'created_by', 'created_at', 'dispatched_by', 'dispatched_at',
+                  'received_by', 'received_at', 'items']
+        read_only_fields = fields
+
+
+class StockTransferItemWriteSerializer(serializers.Serializer):
+    """Dòng sản phẩm khi tạo phiếu chuyển kho qua API"""
+    product = serializers.IntegerField()
+    variant = serializers.IntegerField(required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockTransferCreateSerializer(serializers.Serializer):
+    """Tạo phiếu chuyển kho nhiều dòng trong một lần gọi"""
+    from_branch = serializers.PrimaryKeyRelatedField(queryset=Branch.objects.all())
+    to_branch = serializers.PrimaryKeyRelatedField(queryset=Branch.objects.all())
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = StockTransferItemWriteSerializer(many=True, allow_empty=False)
+    
+    def validate_items(self, items):
+        # Lấy toàn bộ sản phẩm và biến thể trong hai truy vấn
+        products = Product.objects.in_bulk({item['product'] for item in items})
+        variants = ProductVariant.objects.in_bulk(
+            {item['variant'] for item in items if item.get('variant')}
+        )
+        lines = []
+        for item in items:
+            product = products.get(item['product'])
+            if product is None:
+                raise serializers.ValidationError(f"Sản phẩm #{item['product']} không tồn tại.")
+            variant = None
+            if item.get('variant'):
+                variant = variants.get(item['variant'])
+                if variant is None or variant.product_id != product.pk:
+                    raise serializers.ValidationError(f"Biến thể #{item['variant']} không hợp lệ.")
+            lines.append((product, variant, item['quantity']))
+        return lines
+    
+    def validate(self, data):
+        if data['from_branch'] == data['to_branch']:
+            raise serializers.ValidationError("Chi nhánh đích phải khác chi nhánh nguồn.")
+        return data
+
+
+class StockTransferReceiveItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    received_quantity = serializers.IntegerField(min_value=0)
+
+
+class StockTransferReceiveSerializer(serializers.Serializer):
+    """Số lượng nhận thực tế từng dòng; bỏ trống nghĩa là nhận đủ"""
+    items = StockTransferReceiveItemSerializer(many=True, required=False, default=list)
 
 
 class StockMovementSerializer(serializers.ModelSerializer):
     """Serializer cho chuyển động kho"""
-    product_name = serializers.StringRelatedField(source='product', read_only=True)
-    variant_name = serializers.StringRelatedField(source='variant', read_only=True)
-    branch_name = serializers.StringRelatedField(source='branch', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    variant_name = serializers.CharField(source='variant.name', read_only=True, default=None)
+    from_branch_name = serializers.CharField(source='from_branch.name', read_only=True, default=None)
+    to_branch_name = serializers.CharField(source='to_branch.name', read_only=True, default=None)
     
     class Meta:
         model = StockMovement
         fields = ['id', 'product', 'product_name', 'variant', 'variant_name', 
-                  'branch', 'branch_name', 'movement_type', 'quantity', 
-                  'reference', 'performed_at', 'performed_by']
+                  'movement_type', 'quantity', 'from_branch', 'from_branch_name',
+                  'to_branch', 'to_branch_name', 'reference', 'notes', 'staff', 'created_at']
 
 
 class SupplierSerializer(serializers.ModelSerializer):
     """Serializer cho nhà cung cấp"""
     class Meta:
         model = Supplier
-        fields = ['id', 'name', 'code', 'contact_person', 'phone', 'email', 
-                  'address', 'is_active', 'rating']
+        fields = ['id', 'name', 'contact_person', 'phone', 'email', 
+                  'address', 'tax_code', 'website', 'is_active']
 
 
 class PurchaseOrderItemSerializer(serializers.ModelSerializer):
     """Serializer cho chi tiết đơn hàng nhập"""
-    product_name = serializers.StringRelatedField(source='product', read_only=True)
-    variant_name = serializers.StringRelatedField(source='variant', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
     
     class Meta:
         model = PurchaseOrderItem
-        fields = ['id', 'product', 'product_name', 'variant', 'variant_name', 
-                  'quantity', 'unit_price', 'received_quantity']
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'subtotal']
+
+
+class PurchaseOrderListSerializer(serializers.ModelSerializer):
+    """Dạng rút gọn cho danh sách đơn hàng nhập"""
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    
+    class Meta:
+        model = PurchaseOrder
+        fields = ['id', 'order_number', 'supplier', 'supplier_name', 'status',
+                  'total_amount', 'created_at']
 
 
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     """Serializer cho đơn hàng nhập"""
-    supplier_name = serializers.StringRelatedField(source='supplier', read_only=True)
-    branch_name = serializers.StringRelatedField(source='branch', read_only=True)
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     items = PurchaseOrderItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = PurchaseOrder
-        fields = ['id', 'order_number', 'supplier', 'supplier_name', 'branch', 
-                  'branch_name', 'status', 'order_date', 'expected_date', 
-                  'received_date', 'total_amount', 'items']
+        fields = ['id', 'order_number', 'supplier', 'supplier_name', 'staff', 'status',
+                  'total_amount', 'created_at', 'confirmed_at', 'received_at', 'notes', 'items']
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.SerializerMethodField()
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    variant_name = serializers.CharField(source='variant.name', read_only=True, default=None)
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'order', 'product', 'product_name', 'variant', 
-                 'price', 'quantity', 'discount', 'note', 'total']
-    
-    def get_product_name(self, obj):
-        return obj.product.name if obj.product else None
+        fields = ['id', 'order', 'product', 'product_name', 'variant', 'variant_name',
+                  'price', 'quantity', 'subtotal']
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -150,11 +288,93 @@ class DeliverySerializer(serializers.ModelSerializer):
                  'delivered_date', 'status', 'notes']
 
 
+class OrderListSerializer(serializers.ModelSerializer):
+    """Dạng rút gọn cho danh sách đơn hàng"""
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'order_number', 'branch', 'branch_name', 'status', 'recipient_name',
+                  'is_paid', 'total', 'created_at']
+
+
 class OrderSerializer(serializers.ModelSerializer):
     """Serializer cho đơn hàng"""
-    branch_name = serializers.StringRelatedField(source='branch', read_only=True)
+    branch_name = serializers.CharField(source='branch.name', read_only=True)
+    items = OrderItemSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'order_number', 'customer', 'branch', 'branch_name', 'sales_staff',
+                  'status', 'recipient_name', 'recipient_phone', 'shipping_address', 'city',
+                  'district', 'ward', 'payment_method', 'is_paid', 'subtotal', 'shipping_fee',
+                  'tax', 'discount', 'total', 'notes', 'created_at', 'items']
+
+
+class OrderItemWriteSerializer(serializers.Serializer):
+    """Dòng sản phẩm khi tạo đơn hàng qua API"""
+    product = serializers.IntegerField()
+    variant = serializers.IntegerField(required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+
+class OrderCreateSerializer(serializers.ModelSerializer):
+    """Serializer tạo đơn hàng kèm các dòng sản phẩm trong một lần ghi"""
+    items = OrderItemWriteSerializer(many=True, write_only=True)
     
     class Meta:
         model = Order
-        fields = ['id', 'order_number', 'branch', 'branch_name', 'created_at', 
-                  'status', 'payment_status', 'total', 'full_name', 'phone', 'email'] 
\ No newline at end of file
+        fields = ['id', 'order_number', 'customer', 'branch', 'recipient_name', 'recipient_phone',
+                  'shipping_address', 'city', 'district', 'ward', 'payment_method',
+                  'shipping_fee', 'tax', 'discount', 'notes', 'subtotal', 'total', 'items']
+        read_only_fields = ['order_number', 'subtotal', 'total']
+        extra_kwargs = {'customer': {'required': False}}
+    
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError('Đơn hàng phải có ít nhất một sản phẩm.')
+        
+        # Lấy toàn bộ sản phẩm và biến thể trong hai truy vấn
+        products = Product.objects.in_bulk({item['product'] for item in items})
+        variants = ProductVariant.objects.in_bulk(
+            {item['variant'] for item in items if item.get('variant')}
+        )
+        
+        lines = []
+        for item in items:
+            product = products.get(item['product'])
+            if product is None:
+                raise serializers.ValidationError(f"Sản phẩm #{item['product']} không tồn tại.")
+            variant = None
+            if item.get('variant'):
+                variant = variants.get(item['variant'])
+                if variant is None or variant.product_id != product.pk:
+                    raise serializers.ValidationError(f"Biến thể #{item['variant']} không hợp lệ.")
+            price = item.get('price')
+            if price is None:
+                price = product.get_actual_price + (variant.price_adjustment if variant else 0)
+            lines.append((product, variant, item['quantity'], price))
+        return lines
+    
+    def create(self, validated_data):
+        lines = validated_data.pop('items')
+        request = self.context.get('request')
+        order = Order(**validated_data)
+        if request is not None:
+            if not order.customer_id:
+                order.customer = request.user
+            if request.user.role != 'CUSTOMER':
+                order.sales_staff = request.user
+        return self.place_order(order, lines)
+    
+    @staticmethod
+    @serialized_write
+    @transaction.atomic
+    def place_order(order, lines):
+        # Đơn hàng và xuất kho trong cùng một giao dịch, như khi đặt hàng từ giỏ
+        create_order(order, lines)
+        reserve_stock(order.branch, [
+            (product, variant, quantity) for product, variant, quantity, price in lines
+        ], staff=order.sales_staff, reference=f'Đơn hàng #{order.order_number}')
+        return order
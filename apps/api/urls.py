@@ -8,6 +8,8 @@ from apps.api.views import (
     BranchViewSet,
     OrderViewSet,
     StockViewSet,
+    InventoryViewSet,
+    StockTransferViewSet,
     SupplierViewSet,
     UserViewSet
 )
@@ -19,6 +21,8 @@ router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'branches', BranchViewSet, basename='branch')
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'stocks', StockViewSet, basename='stock')
+router.register(r'inventories', InventoryViewSet, basename='inventory')
+router.register(r'stock-transfers', StockTransferViewSet, basename='stock-transfer')
 router.register(r'suppliers', SupplierViewSet, basename='supplier')
 router.register(r'users', UserViewSet, basename='user')
 
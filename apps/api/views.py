@@ -1,49 +1,118 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, mixins, permissions, filters, status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from apps.products.models import Product, Category, ProductVariant
+from apps.products.search import search_products
 from apps.branches.models import Branch
 from apps.accounts.models import User, CustomerProfile
 from apps.orders.models import Order
-from apps.inventory.models import Stock, StockMovement
+from apps.inventory.availability import stock_availability
+from apps.inventory.models import Inventory, Stock, StockMovement, StockTransfer
+from apps.inventory.scanning import InventoryClosedError, ingest_scans
+from apps.inventory.services import InsufficientStockError
+from apps.inventory.transfers import TransferError, cancel_transfer, create_transfer, dispatch_transfer, receive_transfer
 from apps.suppliers.models import Supplier, PurchaseOrder
+from apps.api.pagination import KeysetPagination, SearchRankPagination
+from apps.api.parsers import NDJSONParser
 from apps.api.serializers import (
     ProductSerializer, 
+    ProductListSerializer,
     ProductCategorySerializer, 
     BranchSerializer,
     OrderSerializer,
+    OrderListSerializer,
+    OrderCreateSerializer,
     StockSerializer,
+    StockAvailabilityRequestSerializer,
+    InventorySerializer,
+    InventoryScanBatchSerializer,
+    StockTransferSerializer,
+    StockTransferCreateSerializer,
+    StockTransferReceiveSerializer,
     StockMovementSerializer,
     SupplierSerializer,
     PurchaseOrderSerializer,
+    PurchaseOrderListSerializer,
     UserSerializer,
     ProductVariantSerializer
 )
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class QueryPlanMixin:
+    """
+    Khai báo truy vấn của viewset: các quan hệ cần `select_related`/`prefetch_related`
+    và serializer rút gọn cho danh sách, để số truy vấn không tăng theo số dòng.
+
+    `list_select_related`/`list_prefetch_related` = None thì danh sách dùng chung
+    cấu hình với trang chi tiết.
+    """
+    list_serializer_class = None
+    select_related = ()
+    prefetch_related = ()
+    list_select_related = None
+    list_prefetch_related = None
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        is_list = self.action == 'list'
+        select = self.select_related
+        prefetch = self.prefetch_related
+        if is_list and self.list_select_related is not None:
+            select = self.list_select_related
+        if is_list and self.list_prefetch_related is not None:
+            prefetch = self.list_prefetch_related
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list' and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """Tìm kiếm sản phẩm qua chỉ mục đảo thay vì `icontains` trên từng cột"""
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_products(query, queryset)
+
+
+class ProductViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho sản phẩm"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    list_serializer_class = ProductListSerializer
+    select_related = ('category',)
+    prefetch_related = ('variants',)
+    list_prefetch_related = ()
+    pagination_class = SearchRankPagination
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['name', 'description', 'sku']
     ordering_fields = ['name', 'price', 'created_at']
     
     @action(detail=True, methods=['get'])
     def variants(self, request, pk=None):
         """Lấy danh sách biến thể cho một sản phẩm cụ thể"""
         product = self.get_object()
-        variants = ProductVariant.objects.filter(product=product, is_active=True)
+        # Lấy qua product.variants để biến thể dùng lại đối tượng product (không truy vấn lại khi tính giá)
+        variants = product.variants.filter(is_active=True)
         serializer = ProductVariantSerializer(variants, many=True)
         return Response(serializer.data)
 
 
-class ProductVariantViewSet(viewsets.ModelViewSet):
+class ProductVariantViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho biến thể sản phẩm"""
     queryset = ProductVariant.objects.all()
+    select_related = ('product',)
     serializer_class = ProductVariantSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -70,34 +139,149 @@ class BranchViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'address']
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho đơn hàng"""
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    list_serializer_class = OrderListSerializer
+    select_related = ('branch',)
+    prefetch_related = ('items__product', 'items__variant')
+    list_prefetch_related = ()
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'payment_status', 'branch']
-    search_fields = ['order_number', 'full_name', 'phone', 'email']
-    ordering_fields = ['created_at', 'updated_at', 'total']
+    filterset_fields = ['status', 'is_paid', 'branch']
+    search_fields = ['order_number', 'recipient_name', 'recipient_phone']
+    ordering_fields = ['created_at', 'total']
+    
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return OrderCreateSerializer
+        return super().get_serializer_class()
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except InsufficientStockError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
 
 
-class StockViewSet(viewsets.ModelViewSet):
+class StockViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho tồn kho"""
     queryset = Stock.objects.all()
+    select_related = ('product', 'variant', 'branch')
     serializer_class = StockSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['branch', 'product', 'variant']
 
+    @action(detail=False, methods=['get', 'post'])
+    def availability(self, request):
+        """
+        Tồn kho của nhiều sản phẩm/biến thể tại các chi nhánh trong một lần gọi.
+
+        GET ?products=1,2&variants=5&branches=1 hoặc POST
+        {"products": [...], "variants": [...], "branches": [...]}.
+        """
+        if request.method == 'POST':
+            data = request.data
+        else:
+            data = {
+                name: [value for value in request.query_params.get(name, '').split(',') if value]
+                for name in ('products', 'variants', 'branches')
+                if name in request.query_params
+            }
+        serializer = StockAvailabilityRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        return Response(stock_availability(params['products'], params['variants'], params['branches']))
+
+
+class InventoryViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
+    """API endpoint cho phiếu kiểm kê (đọc) và nhận lần quét mã vạch"""
+    queryset = Inventory.objects.all()
+    select_related = ('branch',)
+    serializer_class = InventorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['branch', 'status']
+
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def scans(self, request, pk=None):
+        """
+        Nhận một lô lần quét: JSON `{"scans": [{"scan_id", "sku", "quantity"}]}` hoặc
+        NDJSON (mỗi dòng một lần quét). Gửi lại lần quét đã ghi không bị đếm trùng.
+        """
+        inventory = self.get_object()
+        serializer = InventoryScanBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = ingest_scans(inventory, serializer.validated_data['scans'], staff=request.user)
+        except InventoryClosedError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(result)
+
+
+class StockTransferViewSet(QueryPlanMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """API endpoint cho phiếu chuyển kho: tạo nhiều dòng, xuất kho, nhận hàng, hủy"""
+    queryset = StockTransfer.objects.all()
+    serializer_class = StockTransferSerializer
+    select_related = ('from_branch', 'to_branch')
+    prefetch_related = ('items__product', 'items__variant')
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'from_branch', 'to_branch']
+    
+    def create(self, request, *args, **kwargs):
+        serializer = StockTransferCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        transfer = create_transfer(
+            data['from_branch'], data['to_branch'], data['items'], staff=request.user, notes=data['notes']
+        )
+        return Response(self._detail(transfer), status=status.HTTP_201_CREATED)
+    
+    def _detail(self, transfer):
+        return StockTransferSerializer(self.get_queryset().get(pk=transfer.pk)).data
+    
+    def _run(self, operation, *args):
+        transfer = self.get_object()
+        try:
+            operation(transfer, *args, staff=self.request.user)
+        except (TransferError, InsufficientStockError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self._detail(transfer))
+    
+    @action(detail=True, methods=['post'], url_path='dispatch')
+    def ship(self, request, pk=None):
+        """Xuất kho: trừ tồn kho nguồn, hàng chuyển sang trạng thái đang chuyển"""
+        return self._run(dispatch_transfer)
+    
+    @action(detail=True, methods=['post'])
+    def receive(self, request, pk=None):
+        """Nhận hàng; `{"items": [{"id", "received_quantity"}]}` nếu nhận thiếu"""
+        serializer = StockTransferReceiveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        received = {item['id']: item['received_quantity'] for item in serializer.validated_data['items']}
+        return self._run(receive_transfer, received)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Hủy phiếu; phiếu đang chuyển được hoàn hàng về chi nhánh nguồn"""
+        return self._run(cancel_transfer)
+
 
-class StockMovementViewSet(viewsets.ModelViewSet):
+class StockMovementViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho chuyển động kho"""
     queryset = StockMovement.objects.all()
+    select_related = ('product', 'variant', 'from_branch', 'to_branch')
     serializer_class = StockMovementSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['branch', 'product', 'movement_type']
-    ordering_fields = ['performed_at']
+    filterset_fields = ['from_branch', 'to_branch', 'product', 'movement_type']
+    ordering_fields = ['created_at']
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -107,18 +291,22 @@ class SupplierViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['is_active']
-    search_fields = ['name', 'code', 'contact_person', 'phone', 'email']
+    search_fields = ['name', 'contact_person', 'phone', 'email']
 
 
-class PurchaseOrderViewSet(viewsets.ModelViewSet):
+class PurchaseOrderViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """API endpoint cho đơn hàng nhập"""
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderSerializer
+    list_serializer_class = PurchaseOrderListSerializer
+    select_related = ('supplier',)
+    prefetch_related = ('items__product',)
+    list_prefetch_related = ()
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['supplier', 'branch', 'status']
+    filterset_fields = ['supplier', 'status']
     search_fields = ['order_number']
-    ordering_fields = ['order_date', 'created_at']
+    ordering_fields = ['created_at', 'total_amount']
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -127,5 +315,5 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['role', 'branch']
+    filterset_fields = ['role']
     search_fields = ['username', 'email', 'first_name', 'last_name', 'phone_number'] 
\ No newline at end of file
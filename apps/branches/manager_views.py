@@ -9,9 +9,14 @@ import calendar
 
 from apps.accounts.models import User
 from apps.products.models import Product
+from apps.inventory.levels import branch_stock_levels
 from apps.inventory.models import Stock, StockMovement
 from apps.orders.models import Order
+from apps.orders.counters import branch_status_counts
 from apps.branches.models import Branch
+from apps.reports.rollups import order_rollups
+from apps.reports.timeseries import bucket_series
+from core.aggregates import StatusCounts
 
 
 @login_required
@@ -27,23 +32,24 @@ def dashboard(request):
     current_year = today.year
     
     # Doanh thu hôm nay
-    today_revenue = Order.objects.filter(
+    today_revenue = order_rollups(
         branch=branch,
-        created_at__date=today,
-        status__in=['delivered', 'completed']
-    ).aggregate(total=Sum('total'))['total'] or 0
+        start=today,
+        end=today,
+        statuses=['DELIVERED']
+    ).aggregate(total=Sum('order_total'))['total'] or 0
+    
+    # Số đơn hàng theo trạng thái (bộ đếm theo chi nhánh trong cache)
+    status_counts = branch_status_counts(branch.pk) if branch else StatusCounts()
     
     # Đếm đơn hàng mới
-    new_orders_count = Order.objects.filter(
-        branch=branch,
-        status='pending'
-    ).count()
+    new_orders_count = status_counts['PENDING']
+    
+    # Số liệu tồn kho tính sẵn của chi nhánh
+    levels = branch_stock_levels(branch.pk if branch else None)
     
     # Đếm sản phẩm sắp hết
-    low_stock_count = Stock.objects.filter(
-        branch=branch,
-        quantity__lte=F('min_quantity')
-    ).count()
+    low_stock_count = levels.low_stock_count
     
     # Đếm nhân viên
     staff_count = User.objects.filter(
@@ -52,43 +58,34 @@ def dashboard(request):
     ).count()
     
     # Doanh thu theo tháng trong 12 tháng gần nhất
-    revenue_data = []
-    revenue_months = []
-    
-    for i in range(12, 0, -1):
-        month = (today.month - i) % 12 + 1
-        year = today.year - ((i - month) // 12 + (1 if month > today.month else 0))
-        month_name = calendar.month_name[month][:3] + " " + str(year)
-        
-        # Tính tổng doanh thu trong tháng đó
-        month_revenue = Order.objects.filter(
-            branch=branch,
-            created_at__month=month,
-            created_at__year=year,
-            status__in=['delivered', 'completed']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Chuyển đổi sang đơn vị triệu
-        revenue_data.append(round(month_revenue / 1000000, 2))
-        revenue_months.append(month_name)
+    first_month = today.replace(day=1)
+    for _ in range(11):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+    
+    monthly_series = bucket_series(
+        order_rollups(branch=branch, statuses=['DELIVERED']), 'date', first_month, today, 'month',
+        total=Sum('order_total')
+    )
+    
+    # Chuyển đổi sang đơn vị triệu
+    revenue_data = [round(float(row['total']) / 1000000, 2) for row in monthly_series]
+    revenue_months = [
+        calendar.month_name[row['period'].month][:3] + " " + str(row['period'].year)
+        for row in monthly_series
+    ]
     
     # Thống kê đơn hàng theo trạng thái
-    pending_count = Order.objects.filter(branch=branch, status='pending').count()
-    processing_count = Order.objects.filter(branch=branch, status='processing').count()
-    shipped_count = Order.objects.filter(branch=branch, status='shipped').count()
-    delivered_count = Order.objects.filter(branch=branch, status='delivered').count()
-    cancelled_count = Order.objects.filter(branch=branch, status='cancelled').count()
-    
-    order_status_data = [pending_count, processing_count, shipped_count, delivered_count, cancelled_count]
+    order_status_data = [
+        status_counts[status] for status in ('PENDING', 'CONFIRMED', 'SHIPPING', 'DELIVERED', 'CANCELLED')
+    ]
     
     # 10 đơn hàng mới nhất
     recent_orders = Order.objects.filter(branch=branch).order_by('-created_at')[:10]
     
     # 10 sản phẩm sắp hết hàng
     low_stock_products = Stock.objects.filter(
-        branch=branch,
-        quantity__lte=F('min_quantity')
-    ).select_related('product').order_by('quantity')[:10]
+        pk__in=levels.lowest_stock_ids(10)
+    ).select_related('product').order_by('quantity')
     
     context = {
         'today_revenue': today_revenue,
@@ -165,22 +162,17 @@ def inventory_overview(request):
     ).aggregate(total=Sum('value'))['total'] or 0
     
     # Tổng số sản phẩm khác nhau trong kho
-    unique_products = Stock.objects.filter(branch=branch).count()
+    levels = branch_stock_levels(branch.pk if branch else None)
+    unique_products = levels.stock_count
     
     # Tổng số lượng tất cả sản phẩm
-    total_quantity = Stock.objects.filter(branch=branch).aggregate(
-        total=Sum('quantity')
-    )['total'] or 0
+    total_quantity = levels.total_quantity
     
     # Sản phẩm hết hàng
-    out_of_stock = Stock.objects.filter(branch=branch, quantity=0).count()
+    out_of_stock = levels.out_of_stock_count
     
     # Sản phẩm sắp hết hàng
-    low_stock = Stock.objects.filter(
-        branch=branch, 
-        quantity__gt=0,
-        quantity__lte=F('min_quantity')
-    ).count()
+    low_stock = levels.running_low_count
     
     context = {
         'total_value': total_value,
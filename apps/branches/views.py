@@ -11,8 +11,11 @@ from datetime import datetime, timedelta
 from .models import Branch
 from apps.staff.models import StaffProfile, Performance
 from apps.orders.models import Order
+from apps.inventory.levels import branch_stock_levels
 from apps.inventory.models import Stock
 from apps.products.models import Product
+from apps.reports.rollups import order_rollups, item_rollups
+from apps.reports.timeseries import bucket_series
 
 
 @login_required
@@ -29,31 +32,24 @@ def manager_dashboard(request):
     current_month = today.replace(day=1)
     previous_month = (current_month - timedelta(days=1)).replace(day=1)
     
-    # Branch performance metrics
-    daily_sales = Order.objects.filter(
-        branch=branch,
-        created_at__date=today
-    ).aggregate(
-        total_amount=Sum('total_amount'),
-        count=Count('id')
+    # Branch performance metrics (đọc từ bảng tổng hợp theo ngày)
+    daily_sales = order_rollups(branch=branch, start=today, end=today).aggregate(
+        total_amount=Sum('order_total'),
+        count=Sum('order_count')
     )
     
-    monthly_sales = Order.objects.filter(
-        branch=branch,
-        created_at__date__gte=current_month,
-        created_at__date__lte=today
-    ).aggregate(
-        total_amount=Sum('total_amount'),
-        count=Count('id')
+    monthly_sales = order_rollups(branch=branch, start=current_month, end=today).aggregate(
+        total_amount=Sum('order_total'),
+        count=Sum('order_count')
     )
     
     # Calculate month-over-month growth
-    previous_monthly_sales = Order.objects.filter(
+    previous_monthly_sales = order_rollups(
         branch=branch,
-        created_at__date__gte=previous_month,
-        created_at__date__lt=current_month
+        start=previous_month,
+        end=current_month - timedelta(days=1)
     ).aggregate(
-        total_amount=Sum('total_amount')
+        total_amount=Sum('order_total')
     )
     
     if previous_monthly_sales['total_amount'] and monthly_sales['total_amount']:
@@ -62,12 +58,13 @@ def manager_dashboard(request):
     else:
         monthly_growth = 0
     
-    # Inventory status
-    inventory_status = Stock.objects.filter(branch=branch).aggregate(
-        total_products=Count('product', distinct=True),
-        low_stock=Count('id', filter=Q(quantity__lte=F('min_quantity'))),
-        out_of_stock=Count('id', filter=Q(quantity=0))
-    )
+    # Inventory status (số liệu tính sẵn, xem apps.inventory.levels)
+    levels = branch_stock_levels(branch.pk)
+    inventory_status = {
+        'total_products': levels.product_count,
+        'low_stock': levels.low_stock_count,
+        'out_of_stock': levels.out_of_stock_count,
+    }
     
     # Staff performance
     staff_members = StaffProfile.objects.filter(branch=branch)
@@ -80,32 +77,23 @@ def manager_dashboard(request):
     recent_orders = Order.objects.filter(branch=branch).order_by('-created_at')[:10]
     
     # Sales by category data for chart
-    sales_by_category = Order.objects.filter(
+    sales_by_category = item_rollups(
         branch=branch,
-        created_at__date__gte=current_month
-    ).values('items__product__category__name').annotate(
-        total=Sum(F('items__quantity') * F('items__price'))
+        start=current_month
+    ).values('category__name').annotate(
+        total=Sum('revenue')
     ).order_by('-total')
     
-    category_names = [item['items__product__category__name'] for item in sales_by_category if item['items__product__category__name']]
-    category_values = [float(item['total']) for item in sales_by_category if item['items__product__category__name']]
+    category_names = [item['category__name'] for item in sales_by_category]
+    category_values = [float(item['total']) for item in sales_by_category]
     
     # Daily sales data for chart (last 7 days)
-    daily_sales_data = []
-    daily_sales_dates = []
-    
-    for i in range(6, -1, -1):
-        date = today - timedelta(days=i)
-        daily_sales_dates.append(date.strftime('%d/%m'))
-        
-        day_sales = Order.objects.filter(
-            branch=branch,
-            created_at__date=date
-        ).aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
-        daily_sales_data.append(day_sales)
+    daily_series = bucket_series(
+        order_rollups(branch=branch), 'date', today - timedelta(days=6), today, 'day',
+        total=Sum('order_total')
+    )
+    daily_sales_dates = [row['period'].strftime('%d/%m') for row in daily_series]
+    daily_sales_data = [row['total'] for row in daily_series]
     
     context = {
         'branch': branch,
@@ -221,23 +209,19 @@ def manager_monthly_sales(request):
         created_at__date__lte=last_day
     ).order_by('-created_at')
     
-    monthly_total = orders.aggregate(
-        total_amount=Sum('total_amount'),
-        count=Count('id')
+    monthly_total = order_rollups(branch=branch, start=first_day, end=last_day).aggregate(
+        total_amount=Sum('order_total'),
+        count=Sum('order_count')
     )
     
     # Group by day for chart
-    daily_data = []
-    
-    for day in range(1, last_day.day + 1):
-        day_date = datetime(year, month, day).date()
-        day_orders = orders.filter(created_at__date=day_date)
-        day_total = day_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        daily_data.append({
-            'day': day,
-            'total': day_total,
-            'count': day_orders.count()
-        })
+    daily_data = [
+        {'day': row['period'].day, 'total': row['total'], 'count': row['count']}
+        for row in bucket_series(
+            order_rollups(branch=branch), 'date', first_day, last_day, 'day',
+            total=Sum('order_total'), count=Sum('order_count')
+        )
+    ]
     
     context = {
         'branch': branch,
@@ -281,32 +265,19 @@ def manager_yearly_sales(request):
         created_at__date__lte=last_day
     )
     
-    yearly_total = orders.aggregate(
-        total_amount=Sum('total_amount'),
-        count=Count('id')
+    yearly_total = order_rollups(branch=branch, start=first_day, end=last_day).aggregate(
+        total_amount=Sum('order_total'),
+        count=Sum('order_count')
     )
     
     # Group by month for chart
-    monthly_data = []
-    
-    for month in range(1, 13):
-        month_first_day = datetime(year, month, 1).date()
-        if month == 12:
-            month_last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            month_last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        month_orders = orders.filter(
-            created_at__date__gte=month_first_day,
-            created_at__date__lte=month_last_day
+    monthly_data = [
+        {'month': row['period'].strftime('%B'), 'total': row['total'], 'count': row['count']}
+        for row in bucket_series(
+            order_rollups(branch=branch), 'date', first_day, last_day, 'month',
+            total=Sum('order_total'), count=Sum('order_count')
         )
-        
-        month_total = month_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        monthly_data.append({
-            'month': month_first_day.strftime('%B'),
-            'total': month_total,
-            'count': month_orders.count()
-        })
+    ]
     
     context = {
         'branch': branch,
@@ -365,8 +336,7 @@ def manager_low_stock(request):
     
     # Get low stock items
     low_stock = Stock.objects.filter(
-        branch=branch,
-        quantity__lte=F('min_quantity')
+        pk__in=branch_stock_levels(branch.pk).low_stock_ids
     ).select_related('product', 'product__category')
     
     context = {
@@ -9,7 +9,8 @@ class StockAdmin(admin.ModelAdmin):
     list_display = ['product', 'branch', 'quantity', 'min_quantity', 'max_quantity', 'stock_status', 'updated_at']
     list_filter = ['branch', 'product__category']
     search_fields = ['product__name', 'product__sku']
-    readonly_fields = ['updated_at']
+    # Số lượng được tính từ sổ cái chuyển động kho, không sửa trực tiếp
+    readonly_fields = ['quantity', 'updated_at']
     autocomplete_fields = ['product', 'branch']
     
     def stock_status(self, obj):
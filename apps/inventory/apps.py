@@ -5,4 +5,7 @@ from django.utils.translation import gettext_lazy as _
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.inventory'
-    verbose_name = _('Quản lý kho') 
\ No newline at end of file
+    verbose_name = _('Quản lý kho')
+    
+    def ready(self):
+        import apps.inventory.signals
@@ -0,0 +1,110 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from apps.inventory.models import Stock
+
+
+# Tồn kho thay đổi liên tục nên chỉ cache trong thời gian ngắn
+AVAILABILITY_TIMEOUT = 30
+
+# Số id tối đa trong một lần tra cứu
+MAX_AVAILABILITY_IDS = 500
+
+
+def _product_key(product_id):
+    return f'inventory:availability:p:{product_id}'
+
+
+def _variant_key(variant_id):
+    return f'inventory:availability:v:{variant_id}'
+
+
+def _load_rows(product_ids, variant_ids):
+    """Đọc các dòng tồn kho của các sản phẩm/biến thể trong một truy vấn"""
+    condition = Q()
+    if product_ids:
+        condition |= Q(product_id__in=product_ids)
+    if variant_ids:
+        condition |= Q(variant_id__in=variant_ids)
+    return list(Stock.objects.filter(condition).values_list(
+        'product_id', 'variant_id', 'branch_id', 'branch__name',
+        'product__sku', 'variant__sku', 'quantity',
+    ))
+
+
+def _cached_rows(product_ids, variant_ids):
+    """
+    Các dòng tồn kho của sản phẩm/biến thể, lấy từ cache theo từng id; các id
+    chưa có trong cache được đọc chung trong một truy vấn rồi ghi lại cache.
+    """
+    keys = {_product_key(pk): ('p', pk) for pk in product_ids}
+    keys.update({_variant_key(pk): ('v', pk) for pk in variant_ids})
+    cached = cache.get_many(keys)
+
+    missing_products = [pk for key, (kind, pk) in keys.items() if kind == 'p' and key not in cached]
+    missing_variants = [pk for key, (kind, pk) in keys.items() if kind == 'v' and key not in cached]
+    if missing_products or missing_variants:
+        loaded = {_product_key(pk): [] for pk in missing_products}
+        loaded.update({_variant_key(pk): [] for pk in missing_variants})
+        for row in _load_rows(missing_products, missing_variants):
+            for key in (_product_key(row[0]), _variant_key(row[1])):
+                if key in loaded:
+                    loaded[key].append(row)
+        cache.set_many(loaded, AVAILABILITY_TIMEOUT)
+        cached.update(loaded)
+
+    rows = {}
+    for group in cached.values():
+        for row in group:
+            # Một dòng có thể nằm trong cả nhóm sản phẩm và nhóm biến thể
+            rows[(row[0], row[1], row[2])] = row
+    return rows.values()
+
+
+def stock_availability(product_ids=(), variant_ids=(), branch_ids=None):
+    """
+    Ma trận tồn kho chi nhánh × SKU cho nhiều sản phẩm/biến thể cùng lúc.
+
+    Trả về `{'branches': [{'id', 'name'}], 'items': [{'product_id', 'variant_id',
+    'sku', 'total', 'branches': {branch_id: số lượng}}]}`. Sản phẩm được yêu cầu
+    sẽ gồm mọi biến thể của nó; SKU không có dòng tồn kho nào thì không xuất hiện.
+    """
+    product_ids = sorted({int(pk) for pk in product_ids})
+    variant_ids = sorted({int(pk) for pk in variant_ids})
+    if branch_ids is not None:
+        branch_ids = {int(pk) for pk in branch_ids}
+
+    branches = {}
+    items = {}
+    for product_id, variant_id, branch_id, branch_name, product_sku, variant_sku, quantity in _cached_rows(
+        product_ids, variant_ids
+    ):
+        if branch_ids is not None and branch_id not in branch_ids:
+            continue
+        branches[branch_id] = branch_name
+        item = items.setdefault((product_id, variant_id), {
+            'product_id': product_id,
+            'variant_id': variant_id,
+            'sku': variant_sku or product_sku,
+            'total': 0,
+            'branches': {},
+        })
+        item['branches'][branch_id] = quantity
+        item['total'] += quantity
+
+    return {
+        'branches': [
+            {'id': pk, 'name': name}
+            for pk, name in sorted(branches.items(), key=lambda b: (b[1], b[0]))
+        ],
+        'items': [items[key] for key in sorted(items, key=lambda k: (k[0], k[1] or 0))],
+    }
+
+
+def invalidate_availability(product_ids=(), variant_ids=()):
+    """Xóa cache tồn kho của các sản phẩm/biến thể sau khi giao dịch hiện tại commit"""
+    keys = [_product_key(pk) for pk in set(product_ids)]
+    keys += [_variant_key(pk) for pk in set(variant_ids) if pk]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
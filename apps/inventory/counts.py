@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Q, Sum
+from django.utils import timezone
+
+from apps.inventory.models import Inventory, InventoryItem, Stock
+from apps.inventory.services import apply_stock_counts
+from core.db import serialized_write
+
+
+# Số dòng kiểm kê ghi mỗi lần `bulk_create`
+COUNT_SHEET_BATCH_SIZE = 2000
+
+OPEN_STATUSES = ('DRAFT', 'IN_PROGRESS')
+
+DIFFERENCE = ExpressionWrapper(F('actual_quantity') - F('expected_quantity'), output_field=IntegerField())
+
+
+def open_count_sheet(inventory):
+    """
+    Tạo các dòng kiểm kê từ tồn kho hiện tại của chi nhánh.
+
+    Tồn kho được đọc dạng stream và ghi theo lô bằng `bulk_create`, nên một
+    chi nhánh 20k SKU chỉ tốn vài chục truy vấn thay vì một truy vấn mỗi dòng.
+    """
+    rows = Stock.objects.filter(branch_id=inventory.branch_id).values_list(
+        'product_id', 'variant_id', 'quantity'
+    ).iterator(chunk_size=COUNT_SHEET_BATCH_SIZE)
+    batch = []
+    count = 0
+    with transaction.atomic():
+        for product_id, variant_id, quantity in rows:
+            batch.append(InventoryItem(
+                inventory=inventory,
+                product_id=product_id,
+                variant_id=variant_id,
+                expected_quantity=quantity,
+                actual_quantity=0,  # Mặc định 0, sẽ được cập nhật khi kiểm kê
+            ))
+            if len(batch) >= COUNT_SHEET_BATCH_SIZE:
+                InventoryItem.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        InventoryItem.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def count_sheet_items(inventory):
+    """Các dòng kiểm kê kèm chênh lệch `difference` (thực tế - hệ thống) tính trong SQL"""
+    return InventoryItem.objects.filter(inventory=inventory).select_related(
+        'product', 'variant'
+    ).annotate(difference=DIFFERENCE)
+
+
+def discrepancy_summary(inventory):
+    """Tổng hợp chênh lệch của phiếu kiểm kê trong một truy vấn"""
+    summary = InventoryItem.objects.filter(inventory=inventory).aggregate(
+        items=Count('id'),
+        mismatched=Count('id', filter=~Q(actual_quantity=F('expected_quantity'))),
+        surplus=Sum(DIFFERENCE, filter=Q(actual_quantity__gt=F('expected_quantity'))),
+        shortage=Sum(DIFFERENCE, filter=Q(actual_quantity__lt=F('expected_quantity'))),
+    )
+    summary['surplus'] = summary['surplus'] or 0
+    summary['shortage'] = summary['shortage'] or 0
+    summary['total_discrepancy'] = summary['surplus'] + summary['shortage']
+    return summary
+
+
+@serialized_write
+def complete_count_sheet(inventory, staff=None):
+    """
+    Hoàn thành phiếu kiểm kê và đưa tồn kho về số lượng thực tế trong một giao dịch.
+
+    Phiếu được "nhận" bằng UPDATE có điều kiện trạng thái, nên hai người bấm
+    hoàn thành cùng lúc chỉ điều chỉnh tồn kho một lần. Trả về danh sách
+    chuyển động điều chỉnh, hoặc None nếu phiếu không còn mở.
+    """
+    completed_at = timezone.now()
+    with transaction.atomic():
+        claimed = Inventory.objects.filter(pk=inventory.pk, status__in=OPEN_STATUSES).update(
+            status='COMPLETED',
+            completed_at=completed_at,
+        )
+        if not claimed:
+            return None
+        inventory.status = 'COMPLETED'
+        inventory.completed_at = completed_at
+
+        counts = {
+            (product_id, variant_id): quantity
+            for product_id, variant_id, quantity in InventoryItem.objects.filter(
+                inventory=inventory
+            ).values_list('product_id', 'variant_id', 'actual_quantity')
+        }
+        return apply_stock_counts(
+            inventory.branch_id,
+            counts,
+            staff=staff,
+            reference=f'Kiểm kê #{inventory.inventory_number}',
+            notes=f'Điều chỉnh sau kiểm kê #{inventory.inventory_number}',
+            created_at=completed_at,
+        )
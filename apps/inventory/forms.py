@@ -69,12 +69,18 @@ class StockMovementForm(forms.ModelForm):
                 self.add_error('from_branch', _('Chi nhánh nguồn là bắt buộc khi chuyển kho'))
             if not to_branch:
                 self.add_error('to_branch', _('Chi nhánh đích là bắt buộc khi chuyển kho'))
-        elif movement_type == 'IN':
+            if from_branch and from_branch == to_branch:
+                self.add_error('to_branch', _('Chi nhánh đích phải khác chi nhánh nguồn'))
+        elif movement_type in ('IN', 'RETURN'):
             if not to_branch:
                 self.add_error('to_branch', _('Chi nhánh đích là bắt buộc khi nhập kho'))
         elif movement_type == 'OUT':
             if not from_branch:
                 self.add_error('from_branch', _('Chi nhánh nguồn là bắt buộc khi xuất kho'))
+        elif movement_type == 'ADJUSTMENT':
+            # Điều chỉnh giảm ghi ở chi nhánh nguồn, điều chỉnh tăng ghi ở chi nhánh đích
+            if bool(from_branch) == bool(to_branch):
+                self.add_error('from_branch', _('Chọn chi nhánh nguồn (giảm) hoặc chi nhánh đích (tăng) khi điều chỉnh'))
         
         return cleaned_data
 
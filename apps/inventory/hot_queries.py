@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.inventory.models import Stock, StockMovement
+from core.db.explain import hot_query
+
+
+@hot_query('inventory.recent_movements')
+def recent_movements():
+    return StockMovement.objects.order_by('-created_at')[:10]
+
+
+@hot_query('inventory.movements_by_type')
+def movements_by_type():
+    return StockMovement.objects.filter(movement_type='IN').order_by('-created_at')[:20]
+
+
+@hot_query('inventory.branch_activity')
+def branch_activity():
+    return StockMovement.objects.filter(Q(from_branch_id=1) | Q(to_branch_id=1)).order_by('-created_at')[:10]
+
+
+@hot_query('inventory.ledger_since_snapshot')
+def ledger_since_snapshot():
+    now = timezone.now()
+    return StockMovement.objects.filter(
+        to_branch_id=1, created_at__gt=now - timedelta(days=1), created_at__lte=now
+    ).values('product_id', 'variant_id', 'quantity')
+
+
+@hot_query('inventory.branch_stock')
+def branch_stock():
+    return Stock.objects.filter(branch_id=1).order_by('quantity')
+
+
+@hot_query('inventory.branch_low_stock')
+def branch_low_stock():
+    return Stock.objects.filter(
+        branch_id=1, quantity__gt=0, quantity__lte=F('min_quantity')
+    ).order_by('quantity')
+
+
+@hot_query('inventory.availability')
+def availability():
+    return Stock.objects.filter(product_id__in=[1, 2, 3]).values_list('product_id', 'branch_id', 'quantity')
+
+
+@hot_query('inventory.levels_low_stock')
+def levels_low_stock():
+    # StockLevels.lowest_stock_ids / low_stock_count
+    return Stock.objects.filter(branch_id__in=[1, 2], quantity__lte=F('min_quantity')).order_by('quantity', 'pk')[:10]
+
+
+@hot_query('inventory.levels_out_of_stock')
+def levels_out_of_stock():
+    return Stock.objects.filter(branch_id__in=[1, 2], quantity=0).values_list('pk', flat=True)
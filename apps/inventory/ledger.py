@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.inventory.models import Stock, StockMovement, StockSnapshot, StockSnapshotItem
+from apps.inventory.services import notify_stock_updated
+
+
+def latest_snapshot(branch_id, when=None):
+    """Ảnh chụp gần nhất của chi nhánh tại hoặc trước thời điểm `when`"""
+    snapshots = StockSnapshot.objects.filter(branch_id=branch_id)
+    if when is not None:
+        snapshots = snapshots.filter(taken_at__lte=when)
+    return snapshots.order_by('-taken_at').first()
+
+
+def stock_as_of(branch_id, when=None, product_ids=None):
+    """
+    Tồn kho của chi nhánh tại thời điểm `when` (mặc định là hiện tại), tính từ
+    sổ cái: ảnh chụp gần nhất trước `when` cộng các chuyển động từ đó đến `when`.
+
+    Trả về {(product_id, variant_id): số lượng}, bỏ các dòng bằng 0. Sổ cái chỉ
+    ghi thêm, nên chuyển động không được sửa/xóa hay ghi lùi ngày về trước ảnh chụp.
+    """
+    when = when or timezone.now()
+    snapshot = latest_snapshot(branch_id, when)
+    levels = Counter()
+
+    if snapshot is not None:
+        items = StockSnapshotItem.objects.filter(snapshot=snapshot)
+        if product_ids is not None:
+            items = items.filter(product_id__in=product_ids)
+        for product_id, variant_id, quantity in items.values_list('product_id', 'variant_id', 'quantity'):
+            levels[(product_id, variant_id)] = quantity
+
+    movements = StockMovement.objects.filter(created_at__lte=when)
+    if snapshot is not None:
+        movements = movements.filter(created_at__gt=snapshot.taken_at)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    for field, sign in (('to_branch_id', 1), ('from_branch_id', -1)):
+        rows = movements.filter(**{field: branch_id}).order_by().values_list(
+            'product_id', 'variant_id'
+        ).annotate(total=Sum('quantity'))
+        for product_id, variant_id, total in rows:
+            levels[(product_id, variant_id)] += sign * total
+
+    return {key: quantity for key, quantity in levels.items() if quantity}
+
+
+def take_snapshot(branch_id, taken_at=None):
+    """Lưu tồn kho của chi nhánh tại `taken_at` (tính từ sổ cái) làm mốc mới"""
+    taken_at = taken_at or timezone.now()
+    levels = stock_as_of(branch_id, taken_at)
+    with transaction.atomic():
+        snapshot = StockSnapshot.objects.create(branch_id=branch_id, taken_at=taken_at)
+        StockSnapshotItem.objects.bulk_create([
+            StockSnapshotItem(snapshot=snapshot, product_id=product_id, variant_id=variant_id, quantity=quantity)
+            for (product_id, variant_id), quantity in levels.items()
+            if quantity > 0
+        ], batch_size=1000)
+    return snapshot
+
+
+def stock_drift(branch_id):
+    """
+    So sánh `Stock.quantity` với tồn kho tính từ sổ cái.
+
+    Trả về danh sách (product_id, variant_id, số lượng trong Stock, số lượng theo sổ cái)
+    của các dòng bị lệch.
+    """
+    ledger = stock_as_of(branch_id)
+    drift = []
+    for product_id, variant_id, quantity in Stock.objects.filter(branch_id=branch_id).values_list(
+        'product_id', 'variant_id', 'quantity'
+    ):
+        expected = ledger.pop((product_id, variant_id), 0)
+        if quantity != expected:
+            drift.append((product_id, variant_id, quantity, expected))
+    # Còn trong sổ cái nhưng chưa có dòng Stock
+    drift.extend((product_id, variant_id, 0, quantity) for (product_id, variant_id), quantity in ledger.items())
+    return drift
+
+
+def rebuild_stock(branch_id):
+    """Ghi lại `Stock.quantity` của chi nhánh theo sổ cái; trả về danh sách các dòng đã sửa"""
+    with transaction.atomic():
+        drift = stock_drift(branch_id)
+        if not drift:
+            return drift
+        expected = {(product_id, variant_id): quantity for product_id, variant_id, _current, quantity in drift}
+        stocks = {
+            (stock.product_id, stock.variant_id): stock
+            for stock in Stock.objects.select_for_update().filter(
+                branch_id=branch_id, product_id__in={key[0] for key in expected}
+            )
+        }
+        to_update, to_create = [], []
+        quantity_deltas, row_deltas = defaultdict(int), defaultdict(int)
+        for key, quantity in expected.items():
+            stock = stocks.get(key)
+            if stock is None:
+                to_create.append(Stock(branch_id=branch_id, product_id=key[0], variant_id=key[1], quantity=max(quantity, 0)))
+                quantity_deltas[(branch_id, key[0])] += max(quantity, 0)
+                row_deltas[(branch_id, key[0])] += 1
+            else:
+                quantity_deltas[(branch_id, key[0])] += max(quantity, 0) - stock.quantity
+                stock.quantity = max(quantity, 0)
+                to_update.append(stock)
+        Stock.objects.bulk_update(to_update, ['quantity'], batch_size=1000)
+        Stock.objects.bulk_create(to_create, batch_size=1000)
+        notify_stock_updated(
+            [key[0] for key in expected], [key[1] for key in expected if key[1]],
+            quantity_deltas=quantity_deltas, row_deltas=row_deltas,
+        )
+    return drift
@@ -0,0 +1,261 @@
+import hashlib
+import time
+from collections import Counter
+from functools import cached_property
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from apps.branches.models import Branch
+from apps.inventory.models import Stock
+from apps.products.models import Product
+from apps.products.tree import get_category_node, get_category_tree
+
+
+# Bộ đếm tự dựng lại định kỳ để không lệch mãi nếu có cập nhật bỏ qua signal
+LEVELS_TIMEOUT = 60 * 60
+
+PRODUCT_COUNT_VERSION_KEY = 'inventory:levels:product_count_version'
+
+# Backend có `incr` nguyên tử. FileBasedCache/DatabaseCache cộng bằng đọc rồi ghi,
+# hai tiến trình cộng cùng lúc sẽ mất một thay đổi, nên không giữ bộ đếm trên đó
+ATOMIC_INCR_BACKENDS = (LocMemCache, RedisCache, BaseMemcachedCache)
+
+
+def counters_enabled():
+    """Bộ đếm trong cache chỉ dùng khi backend cộng nguyên tử; nếu không thì tổng hợp thẳng từ DB"""
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], ATOMIC_INCR_BACKENDS)
+
+
+def _key(branch_id, name):
+    return f'inventory:levels:{branch_id}:{name}'
+
+
+def _category_name(category_id):
+    return f'category:{category_id or 0}'
+
+
+def _counter_keys(branch_id):
+    """Khóa của mọi bộ đếm một chi nhánh: tổng số lượng, số dòng, tổng theo từng danh mục"""
+    names = ['quantity', 'stocks', _category_name(None)]
+    names += [_category_name(category_id) for category_id in get_category_tree()['nodes']]
+    return {name: _key(branch_id, name) for name in names}
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def _generation(branch_id):
+    """
+    Thế hệ bộ đếm của chi nhánh, tăng mỗi khi một thay đổi không ghi được
+    vào bộ đếm (chưa có hoặc đang dựng lại) hoặc khi bị xóa bằng `invalidate_stock_levels`.
+    """
+    key = _key(branch_id, 'generation')
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def _aggregate(branch_ids):
+    """Tổng số lượng, số dòng và tổng theo danh mục của các chi nhánh, bằng một truy vấn GROUP BY"""
+    counters = {branch_id: {'quantity': 0, 'stocks': 0} for branch_id in branch_ids}
+    rows = Stock.objects.filter(branch_id__in=branch_ids).values('branch_id', 'product__category').annotate(
+        quantity=Sum('quantity'), stocks=Count('id'),
+    ).order_by()
+    for row in rows:
+        values = counters[row['branch_id']]
+        values['quantity'] += row['quantity'] or 0
+        values['stocks'] += row['stocks']
+        values[_category_name(row['product__category'])] = row['quantity'] or 0
+    return counters
+
+
+def _build(branch_id, keys):
+    """
+    Dựng lại bộ đếm của chi nhánh từ DB.
+
+    Bộ đếm cũ bị xóa trước khi đọc DB: thay đổi commit trong lúc dựng không
+    cộng được (`incr` lỗi) nên tăng thế hệ, và lần đọc sau sẽ dựng lại. Bản
+    dựng chỉ được dùng khi thế hệ không đổi (`built` = `generation`).
+    """
+    generation = _generation(branch_id)
+    cache.delete_many(keys.values())
+    counters = dict.fromkeys(keys, 0)
+    counters.update(_aggregate([branch_id])[branch_id])
+    values = {keys[name]: value for name, value in counters.items() if name in keys}
+    values[_key(branch_id, 'built')] = generation
+    cache.set_many(values, LEVELS_TIMEOUT)
+    return counters
+
+
+def _counters(branch_ids):
+    """Bộ đếm của các chi nhánh; chi nhánh chưa có (hoặc đã cũ) trong cache thì dựng lại"""
+    if not counters_enabled():
+        return _aggregate(branch_ids)
+    branch_keys = {branch_id: _counter_keys(branch_id) for branch_id in branch_ids}
+    cached = cache.get_many([
+        key
+        for branch_id, keys in branch_keys.items()
+        for key in [*keys.values(), _key(branch_id, 'built'), _key(branch_id, 'generation')]
+    ])
+    counters = {}
+    for branch_id, keys in branch_keys.items():
+        built = cached.get(_key(branch_id, 'built'))
+        if built is not None and built == cached.get(_key(branch_id, 'generation')) and all(
+            key in cached for key in keys.values()
+        ):
+            counters[branch_id] = {name: cached[key] for name, key in keys.items()}
+        else:
+            counters[branch_id] = _build(branch_id, keys)
+    return counters
+
+
+class StockLevels:
+    """
+    Số liệu tồn kho của một hoặc nhiều chi nhánh.
+
+    Tổng số lượng, số dòng và tổng theo danh mục đọc từ bộ đếm trong cache (hoặc
+    tổng hợp từ DB khi backend không cộng nguyên tử, xem `counters_enabled`); các
+    dòng sắp hết/hết hàng lấy bằng truy vấn trên chỉ mục (branch, quantity),
+    chỉ đọc các dòng đó thay vì cả chi nhánh. `low_stock_ids` gồm cả các dòng
+    hết hàng (quantity <= min_quantity); `running_low_ids` chỉ gồm các dòng còn
+    hàng nhưng dưới mức tối thiểu.
+    """
+
+    def __init__(self, branch_ids, counters):
+        self.branch_ids = list(branch_ids)
+        self.total_quantity = 0
+        self.stock_count = 0
+        self.category_totals = Counter()
+        for values in counters:
+            self.total_quantity += values['quantity']
+            self.stock_count += values['stocks']
+            for name, quantity in values.items():
+                if name.startswith('category:') and quantity:
+                    self.category_totals[int(name.split(':')[1]) or None] += quantity
+
+    def _stocks(self):
+        return Stock.objects.filter(branch_id__in=self.branch_ids)
+
+    @property
+    def low_stock_ids(self):
+        return self._stocks().filter(quantity__lte=F('min_quantity')).values_list('pk', flat=True)
+
+    @property
+    def running_low_ids(self):
+        return self._stocks().filter(quantity__gt=0, quantity__lte=F('min_quantity')).values_list('pk', flat=True)
+
+    @property
+    def out_of_stock_ids(self):
+        return self._stocks().filter(quantity=0).values_list('pk', flat=True)
+
+    @cached_property
+    def low_stock_count(self):
+        return self.low_stock_ids.count()
+
+    @cached_property
+    def running_low_count(self):
+        return self.running_low_ids.count()
+
+    @cached_property
+    def out_of_stock_count(self):
+        return self.out_of_stock_ids.count()
+
+    @cached_property
+    def product_count(self):
+        """Số sản phẩm khác nhau có dòng tồn kho; chỉ đếm lại khi có dòng được tạo/xóa"""
+        version = cache.get(PRODUCT_COUNT_VERSION_KEY, 0)
+        digest = hashlib.md5(','.join(map(str, sorted(self.branch_ids))).encode()).hexdigest()
+        key = f'inventory:levels:product_count:{version}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = self._stocks().values('product_id').distinct().count()
+            cache.set(key, count, LEVELS_TIMEOUT)
+        return count
+
+    def lowest_stock_ids(self, limit=10):
+        """Id các dòng sắp hết có số lượng thấp nhất, để lấy chi tiết bằng `pk__in`"""
+        return list(self.low_stock_ids.order_by('quantity', 'pk')[:limit])
+
+    def category_breakdown(self, limit=None):
+        """Danh sách (tên danh mục, tổng số lượng) giảm dần; tên lấy từ cây danh mục trong cache"""
+        rows = []
+        for category_id, quantity in self.category_totals.most_common(limit):
+            node = get_category_node(category_id) if category_id else None
+            rows.append((node['name'] if node else None, quantity))
+        return rows
+
+
+def branch_stock_levels(branch_id):
+    """Số liệu tồn kho của một chi nhánh (xem `StockLevels`)"""
+    if branch_id is None:
+        return StockLevels([], [])
+    return StockLevels([branch_id], _counters([branch_id]).values())
+
+
+def stock_levels(branch_ids=None):
+    """Số liệu tồn kho gộp của nhiều chi nhánh (mặc định là toàn bộ chi nhánh)"""
+    if branch_ids is None:
+        branch_ids = list(Branch.objects.values_list('id', flat=True))
+    return StockLevels(branch_ids, _counters(branch_ids).values())
+
+
+def record_stock_changes(quantity_deltas, row_deltas=None):
+    """
+    Cộng thay đổi tồn kho vào bộ đếm sau khi giao dịch commit.
+
+    `quantity_deltas` = {(branch_id, product_id): số lượng +/-}, `row_deltas` =
+    {(branch_id, product_id): số dòng `Stock` +/-}. Mỗi bộ đếm được cộng riêng
+    bằng `cache.incr`, không đọc-sửa-ghi cả trạng thái chi nhánh; bộ đếm chưa có
+    thì tăng thế hệ để lần đọc sau dựng lại. Chỉ chạy khi `counters_enabled()`:
+    trên backend khác, `incr` không nguyên tử giữa các tiến trình.
+    """
+    row_deltas = {key: delta for key, delta in (row_deltas or {}).items() if delta}
+    keys = {key for key, delta in quantity_deltas.items() if delta} | set(row_deltas)
+    if not keys:
+        return
+
+    def apply():
+        if row_deltas:
+            _bump(PRODUCT_COUNT_VERSION_KEY)
+        if not counters_enabled():
+            return
+        categories = dict(Product.objects.filter(
+            pk__in={product_id for _branch_id, product_id in keys}
+        ).values_list('pk', 'category_id'))
+        counters = Counter()
+        for branch_id, product_id in keys:
+            quantity = quantity_deltas.get((branch_id, product_id), 0)
+            counters[(branch_id, 'quantity')] += quantity
+            counters[(branch_id, _category_name(categories.get(product_id)))] += quantity
+            counters[(branch_id, 'stocks')] += row_deltas.get((branch_id, product_id), 0)
+        stale = set()
+        for (branch_id, name), delta in counters.items():
+            if not delta or branch_id in stale:
+                continue
+            try:
+                cache.incr(_key(branch_id, name), delta)
+            except ValueError:
+                stale.add(branch_id)
+        for branch_id in stale:
+            _bump(_key(branch_id, 'generation'))
+    transaction.on_commit(apply)
+
+
+def invalidate_stock_levels(branch_ids=None):
+    """Bỏ bộ đếm (ví dụ khi sản phẩm đổi danh mục); lần đọc sau sẽ dựng lại"""
+    if branch_ids is None:
+        branch_ids = list(Branch.objects.values_list('id', flat=True))
+
+    def apply():
+        for branch_id in branch_ids:
+            _bump(_key(branch_id, 'generation'))
+        _bump(PRODUCT_COUNT_VERSION_KEY)
+    transaction.on_commit(apply)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.branches.models import Branch
+from apps.inventory.ledger import rebuild_stock, stock_drift
+
+
+class Command(BaseCommand):
+    help = 'So sánh tồn kho với sổ cái chuyển động kho; --fix để ghi lại tồn kho theo sổ cái'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Chỉ kiểm tra chi nhánh này (có thể lặp lại)')
+        parser.add_argument('--fix', action='store_true', help='Sửa các dòng bị lệch theo sổ cái')
+
+    def handle(self, *args, **options):
+        branch_ids = options['branch'] or list(Branch.objects.values_list('id', flat=True))
+        total = 0
+        for branch_id in branch_ids:
+            drift = rebuild_stock(branch_id) if options['fix'] else stock_drift(branch_id)
+            total += len(drift)
+            for product_id, variant_id, current, expected in drift:
+                self.stdout.write(
+                    f'Chi nhánh #{branch_id}, sản phẩm #{product_id}'
+                    f'{f" (biến thể #{variant_id})" if variant_id else ""}: tồn kho {current}, sổ cái {expected}'
+                )
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Tồn kho khớp với sổ cái.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Đã sửa {total} dòng tồn kho theo sổ cái.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{total} dòng tồn kho lệch với sổ cái.'))
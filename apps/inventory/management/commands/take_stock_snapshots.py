@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.branches.models import Branch
+from apps.inventory.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Chụp tồn kho của các chi nhánh từ sổ cái (chạy định kỳ, ví dụ mỗi đêm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, action='append', help='Chỉ chụp chi nhánh này (có thể lặp lại)')
+
+    def handle(self, *args, **options):
+        branch_ids = options['branch'] or list(Branch.objects.values_list('id', flat=True))
+        for branch_id in branch_ids:
+            snapshot = take_snapshot(branch_id)
+            self.stdout.write(f'Chi nhánh #{branch_id}: {snapshot.items.count()} dòng tồn kho.')
+        self.stdout.write(self.style.SUCCESS(f'Đã chụp tồn kho {len(branch_ids)} chi nhánh.'))
@@ -0,0 +1,100 @@
+# Generated by Django 5.2 on 2026-10-17 17:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_snapshots(apps, schema_editor):
+    """Tồn kho hiện tại làm số dư đầu kỳ của sổ cái: mỗi chi nhánh một ảnh chụp"""
+    Stock = apps.get_model('inventory', 'Stock')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    StockSnapshotItem = apps.get_model('inventory', 'StockSnapshotItem')
+    now = timezone.now()
+    snapshots = {}
+    items = []
+    for stock in Stock.objects.filter(quantity__gt=0).only('branch_id', 'product_id', 'variant_id', 'quantity'):
+        if stock.branch_id not in snapshots:
+            snapshots[stock.branch_id] = StockSnapshot.objects.create(branch_id=stock.branch_id, taken_at=now)
+        items.append(StockSnapshotItem(
+            snapshot=snapshots[stock.branch_id],
+            product_id=stock.product_id,
+            variant_id=stock.variant_id,
+            quantity=stock.quantity,
+        ))
+    StockSnapshotItem.objects.bulk_create(items, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('inventory', '0005_alter_inventoryitem_unique_together_and_more'),
+        ('products', '0005_productfacet'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='Tồn kho tại thời điểm')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+            ],
+            options={
+                'verbose_name': 'Ảnh chụp tồn kho',
+                'verbose_name_plural': 'Ảnh chụp tồn kho',
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Số lượng')),
+            ],
+            options={
+                'verbose_name': 'Chi tiết ảnh chụp tồn kho',
+                'verbose_name_plural': 'Chi tiết ảnh chụp tồn kho',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['to_branch', 'created_at'], name='movement_to_branch_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['from_branch', 'created_at'], name='movement_from_branch_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='branches.branch', verbose_name='Chi nhánh'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Sản phẩm'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotitem',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='inventory.stocksnapshot', verbose_name='Ảnh chụp'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotitem',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.productvariant', verbose_name='Biến thể'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['branch', 'taken_at'], name='snapshot_branch_time_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stocksnapshotitem',
+            unique_together={('snapshot', 'product', 'variant')},
+        ),
+        migrations.RunPython(opening_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 17:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scan_id', models.CharField(max_length=64, verbose_name='Mã lần quét')),
+                ('sku', models.CharField(max_length=50, verbose_name='Mã SKU')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Số lượng')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời gian')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scans', to='inventory.inventory', verbose_name='Phiếu kiểm kê')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scans', to='inventory.inventoryitem', verbose_name='Chi tiết kiểm kê')),
+                ('scanned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_scans', to=settings.AUTH_USER_MODEL, verbose_name='Người quét')),
+            ],
+            options={
+                'verbose_name': 'Lần quét kiểm kê',
+                'verbose_name_plural': 'Lần quét kiểm kê',
+                'unique_together': {('inventory', 'scan_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-17 17:54
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('inventory', '0007_inventoryscan'),
+        ('products', '0005_productfacet'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='in_transit',
+            field=models.PositiveIntegerField(default=0, verbose_name='Đang chuyển đến'),
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transfer_number', models.CharField(max_length=50, unique=True, verbose_name='Mã phiếu chuyển')),
+                ('status', models.CharField(choices=[('DRAFT', 'Nháp'), ('IN_TRANSIT', 'Đang chuyển'), ('RECEIVED', 'Đã nhận'), ('CANCELLED', 'Đã hủy')], default='DRAFT', max_length=20, verbose_name='Trạng thái')),
+                ('notes', models.TextField(blank=True, verbose_name='Ghi chú')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ngày tạo')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Ngày xuất')),
+                ('received_at', models.DateTimeField(blank=True, null=True, verbose_name='Ngày nhận')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_transfers', to=settings.AUTH_USER_MODEL, verbose_name='Người tạo')),
+                ('dispatched_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dispatched_transfers', to=settings.AUTH_USER_MODEL, verbose_name='Người xuất')),
+                ('from_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_transfers', to='branches.branch', verbose_name='Chi nhánh nguồn')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='received_transfers', to=settings.AUTH_USER_MODEL, verbose_name='Người nhận')),
+                ('to_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_transfers', to='branches.branch', verbose_name='Chi nhánh đích')),
+            ],
+            options={
+                'verbose_name': 'Phiếu chuyển kho',
+                'verbose_name_plural': 'Phiếu chuyển kho',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransferItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Số lượng chuyển')),
+                ('received_quantity', models.PositiveIntegerField(default=0, verbose_name='Số lượng nhận')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfer_items', to='products.product', verbose_name='Sản phẩm')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='inventory.stocktransfer', verbose_name='Phiếu chuyển')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfer_items', to='products.productvariant', verbose_name='Biến thể')),
+            ],
+            options={
+                'verbose_name': 'Chi tiết phiếu chuyển',
+                'verbose_name_plural': 'Chi tiết phiếu chuyển',
+                'unique_together': {('transfer', 'product', 'variant')},
+            },
+        ),
+    ]
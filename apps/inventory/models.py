@@ -3,6 +3,8 @@ from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 
+from apps.sequences.services import next_number
+
 
 class Stock(models.Model):
     """Tồn kho sản phẩm tại chi nhánh"""
@@ -27,6 +29,7 @@ class Stock(models.Model):
         verbose_name=_("Chi nhánh")
     )
     quantity = models.PositiveIntegerField(_("Số lượng"), default=0)
+    in_transit = models.PositiveIntegerField(_("Đang chuyển đến"), default=0)
     min_quantity = models.PositiveIntegerField(_("Số lượng tối thiểu"), default=5)
     max_quantity = models.PositiveIntegerField(_("Số lượng tối đa"), default=100)
     updated_at = models.DateTimeField(_("Cập nhật lúc"), auto_now=True)
@@ -35,6 +38,15 @@ class Stock(models.Model):
         verbose_name = _("Tồn kho")
         verbose_name_plural = _("Tồn kho")
         unique_together = ('product', 'variant', 'branch')
+        indexes = [
+            models.Index(fields=['branch', 'quantity'], name='stock_branch_quantity_idx'),
+            # Chỉ chứa các dòng sắp hết (quantity <= min_quantity): danh sách cảnh báo của chi nhánh
+            models.Index(
+                fields=['branch', 'quantity'],
+                condition=models.Q(quantity__lte=models.F('min_quantity')),
+                name='stock_branch_low_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.branch.name}: {self.quantity}"
@@ -107,6 +119,14 @@ class StockMovement(models.Model):
         verbose_name = _("Chuyển động kho")
         verbose_name_plural = _("Chuyển động kho")
         ordering = ['-created_at']
+        indexes = [
+            # Tính tồn kho theo sổ cái: chuyển động vào/ra một chi nhánh sau một thời điểm
+            models.Index(fields=['to_branch', 'created_at'], name='movement_to_branch_time_idx'),
+            models.Index(fields=['from_branch', 'created_at'], name='movement_from_branch_time_idx'),
+            # Danh sách nhập/xuất/chuyển kho và hoạt động gần đây
+            models.Index(fields=['movement_type', 'created_at'], name='movement_type_time_idx'),
+            models.Index(fields=['created_at'], name='movement_time_idx'),
+        ]
     
     def __str__(self):
         if self.movement_type == 'TRANSFER':
@@ -119,6 +139,161 @@ class StockMovement(models.Model):
             return f"{self.get_movement_type_display()}: {self.product.name} ({self.quantity})"
 
 
+class StockTransfer(models.Model):
+    """Phiếu chuyển kho giữa hai chi nhánh: xuất kho (hàng đang chuyển) rồi nhận hàng"""
+    STATUS_CHOICES = (
+        ('DRAFT', _('Nháp')),
+        ('IN_TRANSIT', _('Đang chuyển')),
+        ('RECEIVED', _('Đã nhận')),
+        ('CANCELLED', _('Đã hủy')),
+    )
+    
+    transfer_number = models.CharField(_("Mã phiếu chuyển"), max_length=50, unique=True)
+    from_branch = models.ForeignKey(
+        'branches.Branch',
+        on_delete=models.CASCADE,
+        related_name='outgoing_transfers',
+        verbose_name=_("Chi nhánh nguồn")
+    )
+    to_branch = models.ForeignKey(
+        'branches.Branch',
+        on_delete=models.CASCADE,
+        related_name='incoming_transfers',
+        verbose_name=_("Chi nhánh đích")
+    )
+    status = models.CharField(_("Trạng thái"), max_length=20, choices=STATUS_CHOICES, default='DRAFT')
+    notes = models.TextField(_("Ghi chú"), blank=True)
+    created_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_transfers',
+        verbose_name=_("Người tạo")
+    )
+    dispatched_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='dispatched_transfers',
+        verbose_name=_("Người xuất")
+    )
+    received_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='received_transfers',
+        verbose_name=_("Người nhận")
+    )
+    created_at = models.DateTimeField(_("Ngày tạo"), default=timezone.now)
+    dispatched_at = models.DateTimeField(_("Ngày xuất"), null=True, blank=True)
+    received_at = models.DateTimeField(_("Ngày nhận"), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _("Phiếu chuyển kho")
+        verbose_name_plural = _("Phiếu chuyển kho")
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Chuyển kho #{self.transfer_number}"
+    
+    def save(self, *args, **kwargs):
+        if not self.transfer_number:
+            self.transfer_number = next_number('TRF', StockTransfer.objects.all(), 'transfer_number')
+        super().save(*args, **kwargs)
+
+
+class StockTransferItem(models.Model):
+    """Một dòng sản phẩm trong phiếu chuyển kho"""
+    transfer = models.ForeignKey(
+        StockTransfer,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name=_("Phiếu chuyển")
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='transfer_items',
+        verbose_name=_("Sản phẩm")
+    )
+    variant = models.ForeignKey(
+        'products.ProductVariant',
+        on_delete=models.SET_NULL,
+        related_name='transfer_items',
+        verbose_name=_("Biến thể"),
+        null=True,
+        blank=True
+    )
+    quantity = models.PositiveIntegerField(_("Số lượng chuyển"), validators=[MinValueValidator(1)])
+    received_quantity = models.PositiveIntegerField(_("Số lượng nhận"), default=0)
+    
+    class Meta:
+        verbose_name = _("Chi tiết phiếu chuyển")
+        verbose_name_plural = _("Chi tiết phiếu chuyển")
+        unique_together = ('transfer', 'product', 'variant')
+    
+    def __str__(self):
+        return f"{self.product_id}/{self.variant_id}: {self.quantity}"
+
+
+class StockSnapshot(models.Model):
+    """Ảnh chụp tồn kho của một chi nhánh tại một thời điểm (mốc để tính lại từ sổ cái)"""
+    branch = models.ForeignKey(
+        'branches.Branch',
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name=_("Chi nhánh")
+    )
+    taken_at = models.DateTimeField(_("Tồn kho tại thời điểm"))
+    created_at = models.DateTimeField(_("Ngày tạo"), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _("Ảnh chụp tồn kho")
+        verbose_name_plural = _("Ảnh chụp tồn kho")
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['branch', 'taken_at'], name='snapshot_branch_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Tồn kho chi nhánh #{self.branch_id} lúc {self.taken_at:%d/%m/%Y %H:%M}"
+
+
+class StockSnapshotItem(models.Model):
+    """Số lượng của một sản phẩm/biến thể trong ảnh chụp tồn kho"""
+    snapshot = models.ForeignKey(
+        StockSnapshot,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name=_("Ảnh chụp")
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_("Sản phẩm")
+    )
+    variant = models.ForeignKey(
+        'products.ProductVariant',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_("Biến thể"),
+        null=True,
+        blank=True
+    )
+    quantity = models.PositiveIntegerField(_("Số lượng"))
+    
+    class Meta:
+        verbose_name = _("Chi tiết ảnh chụp tồn kho")
+        verbose_name_plural = _("Chi tiết ảnh chụp tồn kho")
+        unique_together = ('snapshot', 'product', 'variant')
+    
+    def __str__(self):
+        return f"{self.product_id}/{self.variant_id}: {self.quantity}"
+
+
 class Inventory(models.Model):
     """Phiếu kiểm kê hàng hóa"""
     STATUS_CHOICES = (
@@ -158,9 +333,7 @@ class Inventory(models.Model):
     def save(self, *args, **kwargs):
         if not self.inventory_number:
             # Generate inventory number
-            last_inventory = Inventory.objects.order_by('-id').first()
-            last_id = last_inventory.id if last_inventory else 0
-            self.inventory_number = f"INV{timezone.now().strftime('%Y%m%d')}{last_id + 1:04d}"
+            self.inventory_number = next_number('INV', Inventory.objects.all(), 'inventory_number')
         super().save(*args, **kwargs)
 
 
@@ -206,4 +379,40 @@ class InventoryItem(models.Model):
     @property
     def discrepancy(self):
         """Calculate the discrepancy amount"""
-        return self.actual_quantity - self.expected_quantity 
\ No newline at end of file
+        return self.actual_quantity - self.expected_quantity 
+
+
+class InventoryScan(models.Model):
+    """Một lần quét mã vạch khi kiểm kê; `scan_id` do máy quét sinh ra để gửi lại không bị đếm trùng"""
+    inventory = models.ForeignKey(
+        Inventory,
+        on_delete=models.CASCADE,
+        related_name='scans',
+        verbose_name=_("Phiếu kiểm kê")
+    )
+    item = models.ForeignKey(
+        InventoryItem,
+        on_delete=models.CASCADE,
+        related_name='scans',
+        verbose_name=_("Chi tiết kiểm kê")
+    )
+    scan_id = models.CharField(_("Mã lần quét"), max_length=64)
+    sku = models.CharField(_("Mã SKU"), max_length=50)
+    quantity = models.PositiveIntegerField(_("Số lượng"), default=1)
+    scanned_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='inventory_scans',
+        verbose_name=_("Người quét")
+    )
+    created_at = models.DateTimeField(_("Thời gian"), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _("Lần quét kiểm kê")
+        verbose_name_plural = _("Lần quét kiểm kê")
+        unique_together = ('inventory', 'scan_id')
+    
+    def __str__(self):
+        return f"{self.sku} x{self.quantity} ({self.scan_id})"
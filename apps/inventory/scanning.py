@@ -0,0 +1,148 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from apps.inventory.counts import OPEN_STATUSES
+from apps.inventory.models import Inventory, InventoryItem, InventoryScan
+from apps.products.models import Product, ProductVariant
+from core.db import serialized_write
+
+
+SKU_INDEX_VERSION_KEY = 'inventory:sku_index_version'
+
+# Số dòng mỗi câu UPDATE ... CASE khi cộng số lượng quét
+SCAN_UPDATE_BATCH_SIZE = 300
+
+# Số lần quét tối đa trong một lần gửi
+MAX_SCANS_PER_BATCH = 2000
+
+# Chỉ mục SKU trong bộ nhớ của tiến trình, dựng lại khi phiên bản trong cache thay đổi
+_sku_index = {'version': None, 'skus': {}}
+
+
+class InventoryClosedError(Exception):
+    """Phiếu kiểm kê đã hoàn thành hoặc đã hủy, không nhận thêm lần quét"""
+
+
+def normalize_sku(sku):
+    return str(sku).strip().upper()
+
+
+def bump_sku_index_version():
+    """Gọi khi SKU của sản phẩm/biến thể thay đổi (xem signals)"""
+    try:
+        cache.incr(SKU_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(SKU_INDEX_VERSION_KEY, 1, None)
+
+
+def sku_index():
+    """
+    Bảng SKU -> (product_id, variant_id) của toàn bộ sản phẩm và biến thể.
+
+    Giữ trong bộ nhớ của tiến trình; mỗi lần gọi chỉ đọc số phiên bản trong
+    cache, và chỉ dựng lại (hai truy vấn) khi phiên bản đã bị tăng.
+    """
+    version = cache.get(SKU_INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(SKU_INDEX_VERSION_KEY, 1, None)
+        version = cache.get(SKU_INDEX_VERSION_KEY)
+    if _sku_index['version'] != version or version is None:
+        skus = {
+            normalize_sku(sku): (product_id, None)
+            for product_id, sku in Product.objects.values_list('id', 'sku')
+        }
+        skus.update({
+            normalize_sku(sku): (product_id, variant_id)
+            for variant_id, product_id, sku in ProductVariant.objects.values_list('id', 'product_id', 'sku')
+        })
+        _sku_index.update(version=version, skus=skus)
+    return _sku_index['skus']
+
+
+def _sheet_items(inventory, keys):
+    """Id dòng kiểm kê của các (product_id, variant_id); tạo thêm dòng (số lượng hệ thống 0) nếu thiếu"""
+    product_ids = {product_id for product_id, _variant_id in keys}
+    rows = InventoryItem.objects.filter(inventory=inventory, product_id__in=product_ids).values_list(
+        'product_id', 'variant_id', 'id'
+    )
+    items = {(product_id, variant_id): item_id for product_id, variant_id, item_id in rows}
+    missing = [key for key in keys if key not in items]
+    if missing:
+        InventoryItem.objects.bulk_create([
+            InventoryItem(inventory=inventory, product_id=product_id, variant_id=variant_id, expected_quantity=0)
+            for product_id, variant_id in missing
+        ], ignore_conflicts=True)
+        return _sheet_items(inventory, keys)
+    return items
+
+
+@serialized_write
+def ingest_scans(inventory, scans, staff=None):
+    """
+    Ghi một loạt lần quét `scans` = [{'scan_id', 'sku', 'quantity'}] vào phiếu kiểm kê.
+
+    Mỗi lần quét cộng `quantity` vào số lượng thực tế của dòng kiểm kê. Lần quét
+    có `scan_id` đã ghi trước đó được bỏ qua, nên máy quét có thể gửi lại cả lô
+    khi mất kết nối. Số lượng được cộng bằng một câu UPDATE ... CASE cho mỗi lô
+    nên nhiều máy quét có thể đếm cùng một kho đồng thời.
+    """
+    index = sku_index()
+    with transaction.atomic():
+        # Khóa phiếu kiểm kê: các lô của cùng một phiếu được ghi lần lượt
+        if not Inventory.objects.filter(pk=inventory.pk, status__in=OPEN_STATUSES).update(status='IN_PROGRESS'):
+            raise InventoryClosedError(f'Phiếu kiểm kê #{inventory.inventory_number} không còn mở.')
+
+        batch = {}
+        for scan in scans:
+            batch.setdefault(str(scan['scan_id']), scan)
+        seen = set(InventoryScan.objects.filter(
+            inventory=inventory, scan_id__in=list(batch)
+        ).values_list('scan_id', flat=True))
+
+        accepted, unknown = [], []
+        for scan_id, scan in batch.items():
+            if scan_id in seen:
+                continue
+            key = index.get(normalize_sku(scan['sku']))
+            if key is None:
+                unknown.append(scan_id)
+            else:
+                accepted.append((scan_id, scan, key))
+
+        items = _sheet_items(inventory, {key for _scan_id, _scan, key in accepted}) if accepted else {}
+        InventoryScan.objects.bulk_create([
+            InventoryScan(
+                inventory=inventory,
+                item_id=items[key],
+                scan_id=scan_id,
+                sku=scan['sku'],
+                quantity=scan.get('quantity', 1),
+                scanned_by=staff,
+            )
+            for scan_id, scan, key in accepted
+        ], batch_size=500)
+
+        increments = Counter()
+        for _scan_id, scan, key in accepted:
+            increments[items[key]] += scan.get('quantity', 1)
+        item_ids = list(increments)
+        for i in range(0, len(item_ids), SCAN_UPDATE_BATCH_SIZE):
+            chunk = item_ids[i:i + SCAN_UPDATE_BATCH_SIZE]
+            InventoryItem.objects.filter(pk__in=chunk).update(actual_quantity=F('actual_quantity') + Case(
+                *[When(pk=item_id, then=Value(increments[item_id])) for item_id in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+
+        counted = InventoryItem.objects.filter(pk__in=item_ids).values(
+            'id', 'product_id', 'variant_id', 'actual_quantity'
+        ) if item_ids else []
+    return {
+        'accepted': len(accepted),
+        'duplicates': sorted(seen),
+        'unknown': unknown,
+        'items': list(counted),
+    }
@@ -0,0 +1,244 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.availability import invalidate_availability
+from apps.inventory.levels import record_stock_changes
+from apps.inventory.models import Stock, StockMovement
+from apps.products.facets import refresh_stock_facets
+from apps.products.models import Product, ProductVariant
+from core.db import serialized_write
+
+
+# Số sản phẩm tối đa mỗi lần làm mới dữ liệu phụ thuộc tồn kho sau khi ghi hàng loạt
+NOTIFY_BATCH_SIZE = 500
+
+
+class InsufficientStockError(Exception):
+    """Không đủ tồn kho để giữ hàng cho một dòng sản phẩm"""
+
+    def __init__(self, product, variant=None, requested=0):
+        self.product = product
+        self.variant = variant
+        self.requested = requested
+        name = str(variant) if variant else str(product)
+        super().__init__(f'Sản phẩm "{name}" không đủ tồn kho (yêu cầu {requested}).')
+
+
+def notify_stock_updated(product_ids, variant_ids=(), quantity_deltas=None, row_deltas=None):
+    """
+    UPDATE/bulk trực tiếp trên `Stock` không phát signal: cập nhật bộ lọc
+    "còn hàng", cache tồn kho và bộ đếm theo chi nhánh sau khi commit.
+
+    `quantity_deltas`/`row_deltas` = {(branch_id, product_id): +/-} là thay đổi
+    số lượng/số dòng đã ghi bằng UPDATE/bulk (xem `record_stock_changes`).
+    """
+    product_ids = list(set(product_ids))
+
+    def refresh_facets():
+        for i in range(0, len(product_ids), NOTIFY_BATCH_SIZE):
+            refresh_stock_facets(product_ids[i:i + NOTIFY_BATCH_SIZE])
+    transaction.on_commit(refresh_facets)
+    invalidate_availability(product_ids, variant_ids)
+    record_stock_changes(quantity_deltas or {}, row_deltas)
+
+
+def movement_deltas(movements):
+    """Thay đổi tồn kho của các chuyển động: {(branch_id, product_id, variant_id): số lượng +/-}"""
+    deltas = defaultdict(int)
+    for movement in movements:
+        if movement.from_branch_id:
+            deltas[(movement.from_branch_id, movement.product_id, movement.variant_id)] -= movement.quantity
+        if movement.to_branch_id:
+            deltas[(movement.to_branch_id, movement.product_id, movement.variant_id)] += movement.quantity
+    return deltas
+
+
+def _stock_key(key):
+    branch_id, product_id, variant_id = key
+    return (branch_id, product_id, variant_id or 0)
+
+
+def apply_stock_changes(quantity_deltas, in_transit_deltas=None, objects=None):
+    """
+    Cộng các thay đổi vào `Stock.quantity`/`Stock.in_transit`, khóa theo (branch_id, product_id, variant_id).
+
+    Mọi dòng được cập nhật theo cùng một thứ tự khóa toàn cục, nên hai giao dịch
+    đồng thời (ví dụ hai phiếu chuyển kho ngược chiều) không thể chờ khóa lẫn nhau.
+    Dòng bị trừ dùng UPDATE có điều kiện; không đủ thì ném `InsufficientStockError`.
+    `objects` = {(product_id, variant_id): (product, variant)} dùng cho thông báo lỗi.
+
+    Trả về thay đổi số lượng {(branch_id, product_id): +/-} của các dòng được
+    UPDATE (dòng mới tạo đã phát signal), để truyền cho `notify_stock_updated`.
+    """
+    in_transit_deltas = in_transit_deltas or {}
+    applied = defaultdict(int)
+    for key in sorted(set(quantity_deltas) | set(in_transit_deltas), key=_stock_key):
+        branch_id, product_id, variant_id = key
+        quantity = quantity_deltas.get(key, 0)
+        in_transit = in_transit_deltas.get(key, 0)
+        changes, conditions = {}, {}
+        if quantity:
+            changes['quantity'] = F('quantity') + quantity
+            if quantity < 0:
+                conditions['quantity__gte'] = -quantity
+        if in_transit:
+            changes['in_transit'] = F('in_transit') + in_transit
+            if in_transit < 0:
+                conditions['in_transit__gte'] = -in_transit
+        if not changes:
+            continue
+        stocks = Stock.objects.filter(branch_id=branch_id, product_id=product_id, variant_id=variant_id)
+        if stocks.filter(**conditions).update(**changes):
+            applied[(branch_id, product_id)] += quantity
+            continue
+        if conditions:
+            if objects and (product_id, variant_id) in objects:
+                product, variant = objects[(product_id, variant_id)]
+            else:
+                product = Product.objects.get(pk=product_id)
+                variant = ProductVariant.objects.get(pk=variant_id) if variant_id else None
+            raise InsufficientStockError(product, variant, requested=-quantity if quantity < 0 else -in_transit)
+        Stock.objects.create(
+            branch_id=branch_id, product_id=product_id, variant_id=variant_id,
+            quantity=quantity, in_transit=in_transit,
+        )
+    return applied
+
+
+@serialized_write
+def record_movements(movements):
+    """
+    Ghi các chuyển động kho (chưa lưu) vào sổ cái và cập nhật `Stock` theo đó.
+
+    Mỗi chuyển động trừ `quantity` ở `from_branch` và cộng vào `to_branch`, nên
+    tồn kho luôn tính lại được từ sổ cái (xem apps.inventory.ledger). Nếu một
+    dòng không đủ hàng, toàn bộ giao dịch bị hủy và `InsufficientStockError` được ném ra.
+    """
+    movements = [movement for movement in movements if movement.quantity > 0]
+    if not movements:
+        return []
+    objects = {}
+    for movement in movements:
+        objects[(movement.product_id, movement.variant_id)] = (movement.product, movement.variant)
+    deltas = movement_deltas(movements)
+
+    with transaction.atomic():
+        applied = apply_stock_changes(deltas, objects=objects)
+        StockMovement.objects.bulk_create(movements)
+        notify_stock_updated(
+            [key[1] for key in deltas],
+            [key[2] for key in deltas if key[2]],
+            quantity_deltas=applied,
+        )
+    return movements
+
+
+def set_stock_quantity(stock, quantity, staff=None, reference='', notes=''):
+    """Đưa tồn kho về `quantity` bằng một chuyển động điều chỉnh (không sửa trực tiếp)"""
+    difference = quantity - stock.quantity
+    if not difference:
+        return None
+    movement = StockMovement(
+        product_id=stock.product_id,
+        variant_id=stock.variant_id,
+        movement_type='ADJUSTMENT',
+        quantity=abs(difference),
+        from_branch_id=stock.branch_id if difference < 0 else None,
+        to_branch_id=stock.branch_id if difference > 0 else None,
+        staff=staff,
+        reference=reference,
+        notes=notes,
+    )
+    record_movements([movement])
+    stock.quantity = quantity
+    return movement
+
+
+@serialized_write
+def apply_stock_counts(branch_id, counts, staff=None, reference='', notes='', created_at=None):
+    """
+    Đưa tồn kho của chi nhánh về số lượng đếm được `counts` = {(product_id, variant_id): số lượng}.
+
+    Chênh lệch so với tồn kho hiện tại được tính trong bộ nhớ từ một truy vấn,
+    rồi ghi bằng `bulk_create` (chuyển động điều chỉnh) và `bulk_update` (Stock),
+    nên số truy vấn không tăng theo số dòng kiểm kê.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        stocks = {
+            (stock.product_id, stock.variant_id): stock
+            for stock in Stock.objects.select_for_update().filter(branch_id=branch_id).only(
+                'id', 'branch_id', 'product_id', 'variant_id', 'quantity'
+            )
+        }
+        movements, to_update, to_create = [], [], []
+        quantity_deltas, row_deltas = defaultdict(int), defaultdict(int)
+        for (product_id, variant_id), quantity in counts.items():
+            stock = stocks.get((product_id, variant_id))
+            difference = quantity - (stock.quantity if stock else 0)
+            if not difference:
+                continue
+            quantity_deltas[(branch_id, product_id)] += difference
+            movements.append(StockMovement(
+                product_id=product_id,
+                variant_id=variant_id,
+                movement_type='ADJUSTMENT',
+                quantity=abs(difference),
+                from_branch_id=branch_id if difference < 0 else None,
+                to_branch_id=branch_id if difference > 0 else None,
+                staff=staff,
+                reference=reference,
+                notes=notes,
+                created_at=created_at or now,
+            ))
+            if stock is None:
+                to_create.append(Stock(branch_id=branch_id, product_id=product_id, variant_id=variant_id, quantity=quantity))
+                row_deltas[(branch_id, product_id)] += 1
+            else:
+                stock.quantity = quantity
+                stock.updated_at = now
+                to_update.append(stock)
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        Stock.objects.bulk_update(to_update, ['quantity', 'updated_at'], batch_size=500)
+        Stock.objects.bulk_create(to_create, batch_size=1000)
+        if movements:
+            notify_stock_updated(
+                [movement.product_id for movement in movements],
+                [movement.variant_id for movement in movements if movement.variant_id],
+                quantity_deltas=quantity_deltas,
+                row_deltas=row_deltas,
+            )
+    return movements
+
+
+@serialized_write
+def reserve_stock(branch, lines, staff=None, reference=''):
+    """
+    Xuất kho cho toàn bộ các dòng trong một giao dịch.
+
+    `lines` là danh sách (product, variant, quantity). Mỗi dòng được ghi thành
+    một chuyển động xuất kho; hai khách mua cùng lúc không thể làm tồn kho âm.
+    Nếu một dòng không đủ hàng, `InsufficientStockError` được ném ra.
+    """
+    return record_movements([
+        StockMovement(
+            product=product, variant=variant, quantity=quantity, movement_type='OUT',
+            from_branch=branch, staff=staff, reference=reference,
+        )
+        for product, variant, quantity in lines
+    ])
+
+
+@serialized_write
+def release_stock(branch, lines, staff=None, reference=''):
+    """Hoàn lại tồn kho đã xuất (ví dụ khi hủy đơn hàng)"""
+    return record_movements([
+        StockMovement(
+            product=product, variant=variant, quantity=quantity, movement_type='RETURN',
+            to_branch=branch, staff=staff, reference=reference,
+        )
+        for product, variant, quantity in lines
+    ])
@@ -0,0 +1,93 @@
+from collections import Counter
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.products.models import Product, ProductVariant
+from .availability import invalidate_availability
+from .levels import invalidate_stock_levels, record_stock_changes
+from .scanning import bump_sku_index_version
+from .models import Stock
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def stock_availability_changed(sender, instance, **kwargs):
+    invalidate_availability([instance.product_id], [instance.variant_id])
+
+
+LEVEL_FIELDS = ('branch_id', 'product_id', 'quantity')
+
+
+def _level_row(instance):
+    return (instance.branch_id, instance.product_id, instance.quantity)
+
+
+@receiver(post_init, sender=Stock)
+def remember_stock_level(sender, instance, **kwargs):
+    # Đọc trực tiếp từ __dict__ để không gây truy vấn với các trường bị defer
+    values = instance.__dict__
+    if values.get('id') is None or any(name not in values for name in LEVEL_FIELDS):
+        instance._level_row = None
+    else:
+        instance._level_row = _level_row(instance)
+
+
+def _record_level_change(old, new):
+    quantity_deltas, row_deltas = Counter(), Counter()
+    for row, sign in ((old, -1), (new, 1)):
+        if row is not None:
+            branch_id, product_id, quantity = row
+            quantity_deltas[(branch_id, product_id)] += sign * quantity
+            row_deltas[(branch_id, product_id)] += sign
+    record_stock_changes(quantity_deltas, row_deltas)
+
+
+@receiver(post_save, sender=Stock)
+def update_stock_levels(sender, instance, created, **kwargs):
+    old = getattr(instance, '_level_row', None)
+    if not created and old is None:
+        # Được nạp với trường bị defer: không biết giá trị cũ, dựng lại số liệu chi nhánh
+        invalidate_stock_levels([instance.branch_id])
+    else:
+        _record_level_change(old, _level_row(instance))
+    instance._level_row = _level_row(instance)
+
+
+@receiver(post_delete, sender=Stock)
+def update_stock_levels_on_delete(sender, instance, **kwargs):
+    _record_level_change(getattr(instance, '_level_row', None) or _level_row(instance), None)
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    instance._levels_category_id = instance.__dict__.get('category_id')
+    instance._indexed_sku = instance.__dict__.get('sku')
+
+
+@receiver(post_save, sender=Product)
+def product_category_changed(sender, instance, created, **kwargs):
+    # Tổng theo danh mục gắn với danh mục của sản phẩm: đổi danh mục thì dựng lại
+    if not created and instance.category_id != getattr(instance, '_levels_category_id', instance.category_id):
+        invalidate_stock_levels()
+    instance._levels_category_id = instance.category_id
+
+
+@receiver(post_init, sender=ProductVariant)
+def remember_variant_sku(sender, instance, **kwargs):
+    instance._indexed_sku = instance.__dict__.get('sku')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+def sku_changed(sender, instance, created, **kwargs):
+    # Chỉ mục SKU của máy quét kiểm kê chỉ cần dựng lại khi SKU thay đổi
+    if created or instance.sku != getattr(instance, '_indexed_sku', None):
+        bump_sku_index_version()
+    instance._indexed_sku = instance.sku
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductVariant)
+def sku_deleted(sender, instance, **kwargs):
+    bump_sku_index_version()
@@ -7,40 +7,35 @@ from datetime import datetime, timedelta
 import json
 
 from apps.products.models import Product, Category
+from apps.inventory.levels import branch_stock_levels
 from apps.inventory.models import Stock, StockMovement, Inventory, InventoryItem
+from apps.inventory.counts import OPEN_STATUSES, complete_count_sheet, count_sheet_items, discrepancy_summary
 from apps.branches.models import Branch
+from core.pagination import KeysetPaginator
 
 
 @login_required
 def dashboard(request):
     """Dashboard của nhân viên kho"""
     branch = request.user.branch
+    levels = branch_stock_levels(branch.pk if branch else None)
     
     # Tổng số sản phẩm
-    total_products = Stock.objects.filter(branch=branch).count()
+    total_products = levels.stock_count
     
     # Tổng số tồn kho
-    total_quantity = Stock.objects.filter(branch=branch).aggregate(
-        total=Sum('quantity'))['total'] or 0
+    total_quantity = levels.total_quantity
     
     # Số sản phẩm sắp hết
-    low_stock_count = Stock.objects.filter(
-        branch=branch,
-        quantity__gt=0,
-        quantity__lte=F('min_quantity')
-    ).count()
+    low_stock_count = levels.running_low_count
     
     # Số sản phẩm hết hàng
-    out_of_stock_count = Stock.objects.filter(
-        branch=branch,
-        quantity=0
-    ).count()
+    out_of_stock_count = levels.out_of_stock_count
     
     # Danh sách sản phẩm sắp hết hàng
     low_stock_products = Stock.objects.filter(
-        branch=branch,
-        quantity__lte=F('min_quantity')
-    ).select_related('product').order_by('quantity')[:10]
+        pk__in=levels.lowest_stock_ids(10)
+    ).select_related('product').order_by('quantity')
     
     # Hoạt động gần đây
     recent_activities = StockMovement.objects.filter(
@@ -48,14 +43,10 @@ def dashboard(request):
     ).select_related('product', 'staff').order_by('-created_at')[:10]
     
     # Thống kê tồn kho theo danh mục
-    category_data = Stock.objects.filter(branch=branch).values(
-        'product__category__name'
-    ).annotate(
-        total=Sum('quantity')
-    ).order_by('-total')[:10]
+    category_data = levels.category_breakdown(10)
     
-    category_names = [item['product__category__name'] or 'Không phân loại' for item in category_data]
-    category_quantities = [item['total'] for item in category_data]
+    category_names = [name or 'Không phân loại' for name, _quantity in category_data]
+    category_quantities = [quantity for _name, quantity in category_data]
     
     context = {
         'total_products': total_products,
@@ -302,7 +293,7 @@ def movement_list(request):
     
     movements = StockMovement.objects.filter(
         Q(from_branch=branch) | Q(to_branch=branch)
-    ).order_by('-created_at')
+    )
     
     # Lọc theo loại di chuyển
     movement_type = request.GET.get('type', '')
@@ -322,8 +313,13 @@ def movement_list(request):
     if to_date:
         movements = movements.filter(created_at__date__lte=to_date)
     
+    # Phân trang theo khóa (created_at, id): trang sâu vẫn chỉ là một truy vấn có LIMIT
+    page = KeysetPaginator(movements, 20).page(request.GET.get('cursor'), request.GET)
+    
     context = {
-        'movements': movements,
+        'movements': page,
+        'page_obj': page,
+        'total_movements': page.estimated_total,
         'movement_type': movement_type,
         'product_id': product_id,
         'from_date': from_date,
@@ -360,11 +356,12 @@ def inventory_detail(request, pk):
     branch = request.user.branch
     inventory = get_object_or_404(Inventory, pk=pk, branch=branch)
     
-    inventory_items = InventoryItem.objects.filter(inventory=inventory)
+    inventory_items = count_sheet_items(inventory)
     
     context = {
         'inventory': inventory,
         'inventory_items': inventory_items,
+        'summary': discrepancy_summary(inventory),
     }
     
     return render(request, 'inventory/inventory_detail.html', context)
@@ -376,37 +373,16 @@ def inventory_complete(request, pk):
     branch = request.user.branch
     inventory = get_object_or_404(Inventory, pk=pk, branch=branch)
     
-    # Only allow if the inventory is in 'pending' status
-    if inventory.status != 'pending':
+    # Chỉ hoàn thành được phiếu kiểm kê đang mở
+    if inventory.status not in OPEN_STATUSES:
         messages.error(request, 'Chỉ có thể hoàn thành phiếu kiểm kê đang chờ xử lý.')
         return redirect('inventory_staff:inventory_detail', pk=pk)
     
     if request.method == 'POST':
-        inventory.status = 'completed'
-        inventory.completed_at = timezone.now()
-        inventory.save()
-        
-        # Update stock quantities based on the inventory
-        inventory_items = InventoryItem.objects.filter(inventory=inventory)
-        for item in inventory_items:
-            stock = Stock.objects.get(product=item.product, branch=branch)
-            
-            # Create a movement record for the adjustment
-            difference = item.actual_quantity - item.expected_quantity
-            if difference != 0:
-                StockMovement.objects.create(
-                    product=item.product,
-                    movement_type='ADJUST',
-                    quantity=abs(difference),
-                    from_branch=branch if difference < 0 else None,
-                    to_branch=branch if difference > 0 else None,
-                    staff=request.user,
-                    notes=f'Điều chỉnh sau kiểm kê #{inventory.inventory_number}'
-                )
-                
-                # Update stock quantity
-                stock.quantity = item.actual_quantity
-                stock.save()
+        # Cập nhật trạng thái và tồn kho theo kết quả kiểm kê (ghi vào sổ cái) trong một giao dịch
+        if complete_count_sheet(inventory, staff=request.user) is None:
+            messages.error(request, 'Chỉ có thể hoàn thành phiếu kiểm kê đang chờ xử lý.')
+            return redirect('inventory_staff:inventory_detail', pk=pk)
         
         messages.success(request, f'Đã hoàn thành phiếu kiểm kê #{inventory.inventory_number} và cập nhật tồn kho.')
         return redirect('inventory_staff:inventory_list')
@@ -0,0 +1,149 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.inventory.models import StockMovement, StockTransfer, StockTransferItem
+from apps.inventory.services import apply_stock_changes, notify_stock_updated
+from core.db import serialized_write
+
+
+class TransferError(Exception):
+    """Phiếu chuyển kho không hợp lệ hoặc không ở trạng thái cho phép thao tác"""
+
+
+def create_transfer(from_branch, to_branch, lines, staff=None, notes=''):
+    """
+    Tạo phiếu chuyển kho nháp với nhiều dòng (product, variant, quantity).
+
+    Các dòng trùng (product, variant) được gộp lại; chưa thay đổi tồn kho.
+    """
+    if from_branch.pk == to_branch.pk:
+        raise TransferError('Chi nhánh đích phải khác chi nhánh nguồn.')
+    merged = {}
+    for product, variant, quantity in lines:
+        if quantity <= 0:
+            continue
+        key = (product.pk, variant.pk if variant else None)
+        merged[key] = merged.get(key, 0) + quantity
+    if not merged:
+        raise TransferError('Phiếu chuyển kho cần ít nhất một dòng sản phẩm.')
+
+    with transaction.atomic():
+        transfer = StockTransfer.objects.create(
+            from_branch=from_branch, to_branch=to_branch, created_by=staff, notes=notes
+        )
+        StockTransferItem.objects.bulk_create([
+            StockTransferItem(transfer=transfer, product_id=product_id, variant_id=variant_id, quantity=quantity)
+            for (product_id, variant_id), quantity in merged.items()
+        ])
+    return transfer
+
+
+def _claim(transfer, from_status, to_status, **fields):
+    """Chuyển trạng thái bằng UPDATE có điều kiện: chỉ một giao dịch thực hiện được mỗi bước"""
+    if not StockTransfer.objects.filter(pk=transfer.pk, status=from_status).update(status=to_status, **fields):
+        raise TransferError(f'Phiếu chuyển #{transfer.transfer_number} không ở trạng thái "{from_status}".')
+    transfer.status = to_status
+    for name, value in fields.items():
+        setattr(transfer, name, value)
+
+
+def _movement(transfer, item, quantity, staff, now, **branches):
+    return StockMovement(
+        product_id=item.product_id,
+        variant_id=item.variant_id,
+        quantity=quantity,
+        reference=f'Chuyển kho #{transfer.transfer_number}',
+        staff=staff,
+        created_at=now,
+        **branches,
+    )
+
+
+def _apply(transfer, items, quantity_deltas, in_transit_deltas, movements):
+    objects = {(item.product_id, item.variant_id): (item.product, item.variant) for item in items}
+    applied = apply_stock_changes(quantity_deltas, in_transit_deltas, objects=objects)
+    StockMovement.objects.bulk_create(movements)
+    notify_stock_updated(
+        [item.product_id for item in items],
+        [item.variant_id for item in items if item.variant_id],
+        quantity_deltas=applied,
+    )
+
+
+@serialized_write
+def dispatch_transfer(transfer, staff=None):
+    """
+    Xuất kho: trừ tồn kho ở chi nhánh nguồn và ghi số lượng đang chuyển ở chi nhánh đích.
+
+    Mọi dòng của phiếu được xử lý trong một giao dịch; thiếu hàng ở một dòng thì
+    cả phiếu không được xuất (`InsufficientStockError`).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        _claim(transfer, 'DRAFT', 'IN_TRANSIT', dispatched_at=now, dispatched_by=staff)
+        items = list(transfer.items.select_related('product', 'variant'))
+        quantity_deltas, in_transit_deltas = defaultdict(int), defaultdict(int)
+        movements = []
+        for item in items:
+            quantity_deltas[(transfer.from_branch_id, item.product_id, item.variant_id)] -= item.quantity
+            in_transit_deltas[(transfer.to_branch_id, item.product_id, item.variant_id)] += item.quantity
+            movements.append(_movement(
+                transfer, item, item.quantity, staff, now,
+                movement_type='TRANSFER', from_branch_id=transfer.from_branch_id,
+            ))
+        _apply(transfer, items, quantity_deltas, in_transit_deltas, movements)
+    return transfer
+
+
+@serialized_write
+def receive_transfer(transfer, received=None, staff=None):
+    """
+    Nhận hàng ở chi nhánh đích. `received` = {item_id: số lượng nhận thực tế}
+    (mặc định nhận đủ); phần thiếu được ghi lại trên dòng chuyển kho.
+    """
+    received = received or {}
+    now = timezone.now()
+    with transaction.atomic():
+        _claim(transfer, 'IN_TRANSIT', 'RECEIVED', received_at=now, received_by=staff)
+        items = list(transfer.items.select_related('product', 'variant'))
+        quantity_deltas, in_transit_deltas = defaultdict(int), defaultdict(int)
+        movements = []
+        for item in items:
+            item.received_quantity = max(0, min(int(received.get(item.pk, item.quantity)), item.quantity))
+            key = (transfer.to_branch_id, item.product_id, item.variant_id)
+            in_transit_deltas[key] -= item.quantity
+            quantity_deltas[key] += item.received_quantity
+            if item.received_quantity:
+                movements.append(_movement(
+                    transfer, item, item.received_quantity, staff, now,
+                    movement_type='TRANSFER', to_branch_id=transfer.to_branch_id,
+                ))
+        StockTransferItem.objects.bulk_update(items, ['received_quantity'])
+        _apply(transfer, items, quantity_deltas, in_transit_deltas, movements)
+    return transfer
+
+
+@serialized_write
+def cancel_transfer(transfer, staff=None):
+    """Hủy phiếu nháp, hoặc hủy phiếu đang chuyển và hoàn hàng về chi nhánh nguồn"""
+    with transaction.atomic():
+        if transfer.status == 'DRAFT':
+            _claim(transfer, 'DRAFT', 'CANCELLED')
+            return transfer
+
+        now = timezone.now()
+        _claim(transfer, 'IN_TRANSIT', 'CANCELLED')
+        items = list(transfer.items.select_related('product', 'variant'))
+        quantity_deltas, in_transit_deltas = defaultdict(int), defaultdict(int)
+        movements = []
+        for item in items:
+            in_transit_deltas[(transfer.to_branch_id, item.product_id, item.variant_id)] -= item.quantity
+            quantity_deltas[(transfer.from_branch_id, item.product_id, item.variant_id)] += item.quantity
+            movements.append(_movement(
+                transfer, item, item.quantity, staff, now,
+                movement_type='RETURN', to_branch_id=transfer.from_branch_id,
+            ))
+        _apply(transfer, items, quantity_deltas, in_transit_deltas, movements)
+    return transfer
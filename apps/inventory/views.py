@@ -8,10 +8,15 @@ from django.utils import timezone
 from django.db.models import Q, Sum, F, ExpressionWrapper, FloatField, Case, When, Value, Count
 from django.db import transaction
 
+from apps.inventory.levels import stock_levels
+from apps.inventory.counts import OPEN_STATUSES, complete_count_sheet, count_sheet_items, discrepancy_summary, open_count_sheet
 from apps.inventory.models import Stock, StockMovement, Inventory, InventoryItem
+from apps.inventory.services import InsufficientStockError, record_movements, set_stock_quantity
+from apps.inventory.transfers import TransferError, create_transfer, dispatch_transfer
 from apps.inventory.forms import StockForm, StockMovementForm, InventoryForm, InventoryItemForm
 from apps.products.models import Product, ProductVariant
 from apps.branches.models import Branch
+from core.pagination import KeysetPaginationMixin
 
 
 @login_required
@@ -30,25 +35,27 @@ def inventory_dashboard(request):
         movement_type='OUT'
     ).count()
     
+    # Số liệu tồn kho tính sẵn của mọi chi nhánh (xem apps.inventory.levels)
+    levels = stock_levels()
+    
     # Total products count
-    total_products = Stock.objects.values('product').distinct().count()
+    total_products = levels.product_count
     
     # Low stock items
-    low_stock_count = Stock.objects.filter(quantity__lte=F('min_quantity')).count()
-    low_stock_products = Stock.objects.filter(quantity__lte=F('min_quantity')).select_related('product', 'variant', 'branch')[:10]
+    low_stock_count = levels.low_stock_count
+    low_stock_products = Stock.objects.filter(
+        pk__in=levels.lowest_stock_ids(10)
+    ).select_related('product', 'variant', 'branch').order_by('quantity')
     
     # Pending orders that need to be fulfilled
     # Adjust this query based on your actual model relationships
     pending_orders = []  # Replace with actual query
     
     # Get inventory by category for chart
-    category_data = Stock.objects.values('product__category__name').annotate(
-        count=Count('id'),
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')
+    category_data = levels.category_breakdown()
     
-    category_names = [item['product__category__name'] for item in category_data]
-    category_counts = [item['total_quantity'] for item in category_data]
+    category_names = [name for name, _quantity in category_data]
+    category_counts = [quantity for _name, quantity in category_data]
     
     # Recent activities (stock movements)
     recent_activities = StockMovement.objects.all().order_by('-created_at')[:10]
@@ -126,6 +133,16 @@ def stock_detail(request, stock_id):
     return render(request, 'inventory/stock_detail.html', context)
 
 
+def save_stock_form(form, user):
+    """Lưu mức tối thiểu/tối đa; số lượng mới được ghi thành chuyển động điều chỉnh"""
+    stock = form.save(commit=False)
+    quantity = stock.quantity
+    stock.quantity = form.initial['quantity']
+    stock.save(update_fields=['min_quantity', 'max_quantity', 'updated_at'])
+    set_stock_quantity(stock, quantity, staff=user, notes='Cập nhật số lượng tồn kho')
+    return stock
+
+
 @login_required
 def stock_update(request, stock_id):
     """View for updating stock details"""
@@ -134,7 +151,7 @@ def stock_update(request, stock_id):
     if request.method == 'POST':
         form = StockForm(request.POST, instance=stock)
         if form.is_valid():
-            form.save()
+            save_stock_form(form, request.user)
             messages.success(request, 'Stock information updated successfully.')
             return redirect('inventory:stock_detail', stock_id=stock.id)
     else:
@@ -151,7 +168,7 @@ def stock_update(request, stock_id):
 @login_required
 def low_stock(request):
     """View for showing low stock items"""
-    low_stock_items = Stock.objects.filter(quantity__lte=F('min_quantity'))
+    low_stock_items = Stock.objects.filter(pk__in=stock_levels().low_stock_ids)
     
     context = {
         'low_stock_items': low_stock_items
@@ -545,15 +562,15 @@ class StockUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'inventory/stock_form.html'
     
     def form_valid(self, form):
-        response = super().form_valid(form)
+        self.object = save_stock_form(form, self.request.user)
         messages.success(self.request, f'Thông tin tồn kho đã được cập nhật thành công.')
-        return response
+        return redirect(self.get_success_url())
     
     def get_success_url(self):
         return reverse('inventory:stock_detail', kwargs={'pk': self.object.pk})
 
 
-class StockMovementListView(LoginRequiredMixin, ListView):
+class StockMovementListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = StockMovement
     template_name = 'inventory/movement_list.html'
     context_object_name = 'movements'
@@ -592,16 +609,15 @@ class StockMovementListView(LoginRequiredMixin, ListView):
         if to_date:
             queryset = queryset.filter(created_at__date__lte=to_date)
         
-        # Sắp xếp mặc định theo thời gian giảm dần
-        queryset = queryset.order_by('-created_at')
-        
+        # Sắp xếp theo (created_at, id) giảm dần do KeysetPaginationMixin áp dụng
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Thêm thông tin thống kê
-        context['total_movements'] = self.get_queryset().count()
+        # Thêm thông tin thống kê (ước lượng, không COUNT toàn bảng)
+        context['movements'] = context['page_obj']
+        context['total_movements'] = context['page_obj'].estimated_total
         context['branches'] = Branch.objects.all()
         context['movement_types'] = dict(StockMovement.MOVEMENT_TYPES)
         
@@ -633,94 +649,29 @@ class StockMovementCreateView(LoginRequiredMixin, CreateView):
         return initial
     
     def form_valid(self, form):
-        with transaction.atomic():
-            # Lưu thông tin người thực hiện
-            form.instance.performed_by = self.request.user
-            
-            # Xử lý chuyển động kho
-            if form.instance.movement_type == 'IN':
-                # Nhập kho: tăng số lượng
-                stock, created = Stock.objects.get_or_create(
-                    branch=form.instance.branch,
-                    product=form.instance.product,
-                    variant=form.instance.variant,
-                    defaults={'quantity': 0}
-                )
-                stock.quantity += form.instance.quantity
-                stock.save()
-                
-            elif form.instance.movement_type == 'OUT':
-                # Xuất kho: giảm số lượng
-                stock = get_object_or_404(
-                    Stock,
-                    branch=form.instance.branch,
-                    product=form.instance.product,
-                    variant=form.instance.variant
-                )
-                
-                if stock.quantity < form.instance.quantity:
-                    form.add_error('quantity', f'Số lượng xuất ({form.instance.quantity}) vượt quá số lượng tồn kho ({stock.quantity}).')
-                    return self.form_invalid(form)
-                
-                stock.quantity -= form.instance.quantity
-                stock.save()
-                
-            elif form.instance.movement_type == 'TRANSFER':
-                # Chuyển kho: giảm tại kho nguồn, tăng tại kho đích
-                if not form.instance.destination_branch:
-                    form.add_error('destination_branch', 'Cần chọn chi nhánh đích cho chuyển kho.')
-                    return self.form_invalid(form)
-                
-                if form.instance.branch == form.instance.destination_branch:
-                    form.add_error('destination_branch', 'Chi nhánh đích phải khác chi nhánh nguồn.')
-                    return self.form_invalid(form)
-                
-                # Kiểm tra và giảm tại kho nguồn
-                source_stock = get_object_or_404(
-                    Stock,
-                    branch=form.instance.branch,
-                    product=form.instance.product,
-                    variant=form.instance.variant
-                )
-                
-                if source_stock.quantity < form.instance.quantity:
-                    form.add_error('quantity', f'Số lượng chuyển ({form.instance.quantity}) vượt quá số lượng tồn kho ({source_stock.quantity}).')
-                    return self.form_invalid(form)
-                
-                source_stock.quantity -= form.instance.quantity
-                source_stock.save()
-                
-                # Tăng tại kho đích
-                dest_stock, created = Stock.objects.get_or_create(
-                    branch=form.instance.destination_branch,
-                    product=form.instance.product,
-                    variant=form.instance.variant,
-                    defaults={'quantity': 0}
-                )
-                dest_stock.quantity += form.instance.quantity
-                dest_stock.save()
-                
-            elif form.instance.movement_type == 'ADJUSTMENT':
-                # Điều chỉnh: cập nhật trực tiếp số lượng
-                stock, created = Stock.objects.get_or_create(
-                    branch=form.instance.branch,
-                    product=form.instance.product,
-                    variant=form.instance.variant,
-                    defaults={'quantity': 0}
-                )
-                
-                if form.instance.quantity < 0 and abs(form.instance.quantity) > stock.quantity:
-                    form.add_error('quantity', f'Số lượng điều chỉnh ({form.instance.quantity}) không hợp lệ. Tồn kho hiện tại: {stock.quantity}')
-                    return self.form_invalid(form)
-                
-                stock.quantity += form.instance.quantity
-                stock.save()
-            
-            # Lưu chuyển động kho
-            response = super().form_valid(form)
-            
-            messages.success(self.request, f'Chuyển động kho đã được tạo thành công.')
-            return response
+        movement = form.save(commit=False)
+        movement.staff = self.request.user
+        
+        # Tồn kho được cập nhật cùng lúc với việc ghi chuyển động vào sổ cái;
+        # chuyển kho đi qua phiếu chuyển: xuất ngay, chi nhánh đích nhận hàng sau
+        try:
+            if movement.movement_type == 'TRANSFER':
+                with transaction.atomic():
+                    transfer = create_transfer(
+                        movement.from_branch, movement.to_branch,
+                        [(movement.product, movement.variant, movement.quantity)],
+                        staff=self.request.user, notes=movement.notes,
+                    )
+                    dispatch_transfer(transfer, staff=self.request.user)
+            else:
+                record_movements([movement])
+        except (InsufficientStockError, TransferError) as e:
+            form.add_error('quantity', str(e))
+            return self.form_invalid(form)
+        
+        self.object = movement
+        messages.success(self.request, f'Chuyển động kho đã được tạo thành công.')
+        return redirect(self.get_success_url())
     
     def get_success_url(self):
         return reverse('inventory:movement_list')
@@ -766,11 +717,11 @@ class InventoryDetailView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['items'] = self.object.items.all()
+        context['items'] = count_sheet_items(self.object)
         
         # Tính toán tổng chênh lệch
-        total_discrepancy = sum(item.difference for item in context['items'])
-        context['total_discrepancy'] = total_discrepancy
+        context['summary'] = discrepancy_summary(self.object)
+        context['total_discrepancy'] = context['summary']['total_discrepancy']
         
         return context
 
@@ -792,15 +743,7 @@ class InventoryCreateView(LoginRequiredMixin, CreateView):
             inventory = form.save()
             
             # Tự động tạo các item kiểm kê dựa trên tồn kho hiện tại của chi nhánh
-            stocks = Stock.objects.filter(branch=inventory.branch)
-            for stock in stocks:
-                InventoryItem.objects.create(
-                    inventory=inventory,
-                    product=stock.product,
-                    variant=stock.variant,
-                    expected_quantity=stock.quantity,
-                    actual_quantity=0  # Mặc định 0, sẽ được cập nhật khi kiểm kê
-                )
+            open_count_sheet(inventory)
             
             messages.success(self.request, f'Đợt kiểm kê mới đã được tạo thành công. Vui lòng cập nhật số lượng thực tế cho từng sản phẩm.')
             return redirect('inventory:inventory_detail', pk=inventory.pk)
@@ -833,42 +776,15 @@ def complete_inventory(request, pk):
     """Hoàn thành đợt kiểm kê và tự động điều chỉnh tồn kho"""
     inventory = get_object_or_404(Inventory, pk=pk)
     
-    if inventory.status == 'completed':
+    if inventory.status not in OPEN_STATUSES:
         messages.warning(request, 'Đợt kiểm kê này đã được hoàn thành.')
         return redirect('inventory:inventory_detail', pk=pk)
     
     if request.method == 'POST':
-        with transaction.atomic():
-            # Cập nhật trạng thái kiểm kê
-            inventory.status = 'completed'
-            inventory.completed_at = timezone.now()
-            inventory.save()
-            
-            # Tự động điều chỉnh tồn kho dựa trên kết quả kiểm kê
-            for item in inventory.items.all():
-                if item.difference != 0:
-                    # Tạo chuyển động kho điều chỉnh
-                    StockMovement.objects.create(
-                        product=item.product,
-                        variant=item.variant,
-                        branch=inventory.branch,
-                        movement_type='ADJUSTMENT',
-                        quantity=item.difference,  # Có thể âm hoặc dương
-                        reference=f'Điều chỉnh từ kiểm kê #{inventory.id}',
-                        notes=f'Chênh lệch: {item.difference}. Dự kiến: {item.expected_quantity}, Thực tế: {item.actual_quantity}',
-                        staff=request.user,
-                        created_at=inventory.completed_at
-                    )
-                    
-                    # Cập nhật số lượng tồn kho
-                    stock = Stock.objects.get(
-                        product=item.product,
-                        variant=item.variant,
-                        branch=inventory.branch
-                    )
-                    stock.quantity = item.actual_quantity
-                    stock.save()
-            
+        # Hoàn thành phiếu và điều chỉnh tồn kho theo kết quả kiểm kê trong một giao dịch
+        if complete_count_sheet(inventory, staff=request.user) is None:
+            messages.warning(request, 'Đợt kiểm kê này đã được hoàn thành.')
+        else:
             messages.success(request, 'Đợt kiểm kê đã được hoàn thành và tồn kho đã được điều chỉnh theo kết quả kiểm kê.')
     
     return redirect('inventory:inventory_detail', pk=pk) 
\ No newline at end of file
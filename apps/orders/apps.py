@@ -5,4 +5,7 @@ from django.utils.translation import gettext_lazy as _
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.orders'
-    verbose_name = _('Quản lý đơn hàng') 
\ No newline at end of file
+    verbose_name = _('Quản lý đơn hàng')
+    
+    def ready(self):
+        import apps.orders.signals
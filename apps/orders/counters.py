@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.orders.models import Order
+from core.aggregates import StatusCounts, status_histogram
+
+
+ORDER_STATUSES = [status for status, _label in Order.STATUS_CHOICES]
+
+# Bộ đếm tự làm mới định kỳ để không lệch mãi nếu có cập nhật bỏ qua signal
+COUNTER_TIMEOUT = 60 * 60
+
+
+def _key(branch_id, status):
+    return f'orders:status_count:{branch_id}:{status}'
+
+
+def branch_status_counts(branch_id):
+    """
+    Số đơn hàng theo trạng thái của một chi nhánh, đọc từ bộ đếm trong cache.
+
+    Bộ đếm được tăng/giảm khi đơn hàng đổi trạng thái (xem signals); nếu chưa
+    có trong cache thì đếm lại bằng một truy vấn `status_histogram`.
+    """
+    keys = {status: _key(branch_id, status) for status in ORDER_STATUSES}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        return StatusCounts({status: cached[key] for status, key in keys.items()})
+    
+    counts = status_histogram(Order.objects.filter(branch_id=branch_id), ORDER_STATUSES)
+    cache.set_many({keys[status]: counts[status] for status in ORDER_STATUSES}, COUNTER_TIMEOUT)
+    return counts
+
+
+def _adjust(branch_id, status, delta):
+    try:
+        cache.incr(_key(branch_id, status), delta)
+    except ValueError:
+        # Chưa có trong cache: sẽ được đếm lại ở lần đọc tiếp theo
+        pass
+
+
+def record_status_change(old, new):
+    """Cập nhật bộ đếm sau khi giao dịch commit; `old`/`new` là (branch_id, status) hoặc None"""
+    if old == new:
+        return
+    
+    def apply():
+        if old and old[0]:
+            _adjust(old[0], old[1], -1)
+        if new and new[0]:
+            _adjust(new[0], new[1], 1)
+    transaction.on_commit(apply)
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.orders.models import Order
+from core.db.explain import hot_query
+
+
+@hot_query('orders.recent')
+def recent_orders():
+    return Order.objects.order_by('-created_at')[:10]
+
+
+@hot_query('orders.branch_recent')
+def branch_recent_orders():
+    return Order.objects.filter(branch_id=1).order_by('-created_at')[:10]
+
+
+@hot_query('orders.branch_status')
+def branch_orders_by_status():
+    return Order.objects.filter(branch_id=1, status='PENDING').order_by('-created_at')
+
+
+@hot_query('orders.branch_revenue')
+def branch_revenue():
+    since = timezone.now() - timedelta(days=30)
+    return Order.objects.filter(
+        branch_id=1, created_at__gte=since, status__in=['DELIVERED', 'COMPLETED']
+    ).values('total')
+
+
+@hot_query('orders.status')
+def orders_by_status():
+    return Order.objects.filter(status='PENDING').order_by('-created_at')
+
+
+@hot_query('orders.sales_staff')
+def sales_staff_orders():
+    return Order.objects.filter(sales_staff_id=1).order_by('-created_at')
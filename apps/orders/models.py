@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models import Sum
 from django.conf import settings
 from django.utils import timezone
 import uuid
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 
+from apps.sequences.services import next_number
+
 
 class Order(models.Model):
     """Đơn hàng của khách hàng"""
@@ -80,6 +83,14 @@ class Order(models.Model):
         verbose_name = _("Đơn hàng")
         verbose_name_plural = _("Đơn hàng")
         ordering = ['-created_at']
+        indexes = [
+            # Danh sách/doanh thu theo chi nhánh và theo nhân viên, sắp theo thời gian
+            models.Index(fields=['branch', 'created_at'], name='order_branch_time_idx'),
+            models.Index(fields=['branch', 'status', 'created_at'], name='order_branch_status_time_idx'),
+            models.Index(fields=['sales_staff', 'created_at'], name='order_staff_time_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_time_idx'),
+            models.Index(fields=['created_at'], name='order_time_idx'),
+        ]
     
     def __str__(self):
         return f"Đơn hàng #{self.order_number} - {self.customer.get_full_name()}"
@@ -87,14 +98,19 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate order number
-            last_order = Order.objects.order_by('-id').first()
-            last_id = last_order.id if last_order else 0
-            self.order_number = f"ORD{timezone.now().strftime('%Y%m%d')}{last_id + 1:04d}"
+            self.order_number = next_number('ORD', Order.objects.all(), 'order_number')
         
         # Calculate total
-        self.subtotal = sum(item.subtotal for item in self.items.all()) if self.id else Decimal('0')
+        if self.subtotal is None:
+            self.subtotal = Decimal('0')
         self.total = self.subtotal + self.shipping_fee + self.tax - self.discount
         super().save(*args, **kwargs)
+    
+    def recalculate_totals(self, save=True):
+        """Tính lại tạm tính từ các dòng đơn hàng bằng một truy vấn tổng hợp"""
+        self.subtotal = self.items.aggregate(total=Sum('subtotal'))['total'] or Decimal('0')
+        if save:
+            self.save()
 
 
 class OrderItem(models.Model):
@@ -136,7 +152,7 @@ class OrderItem(models.Model):
         
         # Update order subtotal
         if self.order.id:
-            self.order.save()
+            self.order.recalculate_totals()
 
 
 class Payment(models.Model):
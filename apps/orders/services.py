@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from apps.orders.models import OrderItem
+from apps.reports.rollups import order_key, record_items
+from core.db import serialized_write
+
+
+@serialized_write
+def create_order(order, lines):
+    """
+    Tạo đơn hàng cùng toàn bộ các dòng sản phẩm với số truy vấn cố định.
+
+    `lines` là danh sách (product, variant, quantity, price). Tạm tính và
+    tổng tiền được tính một lần trong Python, đơn hàng được ghi một lần và
+    các dòng được ghi bằng `bulk_create`, thay vì để mỗi `OrderItem.save()`
+    tính lại toàn bộ đơn hàng.
+    """
+    items = []
+    subtotal = Decimal('0')
+    for product, variant, quantity, price in lines:
+        item = OrderItem(
+            product=product,
+            variant=variant,
+            quantity=quantity,
+            price=price,
+            subtotal=quantity * price,
+        )
+        subtotal += item.subtotal
+        items.append(item)
+    
+    with transaction.atomic():
+        order.subtotal = subtotal
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        # bulk_create không phát signal: cộng các dòng hàng vào bảng tổng hợp doanh số
+        record_items(
+            order_key(order.branch_id, order.created_at, order.sales_staff_id, order.status),
+            [(product.category_id, item.quantity, item.subtotal) for (product, *_), item in zip(lines, items)],
+        )
+    
+    return order
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.orders.counters import record_status_change
+from apps.orders.models import Order
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    # Đọc trực tiếp từ __dict__ để không gây truy vấn với các trường bị defer
+    if instance.__dict__.get('id') is not None:
+        instance._status_key = (instance.__dict__.get('branch_id'), instance.__dict__.get('status'))
+    else:
+        instance._status_key = None
+
+
+@receiver(post_save, sender=Order)
+def update_status_counters(sender, instance, created, **kwargs):
+    new_key = (instance.branch_id, instance.status)
+    record_status_change(None if created else getattr(instance, '_status_key', None), new_key)
+    instance._status_key = new_key
+
+
+@receiver(post_delete, sender=Order)
+def update_status_counters_on_delete(sender, instance, **kwargs):
+    record_status_change((instance.branch_id, instance.status), None)
@@ -6,19 +6,26 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.http import HttpResponse
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Sum
 from django.core.paginator import Paginator
 from django.template.loader import get_template
 
 from apps.orders.models import Order, OrderItem, Payment, Delivery
+from apps.orders.services import create_order
 from apps.orders.forms import OrderForm, OrderItemForm, PaymentForm, DeliveryForm
 from apps.products.models import Product, ProductVariant
 from apps.cart.models import Cart, CartItem
 from apps.inventory.models import Stock
+from apps.inventory.services import reserve_stock, InsufficientStockError
 from apps.branches.models import Branch
+from apps.orders.counters import ORDER_STATUSES, branch_status_counts
+from core.aggregates import status_histogram
+from core.db import serialized_write
+from core.pagination import KeysetPaginationMixin
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Order
     template_name = 'orders/order_list.html'
     context_object_name = 'orders'
@@ -64,12 +71,21 @@ class OrderListView(LoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_orders'] = self.get_queryset().count()
-        context['pending_orders'] = self.get_queryset().filter(status='pending').count()
-        context['processing_orders'] = self.get_queryset().filter(status='processing').count()
-        context['shipped_orders'] = self.get_queryset().filter(status='shipped').count()
-        context['delivered_orders'] = self.get_queryset().filter(status='delivered').count()
-        context['cancelled_orders'] = self.get_queryset().filter(status='cancelled').count()
+        
+        # Thống kê theo trạng thái: chỉ lọc theo chi nhánh thì đọc bộ đếm trong cache,
+        # còn lại đếm tất cả trạng thái bằng một truy vấn trên danh sách đã lọc
+        filters = {key for key, value in self.request.GET.items() if value and key != 'cursor'}
+        if filters == {'branch'}:
+            counts = branch_status_counts(self.request.GET['branch'])
+        else:
+            counts = status_histogram(self.object_list, ORDER_STATUSES)
+        
+        context['total_orders'] = counts.total
+        context['pending_orders'] = counts['PENDING']
+        context['processing_orders'] = counts['CONFIRMED']
+        context['shipped_orders'] = counts['SHIPPING']
+        context['delivered_orders'] = counts['DELIVERED']
+        context['cancelled_orders'] = counts['CANCELLED']
         return context
 
 
@@ -107,7 +123,7 @@ class OrderCreateView(LoginRequiredMixin, CreateView):
 def create_order_from_cart(request):
     """Tạo đơn hàng từ giỏ hàng"""
     cart = Cart.objects.get_or_create(customer=request.user)[0]
-    cart_items = CartItem.objects.filter(cart=cart)
+    cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'variant')
     
     if not cart_items.exists():
         messages.warning(request, 'Giỏ hàng của bạn đang trống.')
@@ -119,11 +135,6 @@ def create_order_from_cart(request):
             order = form.save(commit=False)
             order.customer = request.user
             
-            # Tính toán giá trị đơn hàng
-            subtotal = sum(item.subtotal for item in cart_items)
-            order.subtotal = subtotal
-            order.total = subtotal + order.shipping_fee + order.tax - order.discount
-            
             # Gán chi nhánh cho đơn hàng
             if not order.branch:
                 # Sử dụng chi nhánh của người dùng nếu có
@@ -138,36 +149,30 @@ def create_order_from_cart(request):
                         messages.error(request, 'Không thể tạo đơn hàng: Không tìm thấy chi nhánh phù hợp.')
                         return redirect('cart:cart_detail')
             
-            order.save()
-            
-            # Chuyển các mặt hàng từ giỏ hàng sang đơn hàng
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    variant=cart_item.variant,
-                    price=cart_item.price,
-                    quantity=cart_item.quantity,
-                    subtotal=cart_item.subtotal
-                )
-                
-                # Cập nhật tồn kho
-                stock_filters = {
-                    'product': cart_item.product,
-                    'branch': order.branch
-                }
+            # Cả đơn hàng, xuất kho và xóa giỏ hàng trong một giao dịch ghi
+            @serialized_write
+            @transaction.atomic
+            def place_order():
+                # Chuyển các mặt hàng từ giỏ hàng sang đơn hàng
+                create_order(order, [
+                    (cart_item.product, cart_item.variant, cart_item.quantity, cart_item.price)
+                    for cart_item in cart_items
+                ])
                 
-                if cart_item.variant:
-                    stock_filters['variant'] = cart_item.variant
-                    
-                stock = Stock.objects.filter(**stock_filters).first()
+                # Xuất kho cho toàn bộ giỏ hàng trong cùng một giao dịch
+                reserve_stock(order.branch, [
+                    (cart_item.product, cart_item.variant, cart_item.quantity)
+                    for cart_item in cart_items
+                ], reference=f'Đơn hàng #{order.order_number}')
                 
-                if stock:
-                    stock.quantity -= cart_item.quantity
-                    stock.save()
+                # Xóa giỏ hàng
+                cart_items.delete()
             
-            # Xóa giỏ hàng
-            cart_items.delete()
+            try:
+                place_order()
+            except InsufficientStockError as e:
+                messages.error(request, f'Không thể tạo đơn hàng: {e}')
+                return redirect('cart:cart_detail')
             
             messages.success(request, f'Đơn hàng #{order.order_number} đã được tạo thành công.')
             return redirect('orders:order_detail', pk=order.pk)
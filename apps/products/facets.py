@@ -0,0 +1,233 @@
+import hashlib
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Product, ProductFacet, VariantAttribute
+
+
+# Khoảng giá (VNĐ): (mã, nhãn, giá từ, giá đến)
+PRICE_BUCKETS = (
+    ('0-1tr', 'Dưới 1 triệu', Decimal('0'), Decimal('1000000')),
+    ('1-3tr', '1 - 3 triệu', Decimal('1000000'), Decimal('3000000')),
+    ('3-5tr', '3 - 5 triệu', Decimal('3000000'), Decimal('5000000')),
+    ('5-10tr', '5 - 10 triệu', Decimal('5000000'), Decimal('10000000')),
+    ('10-20tr', '10 - 20 triệu', Decimal('10000000'), Decimal('20000000')),
+    ('20tr+', 'Trên 20 triệu', Decimal('20000000'), None),
+)
+
+# Tham số GET được dùng làm bộ lọc
+FACETS = ('material', 'color', 'price', 'branch')
+ATTRIBUTE_PREFIX = 'attr_'
+STOCK_FACET = 'branch'
+
+FACET_VERSION_KEY = 'products:facet_version'
+FACET_COUNTS_TIMEOUT = 10 * 60
+
+
+def price_bucket(price):
+    for key, _label, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+def _static_facets(products):
+    """Các facet lấy từ bản thân sản phẩm và thuộc tính biến thể: {product_id: {(facet, value)}}"""
+    rows = defaultdict(set)
+    for product in products:
+        if product.material:
+            rows[product.pk].add(('material', product.material.strip()))
+        if product.color:
+            rows[product.pk].add(('color', product.color.strip()))
+        bucket = price_bucket(product.get_actual_price)
+        if bucket:
+            rows[product.pk].add(('price', bucket))
+    
+    attributes = VariantAttribute.objects.filter(
+        variant__product__in=[p.pk for p in products], variant__is_active=True
+    ).values_list('variant__product_id', 'attribute_type', 'value')
+    for product_id, attribute_type, value in attributes:
+        rows[product_id].add((ATTRIBUTE_PREFIX + attribute_type, value.strip()))
+    return rows
+
+
+def _stock_facets(product_ids):
+    """Các chi nhánh còn hàng của từng sản phẩm: {product_id: {('branch', branch_id)}}"""
+    from apps.inventory.models import Stock
+    
+    rows = defaultdict(set)
+    in_stock = Stock.objects.filter(product_id__in=product_ids, quantity__gt=0).values_list(
+        'product_id', 'branch_id'
+    ).distinct()
+    for product_id, branch_id in in_stock:
+        rows[product_id].add((STOCK_FACET, str(branch_id)))
+    return rows
+
+
+def _write(product_ids, rows, facets=None):
+    """
+    Đồng bộ facet của các sản phẩm với `rows`: chỉ xóa/thêm các dòng khác nhau.
+
+    Phiên bản facet (khóa cache số lượng và trang danh sách) chỉ tăng khi có
+    dòng thay đổi, ví dụ sản phẩm hết hàng/có hàng lại ở một chi nhánh, không
+    tăng với mỗi lần tồn kho thay đổi số lượng.
+    """
+    existing = ProductFacet.objects.filter(product_id__in=product_ids)
+    if facets is not None:
+        existing = existing.filter(facet__in=facets)
+    current = {
+        (product_id, facet, value): pk
+        for pk, product_id, facet, value in existing.values_list('pk', 'product_id', 'facet', 'value')
+    }
+    wanted = {
+        (product_id, facet, value[:100])
+        for product_id, values in rows.items()
+        for facet, value in values
+    }
+    stale = [pk for key, pk in current.items() if key not in wanted]
+    added = wanted - current.keys()
+    if not stale and not added:
+        return
+    with transaction.atomic():
+        ProductFacet.objects.filter(pk__in=stale).delete()
+        ProductFacet.objects.bulk_create([
+            ProductFacet(product_id=product_id, facet=facet, value=value)
+            for product_id, facet, value in added
+        ], batch_size=1000)
+    bump_facet_version()
+
+
+def refresh_product_facets(product_ids):
+    """Tính lại toàn bộ facet cho các sản phẩm (khi sản phẩm/biến thể thay đổi)"""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return
+    products = list(Product.objects.filter(pk__in=product_ids).only(
+        'id', 'material', 'color', 'price', 'discount_price'
+    ))
+    rows = _static_facets(products)
+    for product_id, values in _stock_facets(product_ids).items():
+        rows[product_id] |= values
+    _write(product_ids, rows)
+
+
+def refresh_stock_facets(product_ids):
+    """Chỉ tính lại facet còn hàng theo chi nhánh (khi tồn kho thay đổi)"""
+    product_ids = list(set(product_ids))
+    if product_ids:
+        _write(product_ids, _stock_facets(product_ids), facets=[STOCK_FACET])
+
+
+def rebuild_facets(batch_size=500):
+    ids = list(Product.objects.values_list('pk', flat=True))
+    for i in range(0, len(ids), batch_size):
+        refresh_product_facets(ids[i:i + batch_size])
+    return len(ids)
+
+
+def bump_facet_version():
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, 1, None)
+
+
+def selected_facets(params):
+    """Đọc các bộ lọc facet từ request.GET: {facet: [giá trị]}"""
+    selected = {}
+    for key in params:
+        if key in FACETS or key.startswith(ATTRIBUTE_PREFIX):
+            values = [v for v in params.getlist(key) if v]
+            if values:
+                selected[key] = values
+    return selected
+
+
+def filter_by_facets(queryset, selected):
+    """Các giá trị trong cùng facet là OR, giữa các facet là AND; mỗi facet là một lookup theo index"""
+    for facet, values in selected.items():
+        queryset = queryset.filter(pk__in=ProductFacet.objects.filter(
+            facet=facet, value__in=values
+        ).values('product_id'))
+    return queryset
+
+
+def facet_counts(queryset, signature=None):
+    """
+    Đếm số sản phẩm theo từng giá trị facet và tổng số sản phẩm của `queryset`.
+
+    Tất cả facet được đếm bằng một câu GROUP BY trên bảng ProductFacet. Kết
+    quả được cache theo `signature` (các tham số lọc) và phiên bản facet, nên
+    chỉ tính lại khi bộ lọc mới hoặc dữ liệu sản phẩm/tồn kho thay đổi.
+    """
+    key = None
+    if signature is not None:
+        version = cache.get(FACET_VERSION_KEY, 0)
+        digest = hashlib.md5(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+        key = f'products:facets:{version}:{digest}'
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    counts = defaultdict(dict)
+    rows = ProductFacet.objects.filter(
+        product__in=queryset.order_by().values('pk')
+    ).values('facet', 'value').annotate(count=Count('product_id')).order_by('facet', '-count', 'value')
+    for row in rows:
+        counts[row['facet']][row['value']] = row['count']
+    result = {'total': queryset.count(), 'facets': dict(counts)}
+    
+    if key:
+        cache.set(key, result, FACET_COUNTS_TIMEOUT)
+    return result
+
+
+FACET_LABELS = {
+    'material': 'Chất liệu',
+    'color': 'Màu sắc',
+    'price': 'Khoảng giá',
+    STOCK_FACET: 'Còn hàng tại chi nhánh',
+}
+FACET_LABELS.update({
+    ATTRIBUTE_PREFIX + key: label for key, label in VariantAttribute.ATTRIBUTE_TYPES
+})
+
+
+def facet_groups(counts, selected):
+    """Chuyển kết quả `facet_counts` thành danh sách nhóm để hiển thị trên giao diện"""
+    from apps.branches.models import Branch
+    
+    facets = counts['facets']
+    value_labels = {'price': {key: label for key, label, _low, _high in PRICE_BUCKETS}}
+    if STOCK_FACET in facets:
+        value_labels[STOCK_FACET] = {
+            str(pk): name for pk, name in Branch.objects.filter(
+                pk__in=[int(v) for v in facets[STOCK_FACET]]
+            ).values_list('pk', 'name')
+        }
+    
+    groups = []
+    for facet, values in facets.items():
+        if facet == 'price':
+            # Giữ thứ tự tăng dần của khoảng giá
+            order = [key for key, *_rest in PRICE_BUCKETS]
+            items = sorted(values.items(), key=lambda item: order.index(item[0]))
+        else:
+            items = values.items()
+        labels = value_labels.get(facet, {})
+        groups.append({
+            'key': facet,
+            'label': FACET_LABELS.get(facet, facet),
+            'options': [{
+                'value': value,
+                'label': labels.get(value, value),
+                'count': count,
+                'selected': value in selected.get(facet, ()),
+            } for value, count in items],
+        })
+    return groups
@@ -0,0 +1,27 @@
+from apps.products.models import Product
+from core.db.explain import hot_query
+
+
+@hot_query('products.storefront_newest')
+def storefront_newest():
+    return Product.objects.filter(is_active=True).order_by('-created_at', '-id')[:13]
+
+
+@hot_query('products.category_by_price')
+def category_by_price():
+    return Product.objects.filter(is_active=True, category_id=1).order_by('price')
+
+
+@hot_query('products.price_range')
+def price_range():
+    return Product.objects.filter(is_active=True, price__gte=1000, price__lte=5000)
+
+
+@hot_query('products.detail')
+def product_detail():
+    return Product.objects.filter(slug='sofa', is_active=True)
+
+
+@hot_query('products.related')
+def related_products():
+    return Product.objects.filter(category_id=1, is_active=True).exclude(id=1)[:4]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại chỉ mục bộ lọc (facet) của sản phẩm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Số sản phẩm xử lý mỗi lần')
+
+    def handle(self, *args, **options):
+        count = rebuild_facets(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã tính lại bộ lọc cho {count} sản phẩm.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models import ProductSearchToken
+from apps.products.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại chỉ mục tìm kiếm sản phẩm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Số sản phẩm xử lý mỗi lần')
+
+    def handle(self, *args, **options):
+        # Xóa các dòng mồ côi trước rồi ghi lại chỉ mục cho từng lô sản phẩm
+        ProductSearchToken.objects.all().delete()
+        count = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã lập chỉ mục {count} sản phẩm.'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = {c.pk: c for c in Category.objects.only('id', 'parent_id')}
+
+    def compute(category, seen=()):
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.pk in seen:
+            return f'{category.pk}/'
+        return compute(parent, seen + (category.pk,)) + f'{category.pk}/'
+
+    for category in categories.values():
+        category.path = compute(category)
+        category.depth = category.path.count('/') - 1
+    Category.objects.bulk_update(categories.values(), ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Cấp'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Đường dẫn cây'),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_productsearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=50, verbose_name='Thuộc tính')),
+                ('value', models.CharField(max_length=100, verbose_name='Giá trị')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='products.product', verbose_name='Sản phẩm')),
+            ],
+            options={
+                'verbose_name': 'Giá trị bộ lọc',
+                'verbose_name_plural': 'Giá trị bộ lọc',
+                'indexes': [models.Index(fields=['facet', 'value', 'product'], name='products_pr_facet_d16aec_idx')],
+                'unique_together': {('product', 'facet', 'value')},
+            },
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from ckeditor.fields import RichTextField
 
@@ -18,6 +21,9 @@ class Category(models.Model):
     image = models.ImageField(_("Hình ảnh"), upload_to='categories/', null=True, blank=True)
     is_active = models.BooleanField(_("Kích hoạt"), default=True)
     created_at = models.DateTimeField(_("Ngày tạo"), default=timezone.now)
+    # Đường dẫn cây dạng "1/5/12/": lọc cây con chỉ bằng một điều kiện LIKE 'tiền tố%'
+    path = models.CharField(_("Đường dẫn cây"), max_length=255, blank=True, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(_("Cấp"), default=0, editable=False)
     
     class Meta:
         verbose_name = _("Danh mục")
@@ -27,21 +33,90 @@ class Category(models.Model):
     def __str__(self):
         return self.name
     
+    def _tree_paths(self):
+        """(path hiện tại, path của danh mục cha); kiểm tra danh mục cha không nằm trong cây con"""
+        # Đọc path từ DB thay vì từ instance (có thể đã cũ nếu cây vừa bị dời)
+        paths = dict(Category.objects.filter(pk__in=[self.pk, self.parent_id]).values_list('pk', 'path'))
+        old_path = paths.get(self.pk, '')
+        parent_path = paths.get(self.parent_id, '') if self.parent_id else ''
+        if old_path and parent_path.startswith(old_path):
+            raise ValidationError({'parent': _("Không thể chọn danh mục con làm danh mục cha.")})
+        return old_path, parent_path
+    
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            self._tree_paths()
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        
+        old_path, parent_path = self._tree_paths()
+        
+        with transaction.atomic():
+            if self.pk is None:
+                super().save(*args, **kwargs)
+                # Danh mục mới: cần id để tạo đường dẫn, lưu lại lần nữa chỉ với path/depth
+                self.path = f'{parent_path}{self.pk}/'
+                self.depth = self.path.count('/') - 1
+                super().save(update_fields=['path', 'depth'])
+                return
+            
+            new_path = f'{parent_path}{self.pk}/'
+            if new_path != old_path:
+                depth = new_path.count('/') - 1
+                if old_path:
+                    # Dời cả cây con: thay tiền tố đường dẫn trong một câu UPDATE
+                    Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                        depth=F('depth') + (depth - (old_path.count('/') - 1)),
+                    )
+                self.path, self.depth = new_path, depth
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = set(kwargs['update_fields']) | {'path', 'depth'}
+            super().save(*args, **kwargs)
     
     def get_absolute_url(self):
         return reverse('products:category_detail', kwargs={'slug': self.slug})
     
+    def get_descendants(self, include_self=False):
+        """Tất cả danh mục con cháu trong một truy vấn"""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
     @property
     def get_all_children(self):
         """Lấy tất cả danh mục con (đệ quy)"""
-        children = list(self.children.all())
-        for child in self.children.all():
-            children.extend(child.get_all_children)
-        return children
+        return list(self.get_descendants().order_by('path'))
+    
+    @classmethod
+    def rebuild_paths(cls):
+        """Tính lại path/depth của toàn bộ cây từ quan hệ parent (sau khi xóa danh mục cha...)"""
+        categories = {c.pk: c for c in cls.objects.only('id', 'parent_id', 'path', 'depth')}
+        
+        def compute(category, seen=()):
+            parent = categories.get(category.parent_id)
+            if parent is None or parent.pk in seen:
+                return f'{category.pk}/'
+            return compute(parent, seen + (category.pk,)) + f'{category.pk}/'
+        
+        changed = []
+        for category in categories.values():
+            path = compute(category)
+            depth = path.count('/') - 1
+            if (category.path, category.depth) != (path, depth):
+                category.path, category.depth = path, depth
+                changed.append(category)
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        return len(changed)
 
 
 class ProductTag(models.Model):
@@ -89,6 +164,12 @@ class Product(models.Model):
         verbose_name = _("Sản phẩm")
         verbose_name_plural = _("Sản phẩm")
         ordering = ['-created_at']
+        indexes = [
+            # Cửa hàng chỉ đọc sản phẩm đang bán: lọc theo danh mục/giá và phân trang theo thời gian
+            models.Index(fields=['category', 'price'], condition=models.Q(is_active=True), name='product_active_category_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_active=True), name='product_active_price_idx'),
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True), name='product_active_time_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -178,4 +259,38 @@ class VariantAttribute(models.Model):
         unique_together = ('variant', 'attribute_type')
     
     def __str__(self):
-        return f"{self.get_attribute_type_display()}: {self.value}" 
\ No newline at end of file
+        return f"{self.get_attribute_type_display()}: {self.value}" 
+
+class ProductSearchToken(models.Model):
+    """Chỉ mục đảo cho tìm kiếm sản phẩm: mỗi dòng là một từ (đã bỏ dấu) của một sản phẩm"""
+    token = models.CharField("Từ khóa", max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE,
+                              related_name='search_tokens', verbose_name="Sản phẩm")
+    weight = models.PositiveIntegerField("Trọng số", default=1)
+    
+    class Meta:
+        verbose_name = "Từ khóa tìm kiếm"
+        verbose_name_plural = "Từ khóa tìm kiếm"
+        unique_together = ('token', 'product')
+    
+    def __str__(self):
+        return f"{self.token} → {self.product_id}"
+
+
+class ProductFacet(models.Model):
+    """Chỉ mục bộ lọc: mỗi dòng là một giá trị thuộc tính (facet) của sản phẩm"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE,
+                              related_name='facets', verbose_name="Sản phẩm")
+    facet = models.CharField("Thuộc tính", max_length=50)
+    value = models.CharField("Giá trị", max_length=100)
+    
+    class Meta:
+        verbose_name = "Giá trị bộ lọc"
+        verbose_name_plural = "Giá trị bộ lọc"
+        unique_together = ('product', 'facet', 'value')
+        indexes = [
+            models.Index(fields=['facet', 'value', 'product']),
+        ]
+    
+    def __str__(self):
+        return f"{self.facet}={self.value} → {self.product_id}"
@@ -0,0 +1,121 @@
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductSearchToken
+
+
+# Trọng số của từng trường khi tính điểm xếp hạng
+FIELD_WEIGHTS = (
+    ('sku', 8),
+    ('name', 5),
+    ('material', 2),
+    ('color', 2),
+    ('description', 1),
+)
+
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Chữ thường, bỏ dấu tiếng Việt: 'Ghế Đôn' -> 'ghe don'"""
+    text = (text or '').lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall(normalize(text))
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+
+def product_tokens(product):
+    """Tính {token: trọng số} cho một sản phẩm"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = getattr(product, field, '') or ''
+        # Mã "GH-001" được tách thành "gh", "001"; truy vấn "GH-001" cũng được tách như vậy
+        for token in set(tokenize(value)):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def index_product(product):
+    """Ghi lại toàn bộ từ khóa của sản phẩm vào chỉ mục"""
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product=product).delete()
+        ProductSearchToken.objects.bulk_create([
+            ProductSearchToken(token=token, product=product, weight=weight)
+            for token, weight in product_tokens(product).items()
+        ])
+
+
+def rebuild_index(queryset=None, batch_size=1000):
+    """Dựng lại chỉ mục cho toàn bộ (hoặc một phần) sản phẩm; trả về số sản phẩm đã xử lý"""
+    queryset = queryset if queryset is not None else Product.objects.all()
+    fields = ['id'] + [field for field, _ in FIELD_WEIGHTS]
+    count = 0
+    batch = []
+    for product in queryset.only(*fields).iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            count += _index_batch(batch)
+            batch = []
+    if batch:
+        count += _index_batch(batch)
+    return count
+
+
+def _index_batch(products):
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product__in=products).delete()
+        ProductSearchToken.objects.bulk_create([
+            ProductSearchToken(token=token, product=product, weight=weight)
+            for product in products
+            for token, weight in product_tokens(product).items()
+        ], batch_size=1000)
+    return len(products)
+
+
+def _term_q(term, prefix=False):
+    if prefix:
+        # Dùng khoảng [term, term + '\uffff') thay cho LIKE để tận dụng index trên token
+        return Q(token__gte=term, token__lt=term + '\uffff')
+    return Q(token=term)
+
+
+def search_products(query, queryset=None):
+    """
+    Tìm sản phẩm theo chỉ mục đảo, sắp xếp theo điểm `search_rank` giảm dần.
+
+    Mọi từ trong truy vấn đều phải khớp; từ cuối cùng được khớp theo tiền tố
+    để hỗ trợ gõ dở ("ghe so" tìm được "ghế sofa").
+    """
+    queryset = queryset if queryset is not None else Product.objects.all()
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset.none()
+    
+    matches = Q()
+    for i, term in enumerate(terms):
+        term_q = _term_q(term, prefix=i == len(terms) - 1)
+        matches |= term_q
+        queryset = queryset.filter(
+            pk__in=ProductSearchToken.objects.filter(term_q).values('product_id')
+        )
+    
+    rank = ProductSearchToken.objects.filter(matches, product=OuterRef('pk')).values(
+        'product'
+    ).annotate(total=Sum('weight')).values('total')
+    return queryset.annotate(
+        search_rank=Coalesce(Subquery(rank, output_field=IntegerField()), 0)
+    ).order_by('-search_rank', '-created_at')
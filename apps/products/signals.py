@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import Product, ProductImage
+from apps.inventory.models import Stock
+from core.page_cache import bump_scopes
+from .facets import refresh_product_facets, refresh_stock_facets
+from .models import Category, Product, ProductImage, ProductTag, ProductVariant, VariantAttribute
+from .search import index_product
+from .tree import invalidate_category_tree
 
 
 @receiver(post_save, sender=ProductImage)
@@ -39,4 +45,105 @@ def handle_deleted_product_image(sender, instance, **kwargs):
             
             # Update the product's main image
             instance.product.image = next_image.image
-            instance.product.save(update_fields=['image']) 
\ No newline at end of file
+            instance.product.save(update_fields=['image'])
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Các danh mục con đã bị đặt parent = NULL (SET_NULL) nên phải tính lại đường dẫn
+    if Category.objects.filter(path__startswith=instance.path).exists():
+        Category.rebuild_paths()
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Cập nhật chỉ mục tìm kiếm khi sản phẩm thay đổi (sau khi giao dịch commit)"""
+    if update_fields is not None and not {'name', 'sku', 'description', 'material', 'color'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: index_product(instance))
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'price', 'discount_price', 'material', 'color'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: refresh_product_facets([instance.pk]))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def variant_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_product_facets([instance.product_id]))
+
+
+@receiver(post_save, sender=VariantAttribute)
+@receiver(post_delete, sender=VariantAttribute)
+def variant_attribute_changed(sender, instance, **kwargs):
+    product_id = ProductVariant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True).first()
+    if product_id:
+        transaction.on_commit(lambda: refresh_product_facets([product_id]))
+
+
+@receiver(post_init, sender=Stock)
+def remember_stock_availability(sender, instance, **kwargs):
+    quantity = instance.__dict__.get('quantity')
+    instance._was_in_stock = None if instance.__dict__.get('id') is None or quantity is None else quantity > 0
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def stock_changed(sender, instance, **kwargs):
+    # Facet "còn hàng" chỉ đổi khi số lượng chuyển giữa 0 và > 0
+    in_stock = kwargs['signal'] is not post_delete and instance.quantity > 0
+    if getattr(instance, '_was_in_stock', None) == in_stock:
+        return
+    instance._was_in_stock = in_stock
+    transaction.on_commit(lambda: refresh_stock_facets([instance.product_id]))
+
+
+# Cache trang cửa hàng (core.page_cache): tăng phiên bản các phạm vi bị ảnh hưởng
+
+@receiver(post_init, sender=Product)
+def remember_page_category(sender, instance, **kwargs):
+    instance._page_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_pages_changed(sender, instance, **kwargs):
+    old_category_id = getattr(instance, '_page_category_id', None) or instance.category_id
+    bump_scopes('catalog', f'product:{instance.pk}', f'category:{instance.category_id}', f'category:{old_category_id}')
+    instance._page_category_id = instance.category_id
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_pages_changed(sender, instance, **kwargs):
+    bump_scopes('catalog', 'categories', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=ProductTag)
+@receiver(post_delete, sender=ProductTag)
+def tag_pages_changed(sender, **kwargs):
+    bump_scopes('catalog')
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def product_detail_changed(sender, instance, **kwargs):
+    bump_scopes(f'product:{instance.product_id}')
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def stock_page_changed(sender, instance, **kwargs):
+    # Trang danh sách phụ thuộc phiên bản facet, chỉ tăng khi facet còn hàng thay đổi
+    bump_scopes(f'product:{instance.product_id}')
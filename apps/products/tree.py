@@ -0,0 +1,64 @@
+from django.core.cache import cache
+
+from .models import Category
+
+
+CATEGORY_TREE_CACHE_KEY = 'products:category_tree'
+CATEGORY_TREE_TIMEOUT = 60 * 60
+
+
+def _build_tree():
+    nodes = {}
+    for row in Category.objects.order_by('path').values(
+        'id', 'name', 'slug', 'parent_id', 'path', 'depth', 'is_active'
+    ):
+        row['children'] = []
+        nodes[row['id']] = row
+    roots = []
+    # Sắp theo path nên cha luôn được duyệt trước con
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        (parent['children'] if parent else roots).append(node['id'])
+    return {'nodes': nodes, 'roots': roots}
+
+
+def get_category_tree():
+    """
+    Cây danh mục dựng từ một truy vấn và lưu trong cache.
+
+    Trả về {'nodes': {id: node}, 'roots': [id]}; mỗi node có `children` là danh
+    sách id. Cache bị xóa khi danh mục được lưu hoặc xóa (xem signals).
+    """
+    tree = cache.get(CATEGORY_TREE_CACHE_KEY)
+    if tree is None:
+        tree = _build_tree()
+        cache.set(CATEGORY_TREE_CACHE_KEY, tree, CATEGORY_TREE_TIMEOUT)
+    return tree
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_CACHE_KEY)
+
+
+def get_category_node(category_id):
+    try:
+        return get_category_tree()['nodes'].get(int(category_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def descendant_ids(category_id, include_self=True, active_only=False):
+    """Id của toàn bộ danh mục con cháu, lấy từ cây trong cache (không truy vấn DB)"""
+    node = get_category_node(category_id)
+    if node is None:
+        return []
+    nodes = get_category_tree()['nodes']
+    ids = [node['id']] if include_self else []
+    stack = list(node['children'])
+    while stack:
+        child = nodes[stack.pop()]
+        if active_only and not child['is_active']:
+            continue
+        ids.append(child['id'])
+        stack.extend(child['children'])
+    return ids
@@ -1,18 +1,30 @@
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
 from django.db.utils import OperationalError
+from core.page_cache import cache_page_for_visitors, depends_on
+from core.pagination import KeysetPaginator
+from .facets import FACET_VERSION_KEY, facet_counts, facet_groups, filter_by_facets, selected_facets
 from .models import Product, Category, ProductTag
+from .search import search_products
+from .tree import descendant_ids
 
 
+@cache_page_for_visitors
 def product_list(request):
     try:
+        versions = depends_on(request, 'catalog', 'categories', 'facets', keys={'facets': FACET_VERSION_KEY})
         products = Product.objects.filter(is_active=True)
         categories = Category.objects.filter(is_active=True)
         
-        # Filter products by category
+        # Filter products by category (gồm cả danh mục con cháu, lấy từ cây trong cache)
         category_id = request.GET.get('category')
         if category_id:
-            products = products.filter(category_id=category_id)
+            products = products.filter(category_id__in=descendant_ids(category_id, active_only=True))
+        
+        # Tìm kiếm toàn văn (chỉ mục đảo, xếp hạng theo độ liên quan)
+        search_query = request.GET.get('q', '').strip()
+        if search_query:
+            products = search_products(search_query, products)
         
         # Filter products by price range
         min_price = request.GET.get('min_price')
@@ -22,6 +34,17 @@ def product_list(request):
         if max_price:
             products = products.filter(price__lte=max_price)
         
+        # Bộ lọc facet (chất liệu, màu sắc, thuộc tính biến thể, khoảng giá, còn hàng)
+        selected = selected_facets(request.GET)
+        products = filter_by_facets(products, selected)
+        
+        # Số lượng theo facet và tổng số sản phẩm, cache theo bộ lọc hiện tại
+        params = request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        params.pop('sort', None)
+        counts = facet_counts(products, signature=sorted(params.lists()))
+        
         # Sort products
         sort_by = request.GET.get('sort')
         if sort_by == 'price_asc':
@@ -33,15 +56,29 @@ def product_list(request):
         elif sort_by == 'name_asc':
             products = products.order_by('name')
         
-        # Pagination
-        paginator = Paginator(products, 12)  # Show 12 products per page
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # Pagination: thứ tự mặc định (mới nhất) phân trang theo khóa (created_at, id),
+        # các kiểu sắp xếp khác vẫn phân trang theo số trang
+        if not search_query and sort_by in (None, '', 'newest'):
+            paginator = KeysetPaginator(products, 12, count=(counts['total'], True))
+            page_obj = paginator.page(request.GET.get('cursor'), request.GET)
+        else:
+            paginator = Paginator(products, 12)  # Show 12 products per page
+            paginator.count = counts['total']  # Dùng tổng đã đếm, không COUNT lại
+            page_number = request.GET.get('page')
+            page_obj = paginator.get_page(page_number)
+        
+        query_params = request.GET.copy()
+        query_params.pop('page', None)
+        query_params.pop('cursor', None)
         
         context = {
             'page_obj': page_obj,
+            'facet_groups': facet_groups(counts, selected),
+            'query_string': query_params.urlencode(),
             'categories': categories,
+            'categories_version': versions['categories'],
             'selected_category': category_id,
+            'search_query': search_query,
             'min_price': min_price,
             'max_price': max_price,
             'sort_by': sort_by,
@@ -60,8 +97,10 @@ def product_list(request):
         return render(request, 'products/product_list.html', context)
 
 
+@cache_page_for_visitors
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, is_active=True)
+    depends_on(request, f'product:{product.pk}', f'category:{product.category_id}', 'categories')
     
     # Get related products from the same category
     related_products = Product.objects.filter(
@@ -78,15 +117,16 @@ def product_detail(request, slug):
     return render(request, 'products/product_detail.html', context)
 
 
+@cache_page_for_visitors
 def category_detail(request, slug):
+    versions = depends_on(request, 'catalog', 'categories')
     category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = Product.objects.filter(category=category, is_active=True)
-    
-    # Also include products from child categories
+    # Sản phẩm của danh mục và toàn bộ danh mục con cháu trong một truy vấn
+    products = Product.objects.filter(
+        category_id__in=descendant_ids(category.pk, active_only=True),
+        is_active=True,
+    )
     child_categories = Category.objects.filter(parent=category, is_active=True)
-    for child in child_categories:
-        child_products = Product.objects.filter(category=child, is_active=True)
-        products = products | child_products
     
     # Sort products
     sort_by = request.GET.get('sort')
@@ -108,6 +148,7 @@ def category_detail(request, slug):
         'category': category,
         'page_obj': page_obj,
         'child_categories': child_categories,
+        'categories_version': versions['categories'],
         'sort_by': sort_by,
         'title': category.name,
     }
@@ -115,7 +156,9 @@ def category_detail(request, slug):
     return render(request, 'products/category_detail.html', context)
 
 
+@cache_page_for_visitors
 def product_tag(request, slug):
+    depends_on(request, 'catalog')
     tag = get_object_or_404(ProductTag, slug=slug)
     products = Product.objects.filter(tags=tag, is_active=True)
     
@@ -39,13 +39,13 @@ class ScheduledReportAdmin(admin.ModelAdmin):
 
 @admin.register(ReportExecution)
 class ReportExecutionAdmin(admin.ModelAdmin):
-    list_display = ('report', 'executed_by', 'executed_at', 'status')
+    list_display = ('report', 'executed_by', 'executed_at', 'status', 'duration')
     list_filter = ('status', 'executed_at')
     search_fields = ('report__title',)
-    readonly_fields = ('executed_at',)
+    readonly_fields = ('executed_at', 'started_at', 'finished_at')
     fieldsets = (
         ('Báo cáo', {
-            'fields': ('report', 'executed_by', 'executed_at')
+            'fields': ('report', 'executed_by', 'executed_at', 'started_at', 'finished_at')
         }),
         ('Kết quả', {
             'fields': ('status', 'result_data', 'error_message'),
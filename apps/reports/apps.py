@@ -1 +1,11 @@
- 
\ No newline at end of file
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class ReportsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.reports'
+    verbose_name = _('Báo cáo')
+    
+    def ready(self):
+        import apps.reports.signals
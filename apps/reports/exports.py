@@ -0,0 +1,112 @@
+import csv
+import tempfile
+
+import xlsxwriter
+from django.http import FileResponse, StreamingHttpResponse
+
+
+# Số dòng đọc từ DB mỗi lần khi xuất báo cáo lớn
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Bộ đệm giả cho csv.writer: trả lại dòng đã định dạng thay vì lưu lại"""
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, headers, rows, title=None, meta_lines=(), summary=None):
+    """
+    Trả về file CSV dạng stream, không giữ toàn bộ nội dung trong bộ nhớ.
+
+    `rows` là một iterable (thường là `queryset.iterator()`), `summary` là hàm
+    trả về danh sách (cột, giá trị) được gọi sau khi đã ghi hết các dòng.
+    """
+    writer = csv.writer(Echo())
+
+    def generate():
+        # BOM để Excel nhận đúng tiếng Việt
+        yield '\ufeff'
+        if title:
+            yield writer.writerow([title])
+        for line in meta_lines:
+            yield writer.writerow([line])
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+        if summary:
+            cells = [''] * len(headers)
+            cells[0] = "TỔNG CỘNG:"
+            for col, value in summary():
+                cells[col] = value
+            yield writer.writerow(cells)
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, headers, rows, title=None, meta_lines=(), summary=None):
+    """
+    Ghi file Excel ở chế độ `constant_memory` của xlsxwriter ra file tạm.
+
+    Mỗi dòng được ghi xuống đĩa ngay sau khi viết, nên bộ nhớ không tăng theo
+    số dòng. File tạm được stream về client và tự xóa khi đóng.
+    """
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'in_memory': False})
+    worksheet = workbook.add_worksheet()
+
+    header_format = workbook.add_format({
+        'bold': True,
+        'font_size': 12,
+        'align': 'center',
+        'valign': 'vcenter',
+        'bg_color': '#4F81BD',
+        'color': 'white',
+        'border': 1
+    })
+
+    # Ở chế độ constant_memory phải ghi lần lượt từng dòng từ trên xuống
+    row = 0
+    if title:
+        worksheet.merge_range(0, 0, 0, len(headers) - 1, title, header_format)
+        row = 2
+    for line in meta_lines:
+        worksheet.write(row, 0, line)
+        row += 1
+    if title or meta_lines:
+        row += 1
+
+    for col, header in enumerate(headers):
+        worksheet.write(row, col, header, header_format)
+    row += 1
+
+    for values in rows:
+        worksheet.write_row(row, 0, values)
+        row += 1
+
+    if summary:
+        row += 1
+        worksheet.write(row, 0, "TỔNG CỘNG:", header_format)
+        for col, value in summary():
+            worksheet.write(row, col, value, header_format)
+
+    workbook.close()
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def export_response(request, filename, headers, rows, **kwargs):
+    """Chọn CSV (stream) hoặc Excel theo tham số `?format=csv|xlsx`"""
+    if request.GET.get('format') == 'csv':
+        return csv_response(filename, headers, rows, **kwargs)
+    return xlsx_response(filename, headers, rows, **kwargs)
@@ -0,0 +1,28 @@
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderItem
+from apps.reports.models import DailySalesRollup
+from apps.reports.rollups import day_bounds
+from core.db.explain import hot_query
+
+
+@hot_query('reports.daily_sales_refresh')
+def daily_sales_refresh():
+    # Dựng lại từng ngày/chi nhánh (rebuild_sales_rollup)
+    return Order.objects.filter(branch_id=1, created_at__range=day_bounds(timezone.localdate())).values(
+        'sales_staff', 'status'
+    ).order_by()
+
+
+@hot_query('reports.rollup_delta')
+def rollup_delta():
+    # Chạy với mỗi lần lưu đơn hàng/dòng hàng (apply_deltas)
+    return DailySalesRollup.objects.filter(
+        date=timezone.localdate(), branch_id=1, sales_staff_id=None, category_id=None, status='PENDING',
+    )
+
+
+@hot_query('reports.order_items_by_category')
+def order_items_by_category():
+    # Chuyển dòng hàng sang khóa mới khi đơn đổi trạng thái (record_order_change)
+    return OrderItem.objects.filter(order_id=1).values('product__category').order_by()
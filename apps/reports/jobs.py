@@ -0,0 +1,263 @@
+import calendar
+import json
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from apps.branches.models import Branch
+from apps.inventory.ledger import stock_as_of
+from apps.inventory.models import Stock
+from apps.orders.models import Order, Payment
+from apps.products.models import Product
+from apps.reports.models import Report, ReportExecution, ScheduledReport
+from apps.reports.rollups import item_rollups, order_rollups
+from apps.reports.timeseries import bucket_series
+from apps.suppliers.models import PurchaseOrder
+
+
+# Lần chạy ở trạng thái 'running' lâu hơn chừng này coi như worker đã chết
+EXECUTION_TIMEOUT = timedelta(minutes=30)
+MAX_EXECUTION_ATTEMPTS = 3
+
+
+def _date_range(parameters):
+    """Khoảng thời gian của báo cáo: start_date/end_date (YYYY-MM-DD) hoặc `days` ngày gần nhất"""
+    today = timezone.localdate()
+    end = date.fromisoformat(parameters['end_date']) if parameters.get('end_date') else today
+    if parameters.get('start_date'):
+        start = date.fromisoformat(parameters['start_date'])
+    else:
+        start = end - timedelta(days=int(parameters.get('days', 30)) - 1)
+    return start, end
+
+
+def _sales_report(report, start, end):
+    filters = {'branch': report.branch, 'start': start, 'end': end}
+    return {
+        'summary': order_rollups(**filters).aggregate(
+            count=Sum('order_count'),
+            total=Sum('order_total'),
+        ),
+        'by_day': bucket_series(
+            order_rollups(branch=report.branch), 'date', start, end, 'day',
+            count=Sum('order_count'), total=Sum('order_total'),
+        ),
+        'by_status': list(order_rollups(**filters).values('status').annotate(
+            count=Sum('order_count'),
+            total=Sum('order_total'),
+        ).order_by('status')),
+        'by_category': list(item_rollups(**filters).values('category__name').annotate(
+            quantity=Sum('quantity'),
+            revenue=Sum('revenue'),
+        ).order_by('-revenue')),
+    }
+
+
+def _inventory_as_of(report, as_of):
+    """Tồn kho và giá trị tại cuối ngày `as_of`, tính từ sổ cái chuyển động kho"""
+    when = timezone.make_aware(datetime.combine(as_of, time.max))
+    branch_ids = [report.branch_id] if report.branch_id else Branch.objects.values_list('id', flat=True)
+    quantities = Counter()
+    for branch_id in branch_ids:
+        for (product_id, _variant_id), quantity in stock_as_of(branch_id, when).items():
+            quantities[product_id] += quantity
+
+    summary = {'total_items': 0, 'total_value': 0}
+    by_category = {}
+    for product_id, price, category in Product.objects.filter(pk__in=quantities).values_list(
+        'id', 'price', 'category__name'
+    ):
+        quantity = quantities[product_id]
+        row = by_category.setdefault(category, {'product__category__name': category, 'total_items': 0, 'total_value': 0})
+        for target in (summary, row):
+            target['total_items'] += quantity
+            target['total_value'] += quantity * price
+    return {
+        'as_of': as_of,
+        'summary': summary,
+        'by_category': sorted(by_category.values(), key=lambda row: row['total_value'], reverse=True),
+    }
+
+
+def _inventory_report(report, start, end):
+    as_of = (report.parameters or {}).get('as_of')
+    if as_of:
+        return _inventory_as_of(report, date.fromisoformat(as_of))
+    stocks = Stock.objects.all()
+    if report.branch:
+        stocks = stocks.filter(branch=report.branch)
+    return {
+        'summary': stocks.aggregate(
+            total_items=Sum('quantity'),
+            total_value=Sum(F('quantity') * F('product__price')),
+            low_stock=Count('id', filter=Q(quantity__lte=F('min_quantity'))),
+            out_of_stock=Count('id', filter=Q(quantity=0)),
+        ),
+        'by_category': list(stocks.values('product__category__name').annotate(
+            total_items=Sum('quantity'),
+            total_value=Sum(F('quantity') * F('product__price')),
+        ).order_by('-total_value')),
+    }
+
+
+def _customer_report(report, start, end):
+    orders = Order.objects.filter(created_at__date__gte=start, created_at__date__lte=end)
+    if report.branch:
+        orders = orders.filter(branch=report.branch)
+    return {
+        'summary': orders.aggregate(customers=Count('customer', distinct=True)),
+        'top_customers': list(orders.values('customer__username').annotate(
+            orders=Count('id'),
+            total=Sum('total'),
+        ).order_by('-total')[:50]),
+    }
+
+
+def _supplier_report(report, start, end):
+    purchase_orders = PurchaseOrder.objects.filter(
+        created_at__date__gte=start, created_at__date__lte=end
+    )
+    return {
+        'by_supplier': list(purchase_orders.values('supplier__name').annotate(
+            orders=Count('id'),
+            total=Sum('total_amount'),
+        ).order_by('-total')),
+        'by_status': list(purchase_orders.values('status').annotate(
+            orders=Count('id'),
+        ).order_by('status')),
+    }
+
+
+def _finance_report(report, start, end):
+    payments = Payment.objects.filter(
+        status='COMPLETED', created_at__date__gte=start, created_at__date__lte=end
+    )
+    if report.branch:
+        payments = payments.filter(order__branch=report.branch)
+    return {
+        'summary': payments.aggregate(count=Count('id'), total=Sum('amount')),
+        'by_method': list(payments.values('payment_method').annotate(
+            count=Count('id'),
+            total=Sum('amount'),
+        ).order_by('payment_method')),
+    }
+
+
+REPORT_RUNNERS = {
+    'sales': _sales_report,
+    'inventory': _inventory_report,
+    'customer': _customer_report,
+    'supplier': _supplier_report,
+    'finance': _finance_report,
+}
+
+
+def build_report_data(report):
+    """Tính dữ liệu của báo cáo, trả về dict có thể lưu vào JSONField"""
+    runner = REPORT_RUNNERS.get(report.report_type)
+    if runner is None:
+        raise ValueError(f'Loại báo cáo không được hỗ trợ: {report.report_type}')
+    start, end = _date_range(report.parameters or {})
+    data = runner(report, start, end)
+    data['period'] = {'start': start, 'end': end}
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def queue_report(report, user=None):
+    """Đưa báo cáo vào hàng đợi để worker chạy nền"""
+    return ReportExecution.objects.create(report=report, executed_by=user, status='pending')
+
+
+def claim_execution(execution_id):
+    """Nhận một lần chạy đang chờ; trả về False nếu worker khác đã nhận"""
+    return ReportExecution.objects.filter(pk=execution_id, status='pending').update(
+        status='running',
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    ) == 1
+
+
+def recover_stale_executions(now=None):
+    """
+    Xử lý các lần chạy bị kẹt ở 'running' quá `EXECUTION_TIMEOUT` (worker bị tắt/chết giữa chừng).
+
+    Lần chạy được đưa lại hàng đợi nếu chưa nhận quá `MAX_EXECUTION_ATTEMPTS` lần,
+    ngược lại bị đánh dấu thất bại. Trả về (số lần đưa lại hàng đợi, số lần thất bại).
+    """
+    now = now or timezone.now()
+    stale = ReportExecution.objects.filter(status='running', started_at__lt=now - EXECUTION_TIMEOUT)
+    failed = stale.filter(attempts__gte=MAX_EXECUTION_ATTEMPTS).update(
+        status='failed',
+        error_message='Worker không hoàn thành báo cáo sau nhiều lần chạy.',
+        finished_at=now,
+    )
+    requeued = stale.update(status='pending', started_at=None)
+    return requeued, failed
+
+
+def run_execution(execution_id):
+    """Chạy một lần báo cáo đã được nhận và lưu kết quả, trạng thái, thời gian"""
+    execution = ReportExecution.objects.select_related('report', 'report__branch').get(pk=execution_id)
+    # Chỉ ghi kết quả nếu lần nhận này chưa bị `recover_stale_executions` thu hồi
+    claimed = ReportExecution.objects.filter(pk=execution_id, status='running', attempts=execution.attempts)
+    try:
+        result = build_report_data(execution.report)
+    except Exception as e:
+        claimed.update(
+            status='failed',
+            error_message=str(e),
+            finished_at=timezone.now(),
+        )
+        return 'failed'
+
+    finished_at = timezone.now()
+    if not claimed.update(
+        status='completed',
+        result_data=result,
+        error_message=None,
+        finished_at=finished_at,
+    ):
+        return 'stale'
+    Report.objects.filter(pk=execution.report_id).update(last_run=finished_at)
+    return 'completed'
+
+
+def _next_run(current, frequency):
+    if frequency == 'daily':
+        return current + timedelta(days=1)
+    if frequency == 'weekly':
+        return current + timedelta(days=7)
+    months = 3 if frequency == 'quarterly' else 1
+    year, month = divmod(current.month - 1 + months, 12)
+    year += current.year
+    month += 1
+    # Giữ ngày trong tháng, lùi về ngày cuối tháng nếu tháng mới ngắn hơn
+    day = min(current.day, calendar.monthrange(year, month)[1])
+    return current.replace(year=year, month=month, day=day)
+
+
+def schedule_due_reports(now=None):
+    """Tạo lần chạy cho các báo cáo định kỳ đến hạn và dời lịch chạy tiếp theo"""
+    now = now or timezone.now()
+    queued = []
+    for scheduled in ScheduledReport.objects.filter(active=True, next_run__lte=now).select_related('report'):
+        next_run = scheduled.next_run
+        while next_run <= now:
+            next_run = _next_run(next_run, scheduled.frequency)
+        # Chỉ worker dời được lịch mới được tạo lần chạy, tránh chạy trùng
+        moved = ScheduledReport.objects.filter(
+            pk=scheduled.pk, next_run=scheduled.next_run
+        ).update(next_run=next_run)
+        if moved:
+            queued.append(queue_report(scheduled.report))
+    return queued
+
+
+def latest_result(report):
+    """Lần chạy hoàn thành gần nhất của báo cáo (để giao diện dùng lại kết quả)"""
+    return ReportExecution.objects.filter(
+        report=report, status='completed'
+    ).order_by('-finished_at').first()
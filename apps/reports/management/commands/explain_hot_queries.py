@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db.explain import full_scans, load_hot_queries
+
+
+class Command(BaseCommand):
+    help = 'Chạy EXPLAIN cho các truy vấn nóng đã đăng ký (module hot_queries của mỗi app); lỗi nếu có truy vấn quét toàn bảng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Chỉ kiểm tra các truy vấn này')
+        parser.add_argument('--plans', action='store_true', help='In kế hoạch thực thi của từng truy vấn')
+
+    def handle(self, *args, **options):
+        queries = load_hot_queries()
+        names = options['names'] or sorted(queries)
+        unknown = [name for name in names if name not in queries]
+        if unknown:
+            raise CommandError(f'Không có truy vấn nóng: {", ".join(unknown)}')
+
+        failed = []
+        for name in names:
+            queryset = queries[name]()
+            plan = queryset.explain()
+            scanned = full_scans(plan, limited=queryset.query.high_mark is not None)
+            if scanned:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: quét toàn bảng {", ".join(scanned)}'))
+            else:
+                self.stdout.write(f'{name}: OK')
+            if options['plans'] or scanned:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if failed:
+            raise CommandError(f'{len(failed)}/{len(names)} truy vấn nóng quét toàn bảng.')
+        self.stdout.write(self.style.SUCCESS(f'{len(names)} truy vấn nóng đều dùng chỉ mục.'))
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+
+from apps.orders.models import Order
+from apps.reports.models import DailySalesRollup
+from apps.reports.rollups import refresh_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng tổng hợp doanh số theo ngày từ dữ liệu đơn hàng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=str, help='Từ ngày (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', type=str, help='Đến ngày (YYYY-MM-DD)')
+        parser.add_argument('--branch', type=int, help='Chỉ tính lại cho chi nhánh này')
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Ngày không hợp lệ: "{value}"')
+
+    def handle(self, *args, **options):
+        start = self._parse_date(options['start'])
+        end = self._parse_date(options['end'])
+        
+        orders = Order.objects.annotate(day=TruncDate('created_at'))
+        rollups = DailySalesRollup.objects.all()
+        if options['branch']:
+            orders = orders.filter(branch_id=options['branch'])
+            rollups = rollups.filter(branch_id=options['branch'])
+        if start:
+            orders = orders.filter(day__gte=start)
+            rollups = rollups.filter(date__gte=start)
+        if end:
+            orders = orders.filter(day__lte=end)
+            rollups = rollups.filter(date__lte=end)
+        
+        # Gồm cả các ngày chỉ còn dòng tổng hợp cũ (đơn hàng đã bị xóa)
+        keys = set(orders.values_list('branch_id', 'day').distinct().order_by())
+        keys |= set(rollups.values_list('branch_id', 'date').distinct().order_by())
+        
+        for branch_id, day in sorted(keys):
+            refresh_daily_sales(branch_id, day)
+        
+        self.stdout.write(self.style.SUCCESS(f'Đã tính lại {len(keys)} ngày/chi nhánh.'))
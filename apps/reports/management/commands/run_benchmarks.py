@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from apps.accounts.models import User
+from apps.branches.models import Branch
+from apps.cart.models import Cart, CartItem
+from apps.inventory.models import Stock
+from core.benchmarks import Benchmark, compare_results, load_results, run_benchmark, write_results
+
+from .seed_benchmark_data import PREFIX
+
+
+# Đo trang đầu như client thật (`?limit=`), không đo cả danh sách không phân trang.
+# Các endpoint chưa có phân trang (biến thể, danh mục, chi nhánh, tồn kho) bỏ qua tham số này.
+API_PAGE_SIZE = 50
+
+API_ENDPOINTS = ['products', 'product-variants', 'categories', 'branches', 'orders', 'stocks', 'stock-transfers']
+
+
+class Command(BaseCommand):
+    help = 'Đo thời gian và số truy vấn của các view quan trọng trên dữ liệu benchmark (xem seed_benchmark_data), ghi kết quả JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Chỉ chạy các kịch bản này')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--output', default='benchmark_results.json')
+        parser.add_argument('--compare', help='File kết quả của lần chạy trước để so sánh')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Chậm hơn tỉ lệ này (theo trung vị) là hồi quy')
+
+    def user(self, suffix):
+        user = User.objects.filter(username=f'{PREFIX.lower()}_{suffix}').first()
+        if user is None:
+            raise CommandError('Chưa có dữ liệu benchmark; chạy "manage.py seed_benchmark_data" trước.')
+        return user
+
+    def scenarios(self):
+        branch = Branch.objects.filter(name__startswith=f'{PREFIX} ').order_by('pk').first()
+        if branch is None:
+            raise CommandError('Chưa có dữ liệu benchmark; chạy "manage.py seed_benchmark_data" trước.')
+        admin = self.user('admin')
+        customer = self.user('customer_0')
+        cart = Cart.objects.get_or_create(customer=customer)[0]
+        lines = list(Stock.objects.filter(branch=branch, quantity__gte=50).values_list('product_id', 'variant_id')[:3])
+
+        def fill_cart(client):
+            CartItem.objects.filter(cart=cart).delete()
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product_id=product_id, variant_id=variant_id, quantity=1)
+                for product_id, variant_id in lines
+            ])
+
+        checkout = {
+            'branch': branch.pk,
+            'recipient_name': 'Khách benchmark',
+            'recipient_phone': '0900000000',
+            'shipping_address': '1 Đường Benchmark',
+            'city': 'Hà Nội',
+            'district': 'Cầu Giấy',
+            'ward': 'Dịch Vọng',
+            'payment_method': 'CASH',
+            'shipping_fee': 0,
+            'tax': 0,
+            'discount': 0,
+        }
+        scenarios = [
+            Benchmark('create_order_from_cart', '/orders/checkout/', 'post', data=checkout, user=customer,
+                      setup=fill_cart, expected_status=302),
+            Benchmark('inventory_dashboard', '/inventory/', user=self.user('inventory')),
+            Benchmark('export_report', '/reports/export/sales/', data={'period': 'yearly', 'format': 'csv'}, user=admin),
+            # Khách chưa đăng nhập nhận trang từ cache; khách đã đăng nhập luôn render lại
+            Benchmark('storefront_product_list', '/products/'),
+            Benchmark('storefront_product_list_uncached', '/products/', user=customer),
+        ]
+        scenarios += [
+            Benchmark(f'api_{endpoint}_list', f'/api/{endpoint}/', data={'limit': API_PAGE_SIZE}, user=admin,
+                      HTTP_ACCEPT='application/json')
+            for endpoint in API_ENDPOINTS
+        ]
+        return scenarios
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        if options['names']:
+            unknown = set(options['names']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f'Không có kịch bản: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['names']]
+
+        # Đo như môi trường production: không ghi log truy vấn của DEBUG/debug toolbar
+        results = []
+        with override_settings(DEBUG=False, QUERY_INSPECT_ENABLED=False, ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            for scenario in scenarios:
+                result = run_benchmark(client, scenario, repeat=options['repeat'], warmup=options['warmup'])
+                results.append(result)
+                line = (f'{result["name"]}: median {result["median_ms"]}ms, p95 {result["p95_ms"]}ms, '
+                        f'{result["queries"]} truy vấn, HTTP {"/".join(map(str, result["status"]))}')
+                self.stdout.write(line if result['ok'] else self.style.WARNING(line))
+
+        write_results(options['output'], results, meta={'repeat': options['repeat'], 'warmup': options['warmup']})
+        self.stdout.write(f'Đã ghi kết quả vào {options["output"]}.')
+
+        if options['compare']:
+            regressions = compare_results(load_results(options['compare']), results, options['threshold'])
+            for item in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f'{item["name"]}: {item["median_ms"][0]} -> {item["median_ms"][1]}ms, '
+                    f'{item["queries"][0]} -> {item["queries"][1]} truy vấn'
+                ))
+            if regressions:
+                raise CommandError(f'{len(regressions)} kịch bản chậm hơn so với {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS(f'Không có hồi quy so với {options["compare"]}.'))
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.accounts.visits import flush_dashboard_visits_if_due
+from apps.reports.jobs import claim_execution, recover_stale_executions, run_execution, schedule_due_reports
+from apps.reports.models import ReportExecution
+
+
+def _init_worker():
+    """Khởi tạo tiến trình con: nạp Django và bỏ các kết nối DB kế thừa từ tiến trình cha"""
+    django.setup()
+    connections.close_all()
+
+
+def _run(execution_id):
+    try:
+        return run_execution(execution_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Chạy nền các báo cáo định kỳ và báo cáo trong hàng đợi (ReportExecution)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Số tiến trình chạy báo cáo')
+        parser.add_argument('--interval', type=float, default=10, help='Số giây giữa hai lần quét hàng đợi')
+        parser.add_argument('--batch', type=int, default=10, help='Số báo cáo tối đa nhận mỗi lần quét')
+        parser.add_argument('--once', action='store_true', help='Chỉ quét một lần rồi thoát')
+
+    def handle(self, *args, **options):
+        # Đóng kết nối trước khi tạo tiến trình con để không chia sẻ socket/file DB
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            while True:
+                requeued, failed = recover_stale_executions()
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(
+                        f'Lần chạy bị kẹt: {requeued} đưa lại hàng đợi, {failed} thất bại'
+                    ))
+                for execution in schedule_due_reports():
+                    self.stdout.write(f'Đã lên lịch: {execution.report}')
+                # Ghi thời gian truy cập dashboard đang chờ trong cache (xem RoleBasedAccessMiddleware)
+                flush_dashboard_visits_if_due()
+
+                pending = ReportExecution.objects.filter(status='pending').order_by(
+                    'executed_at'
+                ).values_list('pk', flat=True)[:options['batch']]
+                futures = {
+                    execution_id: pool.submit(_run, execution_id)
+                    for execution_id in pending
+                    if claim_execution(execution_id)
+                }
+
+                for execution_id, future in futures.items():
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        # Tiến trình con bị lỗi ngoài dự kiến: đánh dấu thất bại
+                        ReportExecution.objects.filter(pk=execution_id).update(
+                            status='failed', error_message=str(e)
+                        )
+                        status = 'failed'
+                    style = self.style.SUCCESS if status == 'completed' else self.style.ERROR
+                    self.stdout.write(style(f'Lần chạy #{execution_id}: {status}'))
+
+                if options['once']:
+                    break
+                if not futures:
+                    time.sleep(options['interval'])
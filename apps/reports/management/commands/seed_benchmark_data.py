@@ -0,0 +1,262 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.branches.models import Branch
+from apps.inventory.levels import invalidate_stock_levels
+from apps.inventory.models import Stock, StockMovement
+from apps.inventory.scanning import bump_sku_index_version
+from apps.orders.models import Order, OrderItem
+from apps.products.facets import rebuild_facets
+from apps.products.models import Category, Product, ProductVariant
+from apps.products.search import rebuild_index
+from apps.products.tree import invalidate_category_tree
+from core.page_cache import bump_scopes
+
+
+# Mọi dữ liệu sinh ra đều mang tiền tố này để có thể xóa/sinh lại
+PREFIX = 'BENCH'
+
+MATERIALS = ['Gỗ sồi', 'Gỗ óc chó', 'Gỗ thông', 'Kim loại', 'Da', 'Vải nỉ', 'Mây tre', 'Kính']
+COLORS = ['Nâu', 'Trắng', 'Đen', 'Xám', 'Be', 'Xanh rêu', 'Vàng gỗ']
+ORDER_STATUSES = ['PENDING', 'CONFIRMED', 'SHIPPING', 'DELIVERED', 'DELIVERED', 'DELIVERED', 'CANCELLED']
+PAYMENT_METHODS = [method for method, _label in Order.PAYMENT_METHODS]
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu lớn cho benchmark: chi nhánh, sản phẩm/biến thể, chuyển động kho và đơn hàng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=5)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--variants', type=int, default=2, help='Số biến thể mỗi sản phẩm (0 = không có biến thể)')
+        parser.add_argument('--customers', type=int, default=2_000)
+        parser.add_argument('--movements', type=int, default=2_000_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=730, help='Dữ liệu trải đều trong chừng này ngày gần nhất')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42, help='Cùng seed sinh cùng dữ liệu')
+        parser.add_argument('--clear', action='store_true', help='Xóa dữ liệu benchmark cũ trước khi sinh')
+        parser.add_argument('--skip-indexes', action='store_true', help='Không dựng lại facet, chỉ mục tìm kiếm và bảng tổng hợp')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+
+        if options['clear']:
+            self.step('Xóa dữ liệu benchmark cũ', self.clear)
+        elif Branch.objects.filter(name__startswith=f'{PREFIX} ').exists():
+            self.stdout.write(self.style.WARNING('Đã có dữ liệu benchmark; dùng --clear để sinh lại.'))
+            return
+
+        branches = self.step('Chi nhánh', self.seed_branches, options['branches'])
+        customers, staff = self.step('Người dùng', self.seed_users, options['customers'])
+        categories = self.step('Danh mục', self.seed_categories, options['categories'])
+        keys, prices = self.step('Sản phẩm và biến thể', self.seed_products, options['products'], options['variants'], categories)
+        balances = self.step('Chuyển động kho', self.seed_movements, options['movements'], branches, keys, staff)
+        self.step('Tồn kho', self.seed_stock, balances)
+        self.step('Đơn hàng', self.seed_orders, options['orders'], branches, customers, staff, keys, prices)
+
+        if not options['skip_indexes']:
+            self.step('Bảng tổng hợp doanh số', self.rebuild_rollups, branches)
+            self.step('Facet sản phẩm', rebuild_facets)
+            self.step('Chỉ mục tìm kiếm', rebuild_index, Product.objects.filter(sku__startswith=f'{PREFIX}-'))
+        invalidate_category_tree()
+        invalidate_stock_levels(branches)
+        bump_sku_index_version()
+        bump_scopes('catalog', 'categories')
+        self.stdout.write(self.style.SUCCESS('Đã sinh dữ liệu benchmark.'))
+
+    def step(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f'{label}: {time.perf_counter() - started:.1f}s')
+        return result
+
+    def moment(self, i, total):
+        """Thời điểm thứ `i`/`total`, tăng dần trong khoảng [start, now]"""
+        span = (self.now - self.start).total_seconds()
+        return self.start + timedelta(seconds=span * (i + self.rng.random()) / max(total, 1))
+
+    def bulk(self, model, rows):
+        with transaction.atomic():
+            return model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def clear(self):
+        branches = Branch.objects.filter(name__startswith=f'{PREFIX} ')
+        OrderItem.objects.filter(order__branch__in=branches).delete()
+        Order.objects.filter(branch__in=branches).delete()
+        StockMovement.objects.filter(product__sku__startswith=f'{PREFIX}-').delete()
+        Stock.objects.filter(branch__in=branches).delete()
+        Product.objects.filter(sku__startswith=f'{PREFIX}-').delete()
+        Category.objects.filter(slug__startswith=f'{PREFIX.lower()}-').delete()
+        User.objects.filter(username__startswith=f'{PREFIX.lower()}_').delete()
+        branches.delete()
+
+    def seed_branches(self, count):
+        branches = self.bulk(Branch, [
+            Branch(name=f'{PREFIX} {i + 1}', address=f'{i + 1} Đường Benchmark', phone=f'0900{i:06d}')
+            for i in range(count)
+        ])
+        return [branch.pk for branch in branches]
+
+    def seed_users(self, count):
+        password = make_password(None)
+        users = [
+            User(username=f'{PREFIX.lower()}_admin', role='ADMIN', is_staff=True, is_superuser=True, password=password),
+            User(username=f'{PREFIX.lower()}_manager', role='MANAGER', is_staff=True, password=password),
+            User(username=f'{PREFIX.lower()}_inventory', role='INVENTORY_STAFF', is_staff=True, password=password),
+        ]
+        users += [User(username=f'{PREFIX.lower()}_sales_{i}', role='SALES_STAFF', password=password) for i in range(10)]
+        users += [
+            User(username=f'{PREFIX.lower()}_customer_{i}', role='CUSTOMER', password=password,
+                 first_name=f'Khách {i}', email=f'customer{i}@bench.local')
+            for i in range(count)
+        ]
+        created = self.bulk(User, users)
+        staff = [user.pk for user in created if user.role == 'SALES_STAFF']
+        customers = [user.pk for user in created if user.role == 'CUSTOMER']
+        return customers, staff
+
+    def seed_categories(self, count):
+        # Cây hai cấp: vài danh mục gốc, còn lại là danh mục con (path/depth tính trong save)
+        roots = max(1, count // 8)
+        ids = []
+        for i in range(count):
+            parent_id = ids[i % roots] if i >= roots else None
+            category = Category.objects.create(
+                name=f'{PREFIX} danh mục {i + 1}', slug=f'{PREFIX.lower()}-{i + 1}', parent_id=parent_id,
+            )
+            ids.append(category.pk)
+        return ids[roots:] or ids
+
+    def seed_products(self, count, variants, categories):
+        """Trả về danh sách khóa tồn kho (product_id, variant_id) và giá theo sản phẩm"""
+        keys, prices = [], {}
+        for offset in range(0, count, self.batch_size):
+            products = self.bulk(Product, [
+                Product(
+                    name=f'{PREFIX} sản phẩm {n}',
+                    slug=f'{PREFIX.lower()}-{n}',
+                    sku=f'{PREFIX}-{n:07d}',
+                    description=f'Sản phẩm nội thất mẫu số {n} dùng cho benchmark.',
+                    price=Decimal(self.rng.randrange(500, 50_000) * 1000),
+                    category_id=self.rng.choice(categories),
+                    image='',
+                    material=self.rng.choice(MATERIALS),
+                    color=self.rng.choice(COLORS),
+                    created_at=self.moment(n, count),
+                )
+                for n in range(offset, min(offset + self.batch_size, count))
+            ])
+            rows = []
+            for product in products:
+                prices[product.pk] = product.price
+                if not variants:
+                    keys.append((product.pk, None))
+                rows += [
+                    ProductVariant(product=product, name=f'Mẫu {v + 1}', sku=f'{product.sku}-{v + 1}',
+                                   price_adjustment=Decimal(v * 100_000))
+                    for v in range(variants)
+                ]
+            keys += [(variant.product_id, variant.pk) for variant in self.bulk(ProductVariant, rows)]
+        return keys, prices
+
+    def seed_movements(self, count, branches, keys, staff):
+        """
+        Sinh chuyển động theo thứ tự thời gian: xuất/chuyển kho chỉ khi còn đủ hàng,
+        nên tồn kho cuối cùng (tính từ sổ cái) không bao giờ âm.
+        """
+        balances = defaultdict(int)
+        batch = []
+        for i in range(count):
+            product_id, variant_id = self.rng.choice(keys)
+            branch_id = self.rng.choice(branches)
+            quantity = self.rng.randint(1, 20)
+            movement = StockMovement(
+                product_id=product_id, variant_id=variant_id, quantity=quantity,
+                staff_id=self.rng.choice(staff), created_at=self.moment(i, count),
+            )
+            source = (branch_id, product_id, variant_id)
+            roll = self.rng.random()
+            if balances[source] >= quantity and roll < 0.55:
+                movement.movement_type, movement.from_branch_id = 'OUT', branch_id
+                balances[source] -= quantity
+            elif balances[source] >= quantity and roll < 0.65 and len(branches) > 1:
+                target = self.rng.choice([pk for pk in branches if pk != branch_id])
+                movement.movement_type, movement.from_branch_id, movement.to_branch_id = 'TRANSFER', branch_id, target
+                balances[source] -= quantity
+                balances[(target, product_id, variant_id)] += quantity
+            else:
+                movement.movement_type, movement.to_branch_id = 'IN', branch_id
+                movement.quantity = quantity = quantity * 5
+                balances[source] += quantity
+            batch.append(movement)
+            if len(batch) >= self.batch_size:
+                self.bulk(StockMovement, batch)
+                batch = []
+        self.bulk(StockMovement, batch)
+        return balances
+
+    def seed_stock(self, balances):
+        rows = [
+            Stock(branch_id=branch_id, product_id=product_id, variant_id=variant_id, quantity=quantity)
+            for (branch_id, product_id, variant_id), quantity in balances.items()
+        ]
+        for offset in range(0, len(rows), self.batch_size):
+            self.bulk(Stock, rows[offset:offset + self.batch_size])
+
+    def seed_orders(self, count, branches, customers, staff, keys, prices):
+        for offset in range(0, count, self.batch_size):
+            orders, lines = [], []
+            for n in range(offset, min(offset + self.batch_size, count)):
+                items = []
+                for _ in range(self.rng.randint(1, 3)):
+                    product_id, variant_id = self.rng.choice(keys)
+                    quantity = self.rng.randint(1, 4)
+                    price = prices[product_id]
+                    items.append(OrderItem(product_id=product_id, variant_id=variant_id, quantity=quantity,
+                                           price=price, subtotal=price * quantity))
+                subtotal = sum(item.subtotal for item in items)
+                shipping_fee = Decimal(self.rng.choice([0, 30_000, 50_000]))
+                status = self.rng.choice(ORDER_STATUSES)
+                orders.append(Order(
+                    order_number=f'{PREFIX}{n:09d}',
+                    customer_id=self.rng.choice(customers),
+                    branch_id=self.rng.choice(branches),
+                    sales_staff_id=self.rng.choice(staff) if self.rng.random() < 0.6 else None,
+                    status=status,
+                    recipient_name='Khách benchmark',
+                    recipient_phone='0900000000',
+                    shipping_address='1 Đường Benchmark',
+                    city='Hà Nội', district='Cầu Giấy', ward='Dịch Vọng',
+                    payment_method=self.rng.choice(PAYMENT_METHODS),
+                    is_paid=status == 'DELIVERED',
+                    subtotal=subtotal,
+                    shipping_fee=shipping_fee,
+                    total=subtotal + shipping_fee,
+                    created_at=self.moment(n, count),
+                ))
+                lines.append(items)
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                for order, items in zip(orders, lines):
+                    for item in items:
+                        item.order_id = order.pk
+                OrderItem.objects.bulk_create([item for items in lines for item in items], batch_size=self.batch_size)
+
+    def rebuild_rollups(self, branches):
+        for branch_id in branches:
+            call_command('rebuild_sales_rollup', branch=branch_id, stdout=self.stdout)
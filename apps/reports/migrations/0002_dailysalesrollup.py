@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 17:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('products', '0002_initial'),
+        ('reports', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('status', models.CharField(max_length=20, verbose_name='Trạng thái đơn hàng')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Số đơn hàng')),
+                ('order_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Tổng tiền đơn hàng')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Số lượng bán')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu sản phẩm')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lúc')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='branches.branch', verbose_name='Chi nhánh')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='products.category', verbose_name='Danh mục')),
+                ('sales_staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Nhân viên xử lý')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp doanh số theo ngày',
+                'verbose_name_plural': 'Tổng hợp doanh số theo ngày',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['branch', 'date'], name='reports_dai_branch__fd5b6c_idx'), models.Index(fields=['sales_staff', 'date'], name='reports_dai_sales_s_03dd37_idx'), models.Index(fields=['date'], name='reports_dai_date_026a20_idx')],
+            },
+        ),
+    ]
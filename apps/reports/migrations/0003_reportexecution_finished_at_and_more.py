@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 17:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexecution',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc'),
+        ),
+        migrations.AddField(
+            model_name='reportexecution',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu chạy'),
+        ),
+        migrations.AddIndex(
+            model_name='reportexecution',
+            index=models.Index(fields=['status', 'executed_at'], name='reports_rep_status_f4ab17_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 18:19
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('products', '0006_hot_query_indexes'),
+        ('reports', '0003_reportexecution_finished_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(models.F('date'), models.F('branch'), django.db.models.functions.comparison.Coalesce('sales_staff', 0), django.db.models.functions.comparison.Coalesce('category', 0), models.F('status'), name='sales_rollup_unique_key'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_sales_rollup_unique_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexecution',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Số lần nhận chạy'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from apps.accounts.models import User
 from apps.branches.models import Branch
@@ -67,11 +68,65 @@ class ReportExecution(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Trạng thái")
     result_data = models.JSONField(null=True, blank=True, verbose_name="Dữ liệu kết quả")
     error_message = models.TextField(null=True, blank=True, verbose_name="Thông báo lỗi")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu chạy")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Kết thúc")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Số lần nhận chạy")
     
     class Meta:
         verbose_name = "Lần chạy báo cáo"
         verbose_name_plural = "Lần chạy báo cáo"
         ordering = ['-executed_at']
+        indexes = [
+            models.Index(fields=['status', 'executed_at']),
+        ]
     
     def __str__(self):
-        return f"{self.report.title} - {self.executed_at.strftime('%d/%m/%Y %H:%M')}" 
\ No newline at end of file
+        return f"{self.report.title} - {self.executed_at.strftime('%d/%m/%Y %H:%M')}"
+    
+    @property
+    def duration(self):
+        """Thời gian chạy (giây)"""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None 
+
+class DailySalesRollup(models.Model):
+    """
+    Bảng tổng hợp doanh số theo ngày × chi nhánh × nhân viên × danh mục × trạng thái.
+    
+    Dòng có `category` rỗng chứa số liệu cấp đơn hàng (số đơn, tổng tiền đơn);
+    dòng có `category` chứa số liệu cấp sản phẩm (số lượng, thành tiền).
+    Được cập nhật bởi tín hiệu của Order/OrderItem, xem `apps.reports.rollups`.
+    """
+    date = models.DateField(verbose_name="Ngày")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='sales_rollups', verbose_name="Chi nhánh")
+    sales_staff = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='sales_rollups', verbose_name="Nhân viên xử lý")
+    category = models.ForeignKey('products.Category', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='sales_rollups', verbose_name="Danh mục")
+    status = models.CharField(max_length=20, verbose_name="Trạng thái đơn hàng")
+    order_count = models.PositiveIntegerField(default=0, verbose_name="Số đơn hàng")
+    order_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng tiền đơn hàng")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Số lượng bán")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu sản phẩm")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lúc")
+    
+    class Meta:
+        verbose_name = "Tổng hợp doanh số theo ngày"
+        verbose_name_plural = "Tổng hợp doanh số theo ngày"
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['branch', 'date']),
+            models.Index(fields=['sales_staff', 'date']),
+            models.Index(fields=['date']),
+        ]
+        constraints = [
+            # NULL không trùng nhau trong chỉ mục duy nhất thông thường, nên dùng COALESCE
+            models.UniqueConstraint(
+                'date', 'branch', Coalesce('sales_staff', 0), Coalesce('category', 0), 'status',
+                name='sales_rollup_unique_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.branch} - {self.date:%d/%m/%Y}: {self.order_total}"
@@ -0,0 +1,228 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderItem
+from apps.reports.models import DailySalesRollup
+
+
+logger = logging.getLogger(__name__)
+
+# Trường PositiveIntegerField: không để giảm xuống dưới 0 khi bảng lệch với đơn hàng
+COUNT_FIELDS = ('order_count', 'quantity')
+AMOUNT_FIELDS = ('order_total', 'revenue')
+
+
+def day_bounds(day):
+    """
+    Khoảng thời gian [đầu ngày, đầu ngày sau) của `day` theo múi giờ hiện tại.
+
+    Lọc theo khoảng thay vì `created_at__date` để dùng được chỉ mục (branch, created_at).
+    """
+    return (
+        timezone.make_aware(datetime.combine(day, time.min)),
+        timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)) - timedelta(microseconds=1),
+    )
+
+
+def refresh_daily_sales(branch_id, day):
+    """
+    Tính lại từ đầu các dòng tổng hợp của một chi nhánh trong một ngày.
+    
+    Chỉ dùng khi dựng lại bảng (`rebuild_sales_rollup`); thay đổi của từng đơn
+    hàng được cộng dồn bằng `record_order_change`/`record_item_change`.
+    """
+    orders = Order.objects.filter(branch_id=branch_id, created_at__range=day_bounds(day))
+    
+    rows = [
+        DailySalesRollup(
+            date=day,
+            branch_id=branch_id,
+            sales_staff_id=row['sales_staff'],
+            status=row['status'],
+            order_count=row['order_count'],
+            order_total=row['order_total'] or 0,
+        )
+        for row in orders.values('sales_staff', 'status').annotate(
+            order_count=Count('id'),
+            order_total=Sum('total'),
+        ).order_by()
+    ]
+    rows += [
+        DailySalesRollup(
+            date=day,
+            branch_id=branch_id,
+            sales_staff_id=row['order__sales_staff'],
+            category_id=row['product__category'],
+            status=row['order__status'],
+            quantity=row['quantity'] or 0,
+            revenue=row['revenue'] or 0,
+        )
+        for row in OrderItem.objects.filter(order__in=orders).values(
+            'order__sales_staff', 'order__status', 'product__category'
+        ).annotate(
+            quantity=Sum('quantity'),
+            revenue=Sum('subtotal'),
+        ).order_by()
+    ]
+    
+    with transaction.atomic():
+        DailySalesRollup.objects.filter(branch_id=branch_id, date=day).delete()
+        DailySalesRollup.objects.bulk_create(rows)
+
+
+def order_key(branch_id, created_at, sales_staff_id, status):
+    """Khóa (ngày, chi nhánh, nhân viên, trạng thái) của một đơn hàng; None nếu đơn không được tổng hợp"""
+    if branch_id is None or created_at is None:
+        return None
+    day = timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+    return (day, branch_id, sales_staff_id, status)
+
+
+def apply_deltas(deltas):
+    """
+    Cộng `deltas` = {(ngày, chi nhánh, nhân viên, danh mục, trạng thái): {trường: giá trị}}
+    vào bảng tổng hợp bằng `UPDATE ... SET trường = trường + giá trị`.
+    
+    Dòng chưa có thì được tạo; nếu giao dịch khác vừa tạo cùng dòng (vi phạm
+    ràng buộc duy nhất) thì cộng vào dòng đó. Giá trị âm cho dòng chưa có nghĩa
+    là bảng đã lệch với đơn hàng: ngày đó được tính lại sau khi giao dịch commit.
+    """
+    now = timezone.now()
+    stale = set()
+    for (day, branch_id, staff_id, category_id, status), values in deltas.items():
+        values = {name: value for name, value in values.items() if value}
+        if not values:
+            continue
+        rows = DailySalesRollup.objects.filter(
+            date=day, branch_id=branch_id, sales_staff_id=staff_id, category_id=category_id, status=status,
+        )
+        changes = {
+            name: Greatest(F(name) + value, 0) if name in COUNT_FIELDS else F(name) + value
+            for name, value in values.items()
+        }
+        if rows.update(updated_at=now, **changes):
+            continue
+        if any(value < 0 for value in values.values()):
+            logger.warning(
+                'Bỏ qua giá trị âm cho dòng tổng hợp chưa có %s; tính lại ngày %s của chi nhánh %s',
+                (day, branch_id, staff_id, category_id, status), day, branch_id,
+            )
+            stale.add((branch_id, day))
+            continue
+        try:
+            with transaction.atomic():
+                DailySalesRollup.objects.create(
+                    date=day, branch_id=branch_id, sales_staff_id=staff_id, category_id=category_id,
+                    status=status, **values,
+                )
+        except IntegrityError:
+            rows.update(updated_at=now, **changes)
+    for branch_id, day in stale:
+        transaction.on_commit(lambda branch_id=branch_id, day=day: refresh_daily_sales(branch_id, day))
+
+
+def _add(deltas, key, category_id, **values):
+    day, branch_id, staff_id, status = key
+    row = deltas[(day, branch_id, staff_id, category_id, status)]
+    for name, value in values.items():
+        row[name] += value
+
+
+def _new_deltas():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def record_order_change(order_id, old, new):
+    """
+    Cập nhật bảng tổng hợp khi đơn hàng được tạo/sửa/xóa.
+    
+    `old`/`new` là (khóa `order_key`, tổng tiền) trước và sau khi ghi, None nếu
+    đơn chưa có/đã bị xóa. Chỉ các dòng của khóa cũ và mới bị cập nhật; khi khóa
+    đổi (ví dụ đổi trạng thái), các dòng sản phẩm của đơn được chuyển sang khóa
+    mới bằng một truy vấn tổng hợp trên chính đơn hàng đó.
+    """
+    if old == new:
+        return
+    deltas = _new_deltas()
+    if old and old[0]:
+        _add(deltas, old[0], None, order_count=-1, order_total=-old[1])
+    if new and new[0]:
+        _add(deltas, new[0], None, order_count=1, order_total=new[1])
+    
+    # Đơn mới chưa có dòng hàng (xem `record_items`); đơn bị xóa thì các dòng hàng tự trừ khi bị xóa
+    if old and new and old[0] != new[0]:
+        for row in OrderItem.objects.filter(order_id=order_id).values('product__category').annotate(
+            quantity=Sum('quantity'), revenue=Sum('subtotal'),
+        ).order_by():
+            if old[0]:
+                _add(deltas, old[0], row['product__category'], quantity=-row['quantity'], revenue=-row['revenue'])
+            if new[0]:
+                _add(deltas, new[0], row['product__category'], quantity=row['quantity'], revenue=row['revenue'])
+    apply_deltas(deltas)
+
+
+def record_items(key, items, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) các dòng hàng (danh mục, số lượng, thành tiền) vào khóa `key` của đơn"""
+    if key is None:
+        return
+    deltas = _new_deltas()
+    for category_id, quantity, subtotal in items:
+        _add(deltas, key, category_id, quantity=sign * quantity, revenue=sign * subtotal)
+    apply_deltas(deltas)
+
+
+def record_item_change(key, old, new):
+    """Dòng hàng được tạo/sửa/xóa; `old`/`new` là (danh mục, số lượng, thành tiền) hoặc None"""
+    if old == new:
+        return
+    if old:
+        record_items(key, [old], sign=-1)
+    if new:
+        record_items(key, [new])
+
+
+def detach_sales_staff(staff_id):
+    """
+    Gộp các dòng của nhân viên sắp bị xóa vào dòng không có nhân viên.
+    
+    Đơn hàng của nhân viên đó được đặt `sales_staff` = NULL (SET_NULL), nên
+    số liệu phải chuyển sang khóa tương ứng trước khi `SET_NULL` tạo dòng trùng.
+    """
+    rows = DailySalesRollup.objects.filter(sales_staff_id=staff_id)
+    deltas = _new_deltas()
+    for row in rows.values('date', 'branch_id', 'category_id', 'status', *COUNT_FIELDS, *AMOUNT_FIELDS):
+        key = (row['date'], row['branch_id'], None, row['category_id'], row['status'])
+        for name in COUNT_FIELDS + AMOUNT_FIELDS:
+            deltas[key][name] += row[name]
+    rows.delete()
+    apply_deltas(deltas)
+
+
+def _filter(queryset, branch=None, staff=None, start=None, end=None, statuses=None):
+    if branch is not None:
+        queryset = queryset.filter(branch=branch)
+    if staff is not None:
+        queryset = queryset.filter(sales_staff=staff)
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    if statuses is not None:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def order_rollups(**filters):
+    """Các dòng tổng hợp cấp đơn hàng (order_count, order_total)"""
+    return _filter(DailySalesRollup.objects.filter(category__isnull=True), **filters)
+
+
+def item_rollups(**filters):
+    """Các dòng tổng hợp cấp sản phẩm theo danh mục (quantity, revenue)"""
+    return _filter(DailySalesRollup.objects.filter(category__isnull=False), **filters)
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.reports.rollups import (
+    detach_sales_staff, order_key, record_item_change, record_order_change, refresh_daily_sales,
+)
+
+
+ORDER_FIELDS = ('branch_id', 'created_at', 'sales_staff_id', 'status', 'total')
+ITEM_FIELDS = ('order_id', 'product_id', 'quantity', 'subtotal')
+
+# Đơn hàng được nạp với trường bị defer: không biết giá trị cũ, phải tính lại cả ngày
+DEFERRED = object()
+
+
+def _order_state(order):
+    return (order_key(order.branch_id, order.created_at, order.sales_staff_id, order.status), order.total)
+
+
+def _loaded_state(instance, fields):
+    # Đọc trực tiếp từ __dict__ để không gây truy vấn với các trường bị defer
+    values = instance.__dict__
+    if values.get('id') is None:
+        return None
+    if any(name not in values for name in fields):
+        return DEFERRED
+    return True
+
+
+@receiver(post_init, sender=Order)
+def remember_order_rollup_state(sender, instance, **kwargs):
+    """Ghi nhớ khóa và tổng tiền đã được tổng hợp để chỉ cộng phần chênh lệch khi lưu"""
+    state = _loaded_state(instance, ORDER_FIELDS)
+    instance._rollup_state = _order_state(instance) if state is True else state
+
+
+@receiver(post_save, sender=Order)
+def update_rollup_on_order_save(sender, instance, created, **kwargs):
+    new = _order_state(instance)
+    old = None if created else getattr(instance, '_rollup_state', None)
+    if old is DEFERRED:
+        keys = {new[0], order_key(instance.__dict__.get('branch_id'), instance.__dict__.get('created_at'), None, None)}
+        for key in filter(None, keys):
+            transaction.on_commit(lambda key=key: refresh_daily_sales(key[1], key[0]))
+    else:
+        record_order_change(instance.pk, old, new)
+    instance._rollup_state = new
+
+
+@receiver(post_delete, sender=Order)
+def update_rollup_on_order_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_rollup_state', None)
+    record_order_change(instance.pk, _order_state(instance) if old in (None, DEFERRED) else old, None)
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_rollup_state(sender, instance, **kwargs):
+    state = _loaded_state(instance, ITEM_FIELDS)
+    if state is True:
+        state = (instance.order_id, instance.product_id, instance.quantity, instance.subtotal)
+    instance._rollup_state = state
+
+
+def _item_change(instance, old, new):
+    """Cập nhật dòng tổng hợp theo danh mục của đơn chứa dòng hàng `instance`"""
+    if old is DEFERRED:
+        old = None
+        order = Order.objects.filter(pk=instance.order_id).values('branch_id', 'created_at').first()
+        if order:
+            transaction.on_commit(lambda: refresh_daily_sales(
+                order['branch_id'], order_key(order['branch_id'], order['created_at'], None, None)[0]
+            ))
+            return
+    if old == new:
+        return
+    order_ids = {state[0] for state in (old, new) if state}
+    orders = {
+        order['id']: order_key(order['branch_id'], order['created_at'], order['sales_staff_id'], order['status'])
+        for order in Order.objects.filter(pk__in=order_ids).values(
+            'id', 'branch_id', 'created_at', 'sales_staff_id', 'status'
+        )
+    }
+    categories = dict(Product.objects.filter(
+        pk__in={state[1] for state in (old, new) if state}
+    ).values_list('pk', 'category_id'))
+
+    def line(state):
+        return (categories.get(state[1]), state[2], state[3]) if state else None
+
+    if old and new and old[0] == new[0]:
+        record_item_change(orders.get(new[0]), line(old), line(new))
+    else:
+        if old:
+            record_item_change(orders.get(old[0]), line(old), None)
+        if new:
+            record_item_change(orders.get(new[0]), None, line(new))
+
+
+# Dòng hàng tạo hàng loạt bằng `create_order` được cộng trực tiếp (bulk_create không phát signal)
+@receiver(post_save, sender=OrderItem)
+def update_rollup_on_item_save(sender, instance, created, **kwargs):
+    new = (instance.order_id, instance.product_id, instance.quantity, instance.subtotal)
+    _item_change(instance, None if created else getattr(instance, '_rollup_state', None), new)
+    instance._rollup_state = new
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_rollup_on_item_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_rollup_state', None)
+    if old is None:
+        old = (instance.order_id, instance.product_id, instance.quantity, instance.subtotal)
+    _item_change(instance, old, None)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def detach_rollups_from_staff(sender, instance, **kwargs):
+    detach_sales_staff(instance.pk)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncYear
+from django.utils import timezone
+
+
+TRUNC_FUNCTIONS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def _truncate(value, unit):
+    """Đưa một ngày về đầu kỳ tương ứng"""
+    if unit == 'month':
+        return value.replace(day=1)
+    if unit == 'year':
+        return value.replace(month=1, day=1)
+    return value
+
+
+def _next_period(value, unit):
+    if unit == 'day':
+        return value + timedelta(days=1)
+    if unit == 'month':
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value.replace(year=value.year + 1)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def period_range(start, end, unit='day'):
+    """Danh sách các kỳ (ngày đầu kỳ) từ `start` đến `end`, tính cả hai đầu"""
+    periods = []
+    current = _truncate(start, unit)
+    while current <= end:
+        periods.append(current)
+        current = _next_period(current, unit)
+    return periods
+
+
+def bucket_series(queryset, date_field, start, end, unit='day', **aggregates):
+    """
+    Gom nhóm `queryset` theo kỳ bằng một câu GROUP BY và trả về chuỗi liên tục.
+    
+    Mỗi phần tử là dict gồm `period` (ngày đầu kỳ) và các giá trị tổng hợp
+    được truyền qua `aggregates`, ví dụ `total=Sum('total')`. Các kỳ không có
+    dữ liệu được điền 0 nên có thể dùng trực tiếp cho biểu đồ.
+    """
+    if unit not in TRUNC_FUNCTIONS:
+        raise ValueError(f'Đơn vị thời gian không hợp lệ: {unit}')
+    
+    is_datetime = queryset.model._meta.get_field(date_field).get_internal_type() == 'DateTimeField'
+    if unit == 'day' and is_datetime:
+        # TruncDate trả về date theo múi giờ hiện tại, khớp với lookup __date
+        trunc = TruncDate(date_field)
+    else:
+        trunc = TRUNC_FUNCTIONS[unit](date_field)
+    lookup = f'{date_field}__date' if is_datetime else date_field
+    
+    rows = queryset.filter(**{
+        f'{lookup}__gte': start,
+        f'{lookup}__lte': end,
+    }).annotate(period=trunc).values('period').annotate(**aggregates).order_by()
+    
+    found = {_as_date(row.pop('period')): row for row in rows}
+    
+    series = []
+    for period in period_range(start, end, unit):
+        row = found.get(period, {})
+        series.append(dict(
+            {name: row.get(name) or 0 for name in aggregates},
+            period=period,
+        ))
+    return series
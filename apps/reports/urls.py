@@ -10,6 +10,10 @@ urlpatterns = [
     # API lấy dữ liệu cho báo cáo
     path('api/data/<str:report_type>/', views.report_data_api, name='api_data'),
     
+    # Chạy báo cáo nền và lấy kết quả
+    path('<int:pk>/run/', views.run_report, name='run'),
+    path('<int:pk>/result/', views.report_result, name='result'),
+    
     # Xuất báo cáo
     path('export/<str:report_type>/', views.export_report, name='export'),
 ] 
\ No newline at end of file
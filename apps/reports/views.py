@@ -7,11 +7,12 @@ from django.db.models import Sum, Count, Avg, F, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import csv
-import xlsxwriter
-import io
 import json
 
 from .models import Report, ScheduledReport, ReportExecution
+from .rollups import order_rollups, item_rollups
+from .exports import export_response, EXPORT_CHUNK_SIZE
+from .jobs import queue_report, latest_result
 from apps.orders.models import Order, OrderItem
 from apps.inventory.models import Inventory, InventoryItem
 from apps.products.models import Product
@@ -50,24 +51,19 @@ class ReportDashboardView(LoginRequiredMixin, ReportAccessMixin, ListView):
         start_of_month = datetime(today.year, today.month, 1).date()
         start_of_year = datetime(today.year, 1, 1).date()
         
-        # Báo cáo doanh số
-        if branch:
-            orders = Order.objects.filter(branch=branch)
-        else:
-            orders = Order.objects.all()
-        
+        # Báo cáo doanh số (đọc từ bảng tổng hợp theo ngày)
         # Doanh số theo thời gian
-        daily_sales = orders.filter(created_at__date=today).aggregate(
-            amount=Sum('total_amount'),
-            count=Count('id')
+        daily_sales = order_rollups(branch=branch, start=today, end=today).aggregate(
+            amount=Sum('order_total'),
+            count=Sum('order_count')
         )
-        monthly_sales = orders.filter(created_at__date__gte=start_of_month).aggregate(
-            amount=Sum('total_amount'),
-            count=Count('id')
+        monthly_sales = order_rollups(branch=branch, start=start_of_month).aggregate(
+            amount=Sum('order_total'),
+            count=Sum('order_count')
         )
-        yearly_sales = orders.filter(created_at__date__gte=start_of_year).aggregate(
-            amount=Sum('total_amount'),
-            count=Count('id')
+        yearly_sales = order_rollups(branch=branch, start=start_of_year).aggregate(
+            amount=Sum('order_total'),
+            count=Sum('order_count')
         )
         
         # Báo cáo tồn kho
@@ -98,25 +94,30 @@ class ReportDashboardView(LoginRequiredMixin, ReportAccessMixin, ListView):
             sales_data[day] = 0
         
         # Lấy dữ liệu doanh số 30 ngày qua
-        daily_data = orders.filter(
-            created_at__date__gte=today - timedelta(days=30)
-        ).values('created_at__date').annotate(
-            daily_total=Sum('total_amount')
-        )
+        daily_data = order_rollups(
+            branch=branch,
+            start=today - timedelta(days=30)
+        ).values('date').annotate(
+            daily_total=Sum('order_total')
+        ).order_by()
         
         for item in daily_data:
-            date_str = item['created_at__date'].isoformat()
+            date_str = item['date'].isoformat()
             if date_str in sales_data:
                 sales_data[date_str] = float(item['daily_total'])
         
         # Dữ liệu cho biểu đồ hình tròn về danh mục sản phẩm
-        category_data = OrderItem.objects.values(
-            'product__category__name'
+        category_data = item_rollups(branch=branch).values(
+            'category__name'
         ).annotate(
-            value=Sum(F('quantity') * F('unit_price'))
+            value=Sum('revenue')
         ).order_by('-value')[:5]
         
+        # Các lần chạy nền gần nhất
+        recent_executions = ReportExecution.objects.select_related('report').order_by('-executed_at')[:10]
+        
         context.update({
+            'recent_executions': recent_executions,
             'daily_sales': daily_sales,
             'monthly_sales': monthly_sales,
             'yearly_sales': yearly_sales,
@@ -235,27 +236,63 @@ def report_data_api(request, report_type):
     return JsonResponse({'error': 'Invalid report type'}, status=400)
 
 
+def can_run_report(user, report):
+    """Admin, quản lý hoặc người tạo báo cáo mới được chạy và xem kết quả báo cáo"""
+    return user.is_admin or user.is_manager or report.created_by_id == user.pk
+
+
+# Đưa báo cáo vào hàng đợi chạy nền
+def run_report(request, pk):
+    """Tạo một lần chạy báo cáo; worker `run_report_worker` sẽ xử lý"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    report = get_object_or_404(Report, pk=pk)
+    if not can_run_report(request.user, report):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    execution = queue_report(report, request.user)
+    return JsonResponse({
+        'execution_id': execution.pk,
+        'status': execution.status,
+    }, status=202)
+
+
+# Trạng thái và kết quả của báo cáo chạy nền
+def report_result(request, pk):
+    """Trả về kết quả hoàn thành gần nhất của báo cáo, hoặc của một lần chạy cụ thể (?execution=)"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    
+    report = get_object_or_404(Report, pk=pk)
+    if not can_run_report(request.user, report):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    execution_id = request.GET.get('execution')
+    if execution_id:
+        execution = get_object_or_404(ReportExecution, pk=execution_id, report=report)
+    else:
+        execution = latest_result(report)
+    if execution is None:
+        return JsonResponse({'status': None, 'data': None})
+    
+    return JsonResponse({
+        'execution_id': execution.pk,
+        'status': execution.status,
+        'finished_at': execution.finished_at,
+        'error': execution.error_message,
+        'data': execution.result_data if execution.status == 'completed' else None,
+    })
+
+
 # Export báo cáo sang Excel
 def export_report(request, report_type):
-    """Xuất báo cáo ra file Excel"""
+    """Xuất báo cáo ra file Excel (hoặc CSV với ?format=csv)"""
     if not request.user.is_authenticated:
         return HttpResponse('Unauthorized', status=401)
     
-    # Tạo file Excel trong bộ nhớ
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
-    worksheet = workbook.add_worksheet()
-    
-    # Định dạng
-    header_format = workbook.add_format({
-        'bold': True,
-        'font_size': 12,
-        'align': 'center',
-        'valign': 'vcenter',
-        'bg_color': '#4F81BD',
-        'color': 'white',
-        'border': 1
-    })
+    export_time = f"Ngày xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    filename = f"report_{report_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     # Báo cáo doanh số
     if report_type == 'sales':
@@ -289,37 +326,41 @@ def export_report(request, report_type):
             start_date = today - timedelta(days=30)
             title = f"BÁO CÁO DOANH SỐ 30 NGÀY ({start_date.strftime('%d/%m/%Y')} - {today.strftime('%d/%m/%Y')})"
         
-        orders = orders.filter(created_at__date__gte=start_date)
-        
-        # Header
-        worksheet.write(0, 0, title, header_format)
-        worksheet.merge_range('A1:G1', title, header_format)
-        worksheet.write(2, 0, f"Chi nhánh: {branch_name}")
-        worksheet.write(3, 0, f"Ngày xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-        
-        # Table header
-        headers = ["Mã đơn hàng", "Ngày tạo", "Khách hàng", "Nhân viên", "Số sản phẩm", "Tổng tiền", "Trạng thái"]
-        for col, header in enumerate(headers):
-            worksheet.write(5, col, header, header_format)
-        
-        # Data
-        row = 6
-        for order in orders:
-            worksheet.write(row, 0, order.order_number)
-            worksheet.write(row, 1, order.created_at.strftime('%d/%m/%Y %H:%M'))
-            worksheet.write(row, 2, order.customer.get_full_name() if order.customer else "Khách lẻ")
-            worksheet.write(row, 3, order.staff.get_full_name() if order.staff else "Online")
-            worksheet.write(row, 4, order.items.aggregate(total=Sum('quantity'))['total'] or 0)
-            worksheet.write(row, 5, f"{order.total_amount:,.0f} VNĐ")
-            worksheet.write(row, 6, order.get_status_display())
-            row += 1
-        
-        # Summary
-        total_row = row + 2
-        worksheet.write(total_row, 0, "TỔNG CỘNG:", header_format)
-        worksheet.write(total_row, 1, f"{orders.count()} đơn hàng")
-        total_amount = orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        worksheet.write(total_row, 5, f"{total_amount:,.0f} VNĐ", header_format)
+        # Số lượng sản phẩm được tính sẵn trong cùng truy vấn, đọc theo từng khối
+        orders = orders.filter(
+            created_at__date__gte=start_date
+        ).select_related('customer', 'sales_staff').annotate(
+            item_quantity=Sum('items__quantity')
+        ).order_by('created_at')
+        
+        totals = {'count': 0, 'amount': 0}
+        
+        def rows():
+            for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                totals['count'] += 1
+                totals['amount'] += order.total
+                yield [
+                    order.order_number,
+                    order.created_at.strftime('%d/%m/%Y %H:%M'),
+                    order.customer.get_full_name() if order.customer else "Khách lẻ",
+                    order.sales_staff.get_full_name() if order.sales_staff else "Online",
+                    order.item_quantity or 0,
+                    f"{order.total:,.0f} VNĐ",
+                    order.get_status_display(),
+                ]
+        
+        return export_response(
+            request,
+            filename,
+            ["Mã đơn hàng", "Ngày tạo", "Khách hàng", "Nhân viên", "Số sản phẩm", "Tổng tiền", "Trạng thái"],
+            rows(),
+            title=title,
+            meta_lines=[f"Chi nhánh: {branch_name}", export_time],
+            summary=lambda: [
+                (1, f"{totals['count']} đơn hàng"),
+                (5, f"{totals['amount']:,.0f} VNĐ"),
+            ],
+        )
     
     # Báo cáo tồn kho
     elif report_type == 'inventory':
@@ -333,49 +374,34 @@ def export_report(request, report_type):
             branch_name = "Tất cả chi nhánh"
             inventory_items = InventoryItem.objects.all()
         
-        # Header
-        title = f"BÁO CÁO TỒN KHO - {branch_name}"
-        worksheet.merge_range('A1:F1', title, header_format)
-        worksheet.write(2, 0, f"Ngày xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-        
-        # Table header
-        headers = ["Mã SP", "Tên sản phẩm", "Danh mục", "Đơn giá", "Số lượng tồn", "Giá trị tồn"]
-        for col, header in enumerate(headers):
-            worksheet.write(4, col, header, header_format)
-        
-        # Data
-        row = 5
-        for item in inventory_items.select_related('product', 'product__category'):
-            worksheet.write(row, 0, item.product.sku)
-            worksheet.write(row, 1, item.product.name)
-            worksheet.write(row, 2, item.product.category.name if item.product.category else "")
-            worksheet.write(row, 3, f"{item.product.price:,.0f} VNĐ")
-            worksheet.write(row, 4, item.quantity)
-            value = item.quantity * item.product.price
-            worksheet.write(row, 5, f"{value:,.0f} VNĐ")
-            row += 1
-        
-        # Summary
-        total_row = row + 2
-        worksheet.write(total_row, 0, "TỔNG CỘNG:", header_format)
-        total_value = inventory_items.aggregate(
-            total=Sum(F('quantity') * F('product__price'))
-        )['total'] or 0
-        total_items = inventory_items.aggregate(Sum('quantity'))['quantity__sum'] or 0
-        worksheet.write(total_row, 4, total_items)
-        worksheet.write(total_row, 5, f"{total_value:,.0f} VNĐ", header_format)
-    
-    workbook.close()
-    
-    # Return file
-    output.seek(0)
-    
-    # Set filename and content type
-    filename = f"report_{report_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        inventory_items = inventory_items.select_related('product', 'product__category').order_by('pk')
+        totals = {'quantity': 0, 'value': 0}
+        
+        def rows():
+            for item in inventory_items.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                value = item.actual_quantity * item.product.price
+                totals['quantity'] += item.actual_quantity
+                totals['value'] += value
+                yield [
+                    item.product.sku,
+                    item.product.name,
+                    item.product.category.name if item.product.category else "",
+                    f"{item.product.price:,.0f} VNĐ",
+                    item.actual_quantity,
+                    f"{value:,.0f} VNĐ",
+                ]
+        
+        return export_response(
+            request,
+            filename,
+            ["Mã SP", "Tên sản phẩm", "Danh mục", "Đơn giá", "Số lượng tồn", "Giá trị tồn"],
+            rows(),
+            title=f"BÁO CÁO TỒN KHO - {branch_name}",
+            meta_lines=[export_time],
+            summary=lambda: [
+                (4, totals['quantity']),
+                (5, f"{totals['value']:,.0f} VNĐ"),
+            ],
+        )
     
-    return response 
\ No newline at end of file
+    return HttpResponse('Invalid report type', status=400)
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Sequence
+
+
+@admin.register(Sequence)
+class SequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'period', 'last_value')
+    list_filter = ('prefix',)
+    readonly_fields = ('prefix', 'period', 'last_value')
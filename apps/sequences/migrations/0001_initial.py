@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20, verbose_name='Tiền tố')),
+                ('period', models.DateField(verbose_name='Ngày')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Giá trị đã cấp')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm số chứng từ',
+                'verbose_name_plural': 'Bộ đếm số chứng từ',
+                'unique_together': {('prefix', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class Sequence(models.Model):
+    """Bộ đếm số chứng từ theo ngày (đơn hàng, phiếu kiểm kê, đơn nhập...)"""
+    prefix = models.CharField(_("Tiền tố"), max_length=20)
+    period = models.DateField(_("Ngày"))
+    last_value = models.PositiveIntegerField(_("Giá trị đã cấp"), default=0)
+    
+    class Meta:
+        verbose_name = _("Bộ đếm số chứng từ")
+        verbose_name_plural = _("Bộ đếm số chứng từ")
+        unique_together = ('prefix', 'period')
+    
+    def __str__(self):
+        return f"{self.prefix} {self.period:%Y%m%d}: {self.last_value}"
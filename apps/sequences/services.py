@@ -0,0 +1,109 @@
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from apps.sequences.models import Sequence
+
+
+# Số lượng số được cấp mỗi lần ghi vào bảng Sequence
+BLOCK_SIZE = getattr(settings, 'SEQUENCE_BLOCK_SIZE', 20)
+
+# Các khối số đã cấp cho tiến trình hiện tại: (prefix, ngày) -> deque([next, end])
+_blocks = defaultdict(deque)
+_lock = threading.Lock()
+
+
+def _take_cached(key):
+    """Lấy một số từ khối đã cấp trong bộ nhớ, trả về None nếu hết"""
+    with _lock:
+        blocks = _blocks[key]
+        while blocks:
+            block = blocks[0]
+            if block[0] <= block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+            blocks.popleft()
+    return None
+
+
+def _store_block(key, start, end):
+    if start > end:
+        return
+    with _lock:
+        # Bỏ các khối của những ngày đã qua
+        for stale in [k for k in _blocks if k[0] == key[0] and k[1] != key[1]]:
+            del _blocks[stale]
+        _blocks[key].append([start, end])
+
+
+def _initial_value(prefix, period, seed_queryset, seed_field):
+    """Giá trị khởi tạo cho ngày mới, tránh trùng với số đã cấp theo cách cũ"""
+    if seed_queryset is None:
+        return 0
+    day_prefix = f"{prefix}{period:%Y%m%d}"
+    numbers = seed_queryset.filter(
+        **{f'{seed_field}__startswith': day_prefix}
+    ).values_list(seed_field, flat=True)
+    last = 0
+    for number in numbers.iterator():
+        suffix = number[len(day_prefix):]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    return last
+
+
+def _allocate_block(prefix, period, size, seed_queryset, seed_field):
+    """Tăng bộ đếm trong DB một lần và trả về khoảng [start, end] được cấp"""
+    with transaction.atomic():
+        updated = Sequence.objects.filter(prefix=prefix, period=period).update(
+            last_value=F('last_value') + size
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(
+                        prefix=prefix,
+                        period=period,
+                        last_value=_initial_value(prefix, period, seed_queryset, seed_field) + size,
+                    )
+            except IntegrityError:
+                # Một tiến trình khác vừa tạo bộ đếm cho ngày này
+                Sequence.objects.filter(prefix=prefix, period=period).update(
+                    last_value=F('last_value') + size
+                )
+        end = Sequence.objects.filter(prefix=prefix, period=period).values_list(
+            'last_value', flat=True
+        ).get()
+    return end - size + 1, end
+
+
+def next_number(prefix, seed_queryset=None, seed_field='number'):
+    """
+    Cấp số chứng từ tiếp theo dạng `<prefix><YYYYMMDD><0001>`.
+
+    Bộ đếm được tăng theo khối `BLOCK_SIZE` số và phần còn lại của khối được
+    giữ trong bộ nhớ của tiến trình, nên phần lớn các lần tạo chứng từ không
+    cần truy vấn thêm. Số không bao giờ trùng giữa các tiến trình, nhưng có
+    thể không liên tục. `seed_queryset`/`seed_field` chỉ dùng khi tạo bộ đếm
+    của một ngày mới, để tiếp nối các số đã cấp trước khi có bộ đếm.
+    """
+    period = timezone.localdate()
+    key = (prefix, period)
+    
+    value = _take_cached(key)
+    if value is None:
+        start, end = _allocate_block(prefix, period, BLOCK_SIZE, seed_queryset, seed_field)
+        value = start
+        if transaction.get_connection().in_atomic_block:
+            # Nếu giao dịch bên ngoài bị hủy, việc tăng bộ đếm cũng bị hủy theo,
+            # nên chỉ giữ lại phần còn lại của khối sau khi giao dịch được ghi.
+            transaction.on_commit(lambda: _store_block(key, start + 1, end))
+        else:
+            _store_block(key, start + 1, end)
+    
+    return f"{prefix}{period:%Y%m%d}{value:04d}"
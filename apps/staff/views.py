@@ -14,6 +14,8 @@ from .models import StaffProfile, StaffSchedule, Performance
 from .forms import StaffProfileForm, StaffScheduleForm, PerformanceForm
 from .decorators import sales_staff_required, inventory_staff_required, branch_manager_required
 from apps.orders.models import Order
+from apps.reports.rollups import order_rollups
+from apps.reports.timeseries import bucket_series
 
 
 @login_required
@@ -27,12 +29,13 @@ def sales_dashboard(request):
     seven_days_ago = today - timedelta(days=7)
     
     # Get today's orders count and value
-    today_orders = Order.objects.filter(
-        created_at__date=today,
-        sales_staff=request.user
-    )
-    today_orders_count = today_orders.count()
-    today_orders_value = today_orders.aggregate(total=Sum('total'))['total'] or 0
+    today_sales = order_rollups(
+        staff=request.user,
+        start=today,
+        end=today
+    ).aggregate(count=Sum('order_count'), total=Sum('order_total'))
+    today_orders_count = today_sales['count'] or 0
+    today_orders_value = today_sales['total'] or 0
     
     # Calculate sales target percentage
     current_month = today.strftime('%m/%Y')
@@ -61,18 +64,12 @@ def sales_dashboard(request):
         branch_staff_count = StaffProfile.objects.filter(branch=branch).count()
     
     # Get data for sales chart
-    sales_dates = []
-    sales_data = []
-    for i in range(7):
-        date = today - timedelta(days=i)
-        sales_dates.insert(0, date.strftime('%d/%m'))
-        
-        daily_sales = Order.objects.filter(
-            created_at__date=date,
-            sales_staff=request.user
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        sales_data.insert(0, daily_sales)
+    sales_series = bucket_series(
+        order_rollups(staff=request.user), 'date', today - timedelta(days=6), today, 'day',
+        total=Sum('order_total')
+    )
+    sales_dates = [row['period'].strftime('%d/%m') for row in sales_series]
+    sales_data = [row['total'] for row in sales_series]
     
     # New customers in last 7 days
     new_customers_count = Order.objects.filter(
@@ -3,6 +3,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+from apps.sequences.services import next_number
+
 
 class Supplier(models.Model):
     """Nhà cung cấp sản phẩm"""
@@ -58,9 +60,7 @@ class PurchaseOrder(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate a unique order number
-            last_order = PurchaseOrder.objects.order_by('-id').first()
-            last_id = last_order.id if last_order else 0
-            self.order_number = f"PO{timezone.now().strftime('%Y%m%d')}{last_id + 1:04d}"
+            self.order_number = next_number('PO', PurchaseOrder.objects.all(), 'order_number')
         super().save(*args, **kwargs)
 
 
@@ -12,6 +12,7 @@ from apps.suppliers.models import Supplier, PurchaseOrder, PurchaseOrderItem
 from apps.suppliers.forms import SupplierForm, PurchaseOrderForm, PurchaseOrderItemFormSet
 from apps.products.models import Product, ProductVariant
 from apps.inventory.models import StockMovement
+from core.aggregates import status_histogram
 
 
 class SupplierListView(LoginRequiredMixin, ListView):
@@ -162,11 +163,16 @@ class PurchaseOrderListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Thống kê theo trạng thái
-        context['draft_count'] = PurchaseOrder.objects.filter(status='draft').count()
-        context['pending_count'] = PurchaseOrder.objects.filter(status='pending').count()
-        context['confirmed_count'] = PurchaseOrder.objects.filter(status='confirmed').count()
-        context['received_count'] = PurchaseOrder.objects.filter(status='received').count()
+        # Thống kê theo trạng thái (một truy vấn cho tất cả trạng thái)
+        counts = status_histogram(
+            PurchaseOrder.objects.all(),
+            [status for status, _label in PurchaseOrder.STATUS_CHOICES]
+        )
+        context['draft_count'] = counts['DRAFT']
+        context['pending_count'] = counts['PENDING']
+        context['confirmed_count'] = counts['CONFIRMED']
+        context['received_count'] = counts['RECEIVED']
+        context['cancelled_count'] = counts['CANCELLED']
         
         # Danh sách nhà cung cấp cho dropdown lọc
         context['suppliers'] = Supplier.objects.filter(is_active=True)
@@ -0,0 +1,27 @@
+from django.db.models import Count, Q
+
+
+class StatusCounts(dict):
+    """{trạng thái: số dòng}; trạng thái không có dòng nào trả về 0, tổng ở `total`"""
+
+    def __missing__(self, key):
+        return 0
+
+    @property
+    def total(self):
+        return sum(self.values())
+
+
+def status_histogram(queryset, statuses, field='status'):
+    """
+    Đếm số dòng theo từng trạng thái bằng một truy vấn duy nhất.
+
+    Dùng COUNT có điều kiện (`COUNT(...) FILTER (WHERE status = ...)`) thay vì
+    mỗi trạng thái một câu COUNT riêng.
+    """
+    aggregates = {
+        f'status_{i}': Count('pk', filter=Q(**{field: status}))
+        for i, status in enumerate(statuses)
+    }
+    row = queryset.order_by().aggregate(**aggregates)
+    return StatusCounts({status: row[f'status_{i}'] for i, status in enumerate(statuses)})
@@ -0,0 +1,119 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+from core.queries import collect_queries
+
+
+class Benchmark:
+    """
+    Một kịch bản benchmark: gửi `method` tới `path` bằng test client.
+
+    `setup(client)` chạy trước mỗi lần đo và không được tính giờ (ví dụ đổ
+    lại giỏ hàng trước khi đặt hàng). `expected_status` dùng để đánh dấu các
+    lần chạy trả về mã lỗi hoặc chuyển hướng ngoài dự kiến.
+    """
+
+    def __init__(self, name, path, method='get', data=None, user=None, setup=None, expected_status=200, **extra):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.user = user
+        self.setup = setup
+        self.expected_status = expected_status
+        self.extra = extra
+
+    def request(self, client):
+        response = getattr(client, self.method)(self.path, self.data, **self.extra)
+        # Phản hồi dạng stream (xuất báo cáo) chỉ chạy truy vấn khi được đọc
+        size = len(b''.join(response.streaming_content)) if response.streaming else len(response.content)
+        return response.status_code, size
+
+
+def run_benchmark(client, benchmark, repeat=5, warmup=1):
+    """Đo thời gian và số truy vấn của một kịch bản; bỏ qua `warmup` lần chạy đầu"""
+    if benchmark.user is not None:
+        client.force_login(benchmark.user)
+    else:
+        client.logout()
+
+    timings, queries, db_times = [], [], []
+    statuses = set()
+    size = 0
+    for i in range(warmup + repeat):
+        if benchmark.setup:
+            benchmark.setup(client)
+        with collect_queries() as collector:
+            started = time.perf_counter()
+            status, size = benchmark.request(client)
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        statuses.add(status)
+        timings.append(elapsed * 1000)
+        queries.append(collector.count)
+        db_times.append(collector.duration * 1000)
+
+    timings.sort()
+    return {
+        'name': benchmark.name,
+        'path': benchmark.path,
+        'method': benchmark.method.upper(),
+        'status': sorted(statuses),
+        'ok': statuses == {benchmark.expected_status},
+        'repeat': repeat,
+        'min_ms': round(timings[0], 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'max_ms': round(timings[-1], 2),
+        'db_ms': round(statistics.median(db_times), 2),
+        'queries': max(queries),
+        'bytes': size,
+    }
+
+
+def environment():
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def write_results(path, results, meta=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'meta': meta or {}, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return {result['name']: result for result in json.load(f)['results']}
+
+
+def compare_results(baseline, results, threshold=0.2):
+    """
+    So sánh với lần chạy trước: trả về các kịch bản chậm hơn `threshold`
+    (theo trung vị) hoặc chạy nhiều truy vấn hơn.
+    """
+    regressions = []
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+        slower = result['median_ms'] > old['median_ms'] * (1 + threshold)
+        more_queries = result['queries'] > old['queries']
+        if slower or more_queries:
+            regressions.append({
+                'name': result['name'],
+                'median_ms': (old['median_ms'], result['median_ms']),
+                'queries': (old['queries'], result['queries']),
+            })
+    return regressions
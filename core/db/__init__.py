@@ -0,0 +1,36 @@
+import time
+from functools import wraps
+
+from django.db import OperationalError, connection, transaction
+
+
+# Số lần thử lấy khóa ghi khi SQLite vẫn báo "database is locked" sau busy_timeout
+WRITE_RETRY_ATTEMPTS = 3
+WRITE_RETRY_DELAY = 0.05
+
+
+def serialized_write(func):
+    """
+    Chạy `func` trong một giao dịch ghi, thử lại khi chưa lấy được khóa ghi.
+
+    Với `transaction_mode = IMMEDIATE`, khóa ghi của SQLite được lấy ngay ở
+    BEGIN, nên các luồng ghi nóng (đặt hàng, chuyển động kho) xếp hàng ở đầu
+    giao dịch thay vì thất bại giữa chừng. Chỉ lỗi khóa ở BEGIN mới được thử
+    lại, nên `func` không bao giờ chạy hai lần. Khi đã ở trong một giao dịch
+    hoặc không dùng SQLite thì gọi thẳng `func`.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(WRITE_RETRY_ATTEMPTS):
+            started = False
+            try:
+                with transaction.atomic():
+                    started = True
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if started or 'locked' not in str(exc) or attempt == WRITE_RETRY_ATTEMPTS - 1:
+                    raise
+            time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+    return wrapper
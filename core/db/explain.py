@@ -0,0 +1,51 @@
+import re
+
+from django.db import connection
+from django.utils.module_loading import autodiscover_modules
+
+
+# Tên truy vấn -> hàm trả về queryset tiêu biểu của một view/luồng nóng
+HOT_QUERIES = {}
+
+# "SCAN bảng" của SQLite đọc cả bảng; "SCAN bảng USING INDEX" đọc cả chỉ mục theo
+# thứ tự, chỉ chấp nhận được khi truy vấn có LIMIT. PostgreSQL: "Seq Scan on bảng".
+SCAN_PATTERN = re.compile(r'\bSCAN (\w+)( USING (?:COVERING )?INDEX)?')
+SEQ_SCAN_PATTERN = re.compile(r'\bSeq Scan on (\w+)')
+
+
+def hot_query(name):
+    """
+    Đăng ký một truy vấn nóng để `explain_hot_queries` kiểm tra kế hoạch thực thi.
+
+    Hàm được đăng ký không nhận tham số và trả về queryset có cùng dạng
+    bộ lọc/sắp xếp với truy vấn thật trong view (giá trị tham số không quan trọng).
+    """
+    def register(func):
+        HOT_QUERIES[name] = func
+        return func
+    return register
+
+
+def load_hot_queries():
+    """Nạp module `hot_queries` của mọi app đã cài đặt và trả về danh sách đã đăng ký"""
+    autodiscover_modules('hot_queries')
+    return HOT_QUERIES
+
+
+def full_scans(plan, limited=False):
+    """
+    Các bảng bị quét toàn bộ trong kế hoạch `plan` (kết quả của `QuerySet.explain()`).
+
+    `limited=True` khi truy vấn có LIMIT: duyệt chỉ mục theo thứ tự sắp xếp dừng
+    sau vài dòng nên không tính là quét toàn bảng.
+    """
+    tables = set(connection.introspection.table_names())
+    scanned = []
+    for line in plan.splitlines():
+        match = SCAN_PATTERN.search(line)
+        if match and match.group(1) in tables and not (limited and match.group(2)):
+            scanned.append(match.group(1))
+        match = SEQ_SCAN_PATTERN.search(line)
+        if match and match.group(1) in tables:
+            scanned.append(match.group(1))
+    return scanned
@@ -0,0 +1,32 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite với các PRAGMA cho nhiều tiến trình cùng ghi (gunicorn nhiều worker).
+
+    WAL cho phép đọc song song với một tiến trình đang ghi; `busy_timeout` làm
+    tiến trình chờ khóa ghi thay vì báo "database is locked" ngay. Có thể ghi
+    đè từng PRAGMA bằng `OPTIONS['pragmas']` trong settings.
+    """
+
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        # Với WAL, NORMAL vẫn an toàn khi tiến trình bị dừng, chỉ có thể mất giao dịch cuối khi mất điện
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,  # KiB
+        'temp_store': 'MEMORY',
+    }
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**self.PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
@@ -0,0 +1,110 @@
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+
+# Trang đã render được giữ tối đa chừng này giây dù không có thay đổi
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _version_key(scope):
+    return f'page_cache:version:{scope}'
+
+
+def scope_versions(scopes, keys=None):
+    """
+    Phiên bản hiện tại của các phạm vi (ví dụ 'catalog', 'product:5').
+
+    Phạm vi chưa có trong cache được khởi tạo bằng thời điểm hiện tại (ms),
+    nên khi khóa phiên bản bị đẩy khỏi cache thì các trang cũ không còn khớp.
+    `keys` = {phạm vi: khóa cache} cho các phiên bản do module khác quản lý.
+    """
+    keys = {scope: (keys or {}).get(scope) or _version_key(scope) for scope in scopes}
+    cached = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in cached:
+            cache.add(key, int(time.time() * 1000), None)
+            cached[key] = cache.get(key)
+        versions[scope] = cached[key]
+    return versions
+
+
+def bump_scopes(*scopes):
+    """Tăng phiên bản của các phạm vi sau khi giao dịch commit; trang phụ thuộc sẽ được render lại"""
+    def apply():
+        for scope in set(scopes):
+            try:
+                cache.incr(_version_key(scope))
+            except ValueError:
+                cache.set(_version_key(scope), int(time.time() * 1000), None)
+    transaction.on_commit(apply)
+
+
+def depends_on(request, *scopes, keys=None):
+    """
+    Khai báo trong view rằng trang đang render phụ thuộc các phạm vi `scopes`.
+
+    Phiên bản được đọc ngay lúc khai báo (trước khi đọc dữ liệu), nên thay đổi
+    xảy ra trong lúc render sẽ làm trang lưu cache không còn khớp ở lần sau.
+    Trả về các phiên bản, dùng được làm khóa cho `{% cache %}` trong template.
+    """
+    versions = scope_versions(scopes, keys)
+    if hasattr(request, '_page_cache_versions'):
+        request._page_cache_versions.update(versions)
+        request._page_cache_keys.update(keys or {})
+    return versions
+
+
+def _cacheable(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Trang có thông báo flash chỉ hiển thị một lần, không dùng bản trong cache
+    return not len(get_messages(request))
+
+
+def cache_page_for_visitors(view):
+    """
+    Cache trang đã render cho khách chưa đăng nhập, theo đường dẫn đầy đủ.
+
+    Mỗi bản lưu kèm phiên bản của các phạm vi đã khai báo bằng `depends_on`;
+    khi trả từ cache chỉ cần đọc lại các phiên bản đó (không truy vấn DB).
+    Mã CSRF trong các form được thay bằng mã của request hiện tại.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+
+        key = 'page_cache:page:' + hashlib.md5(request.get_full_path().encode()).hexdigest()
+        entry = cache.get(key)
+        if entry is not None and scope_versions(entry['versions'], entry['keys']) == entry['versions']:
+            content = entry['content']
+            if entry['csrf']:
+                token = get_token(request)
+                content = CSRF_INPUT.sub(lambda match: match.group(1) + token + match.group(2), content)
+            return HttpResponse(content, content_type=entry['content_type'])
+
+        request._page_cache_versions = {}
+        request._page_cache_keys = {}
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and request._page_cache_versions:
+            content = response.content.decode(response.charset)
+            cache.set(key, {
+                'versions': request._page_cache_versions,
+                'keys': request._page_cache_keys,
+                'content': content,
+                'content_type': response['Content-Type'],
+                'csrf': bool(CSRF_INPUT.search(content)),
+            }, PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+
+
+# Số dòng tối đa được đếm khi ước lượng tổng; nhiều hơn sẽ hiển thị "hơn N"
+ESTIMATE_CAP = 1000
+ESTIMATE_TIMEOUT = 60
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+def estimated_count(queryset, cap=ESTIMATE_CAP):
+    """
+    Ước lượng số dòng của `queryset`, trả về (số dòng, có chính xác không).
+
+    Chỉ đếm tối đa `cap + 1` dòng (COUNT trên truy vấn con có LIMIT) nên chi
+    phí không tăng theo kích thước bảng; kết quả được cache trong thời gian ngắn.
+    """
+    queryset = queryset.order_by()
+    try:
+        key = 'pagination:count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    except Exception:
+        key = None
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    count = queryset[:cap + 1].count()
+    result = (min(count, cap), count <= cap)
+    if key:
+        cache.set(key, result, ESTIMATE_TIMEOUT)
+    return result
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    """Một trang kết quả phân trang theo khóa; dùng được như `Page` trong template"""
+    is_keyset = True
+
+    def __init__(self, paginator, object_list, has_next, has_previous, next_cursor, previous_cursor, params):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query(self, cursor):
+        params = self._params.copy() if self._params is not None else {}
+        for key in (self.paginator.cursor_param, 'page'):
+            params.pop(key, None)
+        if cursor:
+            params[self.paginator.cursor_param] = cursor
+        return params.urlencode() if hasattr(params, 'urlencode') else ''
+
+    @property
+    def next_query(self):
+        """Chuỗi query (không có '?') của trang sau, giữ nguyên các bộ lọc hiện tại"""
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def estimated_total(self):
+        return self.paginator.estimated_count()[0]
+
+    @property
+    def total_is_exact(self):
+        return self.paginator.estimated_count()[1]
+
+
+class KeysetPaginator:
+    """
+    Phân trang theo khóa (keyset/cursor) trên các cột `ordering`, mặc định
+    (created_at, id) giảm dần.
+
+    Mỗi trang là một truy vấn `WHERE (created_at, id) < (giá trị cuối trang trước)
+    ORDER BY ... LIMIT n`, nên thời gian không phụ thuộc trang đang xem sâu
+    đến đâu và không cần COUNT toàn bảng.
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING, cursor_param='cursor', count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.cursor_param = cursor_param
+        # Tổng đã biết trước (số dòng, chính xác không), nếu có thì không cần ước lượng
+        self._count = count
+
+    def _field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name in self._field_names():
+            value = getattr(obj, 'pk' if name == 'id' else name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        raw = json.dumps([direction] + values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, *values = json.loads(raw)
+            model = self.queryset.model
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self._field_names(), values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+        if direction not in ('n', 'p') or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _after(self, values, reverse=False):
+        """Điều kiện "nằm sau giá trị `values` theo thứ tự sắp xếp" (hoặc nằm trước nếu reverse)"""
+        names = self._field_names()
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            prefix = {names[j]: values[j] for j in range(i)}
+            condition |= Q(**prefix, **{f'{names[i]}__{lookup}': values[i]})
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def page(self, cursor=None, params=None):
+        """Lấy trang tại `cursor` (None = trang đầu); cursor không hợp lệ thì về trang đầu"""
+        direction, values = 'n', None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = 'n', None
+
+        if direction == 'p':
+            rows = list(self.queryset.filter(self._after(values, reverse=True)).order_by(
+                *self._reversed_ordering()
+            )[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if values is not None:
+                queryset = queryset.filter(self._after(values))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = values is not None
+
+        return KeysetPage(
+            self,
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=self.encode_cursor(rows[-1], 'n') if rows else None,
+            previous_cursor=self.encode_cursor(rows[0], 'p') if rows else None,
+            params=params,
+        )
+
+    def estimated_count(self):
+        if self._count is None:
+            self._count = estimated_count(self.queryset)
+        return self._count
+
+
+class KeysetPaginationMixin:
+    """
+    Cho ListView: thay phân trang theo số trang bằng phân trang theo khóa.
+
+    Template nhận `page_obj` là `KeysetPage` (có `next_query`, `previous_query`,
+    `estimated_total`) và `is_paginated` như bình thường.
+    """
+    keyset_ordering = DEFAULT_ORDERING
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.keyset_ordering)
+        page = paginator.page(self.request.GET.get(paginator.cursor_param), self.request.GET)
+        return paginator, page, page.object_list, page.has_other_pages
@@ -0,0 +1,170 @@
+import json
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('core.queries')
+
+# Số lần lặp lại tối thiểu của cùng một dạng câu SQL để bị coi là N+1
+N_PLUS_ONE_THRESHOLD = getattr(settings, 'QUERY_INSPECT_N_PLUS_ONE_THRESHOLD', 5)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """Chuẩn hóa câu SQL để gom các truy vấn chỉ khác nhau về tham số"""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _STRING_RE.sub('?', sql)
+    return _NUMBER_RE.sub('?', sql)
+
+
+def _origin():
+    """Dòng code của dự án (không phải Django/thư viện) đã phát sinh truy vấn"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = frame.filename
+        if filename.startswith(base_dir) and '/site-packages/' not in filename and not filename.endswith('core/queries.py'):
+            return f'{filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class QueryCollector:
+    """Ghi lại các truy vấn chạy qua `connection.execute_wrapper`"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            shape = sql_shape(sql)
+            self.shapes[shape] += 1
+            # Chỉ lấy stack ở lần lặp lại thứ hai để không tốn chi phí cho mọi truy vấn
+            if self.shapes[shape] == 2:
+                self.origins[shape] = _origin()
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.shapes.values() if count > 1)
+
+    def n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [
+            {'sql': shape[:300], 'count': count, 'origin': self.origins.get(shape)}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def collect_queries(using=None):
+    """Đếm truy vấn trên một (hoặc mọi) kết nối trong khối `with`"""
+    collector = QueryCollector()
+    aliases = [using] if using else list(connections)
+    wrappers = [connections[alias].execute_wrapper(collector) for alias in aliases]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    try:
+        yield collector
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+
+
+@contextmanager
+def query_budget(max_queries, label=''):
+    """
+    Dùng trong test: báo lỗi nếu khối `with` chạy nhiều hơn `max_queries` truy vấn.
+
+        with query_budget(10, 'inventory:dashboard'):
+            client.get(reverse('inventory:dashboard'))
+    """
+    with collect_queries() as collector:
+        yield collector
+    if collector.count > max_queries:
+        raise QueryBudgetExceeded(_budget_message(label, collector, max_queries))
+
+
+def _budget_message(label, collector, budget):
+    lines = [f'{label or "Khối lệnh"} chạy {collector.count} truy vấn (giới hạn {budget}).']
+    for item in collector.n_plus_one(threshold=2):
+        lines.append(f'  {item["count"]}x {item["sql"][:120]}  <- {item["origin"]}')
+    return '\n'.join(lines)
+
+
+def _budget_for(request):
+    """Giới hạn truy vấn của URL hiện tại theo `QUERY_BUDGETS` (tên view hoặc tiền tố đường dẫn)"""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    match = getattr(request, 'resolver_match', None)
+    if match and match.view_name in budgets:
+        return budgets[match.view_name]
+    prefixes = [key for key in budgets if key.startswith('/') and request.path.startswith(key)]
+    if prefixes:
+        return budgets[max(prefixes, key=len)]
+    return None
+
+
+class QueryInspectMiddleware:
+    """
+    Đếm truy vấn của mỗi request, phát hiện N+1 và kiểm tra giới hạn truy vấn.
+
+    Mỗi request ghi một dòng log JSON vào logger `core.queries` (số truy vấn,
+    số truy vấn trùng dạng, thời gian DB, các cụm N+1 kèm dòng code phát sinh).
+    Vượt `QUERY_BUDGETS` thì ghi cảnh báo; nếu `QUERY_BUDGET_STRICT = True`
+    (dùng khi chạy test) thì ném `QueryBudgetExceeded`.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECT_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect_queries() as collector:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        budget = _budget_for(request)
+        n_plus_one = collector.n_plus_one()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': collector.count,
+            'duplicates': collector.duplicates,
+            'db_ms': round(collector.duration * 1000, 1),
+            'duration_ms': round(elapsed * 1000, 1),
+            'budget': budget,
+            'n_plus_one': n_plus_one,
+        }
+        over_budget = budget is not None and collector.count > budget
+        level = logging.WARNING if over_budget or n_plus_one else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+        if over_budget and self.strict:
+            raise QueryBudgetExceeded(_budget_message(record['view'] or request.path, collector, budget))
+        return response
@@ -53,11 +53,13 @@ PROJECT_APPS = [
     'apps.reports',
     'apps.staff',
     'apps.admin_panel',
+    'apps.sequences',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    'core.queries.QueryInspectMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,13 +97,56 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
+# SQLite với WAL, busy_timeout và giao dịch IMMEDIATE (xem core.db.sqlite3),
+# giữ kết nối giữa các request để không mở lại và chạy lại PRAGMA mỗi lần
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Khóa ghi được lấy ở BEGIN: tránh lỗi "database is locked" khi
+            # giao dịch đang đọc nâng lên ghi lúc tiến trình khác đang ghi
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Cache: mặc định là bộ nhớ của tiến trình. Khi chạy nhiều tiến trình, đặt
+# CACHE_BACKEND=redis (CACHE_LOCATION) để các tiến trình dùng chung phiên bản
+# cache và bộ đếm. CACHE_BACKEND=file cũng dùng chung được phiên bản cache, nhưng
+# `incr` của nó không nguyên tử: số liệu tồn kho khi đó tổng hợp thẳng từ DB
+# (xem apps.inventory.levels.counters_enabled).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': 'furniture',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+            'KEY_PREFIX': 'furniture',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'furniture',
+            'KEY_PREFIX': 'furniture',
+            # Mặc định chỉ 300 khóa: quá ít cho trang, facet và số liệu tồn kho
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -171,6 +216,39 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Đếm truy vấn mỗi request, phát hiện N+1 (core.queries.QueryInspectMiddleware)
+QUERY_INSPECT_ENABLED = DEBUG
+QUERY_INSPECT_N_PLUS_ONE_THRESHOLD = 5
+# Bật khi chạy test để request vượt giới hạn bị báo lỗi thay vì chỉ ghi log
+QUERY_BUDGET_STRICT = False
+# Giới hạn số truy vấn theo tên view hoặc tiền tố đường dẫn
+QUERY_BUDGETS = {
+    'inventory:dashboard': 30,
+    'branches:manager_dashboard': 30,
+    'admin_panel:dashboard': 30,
+    'reports:dashboard': 20,
+    'orders:order_list': 15,
+    'products:product_list': 15,
+    '/api/': 20,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Django Jazzmin settings
 JAZZMIN_SETTINGS = {
     # title of the window (Will default to current_admin_site.site_title if absent or None)